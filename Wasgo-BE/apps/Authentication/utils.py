@@ -6,6 +6,8 @@ from django.core.cache import cache
 from datetime import datetime
 import logging
 
+from utils.cache_counters import decr_counter, get_counter, incr_counter, reserve_slot
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,13 +47,11 @@ def get_client_ip(request):
 def increment_failed_logins(email, ip):
     """Increment failed login attempts counter"""
     cache_key = f"login_attempts:{email}"
-    attempts = cache.get(cache_key, 0) + 1
-    cache.set(cache_key, attempts, timeout=3600)  # 1 hour
+    incr_counter(cache_key, timeout=3600)  # 1 hour
 
     # Also track by IP to prevent attacks across multiple accounts
     ip_key = f"login_attempts_ip:{ip}"
-    ip_attempts = cache.get(ip_key, 0) + 1
-    cache.set(ip_key, ip_attempts, timeout=3600)
+    incr_counter(ip_key, timeout=3600)
 
 
 def is_account_locked(email):
@@ -326,7 +326,7 @@ class OTPValidator:
     def get_global_email_stats():
         """Get current global email sending statistics"""
         key = OTPValidator.get_global_email_limit_key()
-        current_count = cache.get(key, 0)
+        current_count = get_counter(key)
         max_limit = 1000  # Should match the limit in send_otp_utility
 
         return {
@@ -367,6 +367,16 @@ def send_otp_utility(
         f"[OTP_DEBUG] Starting OTP send process for user {user.id} ({user.email}), type: {otp_type}"
     )
 
+    # Per-user rate limit slot and resend cooldown claimed for this request;
+    # both are given back if the OTP is not sent
+    rate_limit_key = cooldown_key = None
+
+    def release_user_limits():
+        if rate_limit_key:
+            decr_counter(rate_limit_key)
+        if cooldown_key:
+            cache.delete(cooldown_key)
+
     try:
         # Validate admin override
         if admin_override:
@@ -411,42 +421,15 @@ def send_otp_utility(
                 "error_code": "NO_RECIPIENT",
             }
 
-        # GLOBAL EMAIL ABUSE PROTECTION - Check total emails sent per hour
-        if recipient_email and not admin_override:
-            logger.info(
-                f"[OTP_DEBUG] Checking global email limit for {recipient_email}"
-            )
-            global_email_key = "global_otp_emails_sent_hourly"
-            global_email_count = cache.get(global_email_key, 0)
-            max_global_emails_per_hour = (
-                1000  # Adjust based on your email service limits
-            )
-
-            logger.info(
-                f"[OTP_DEBUG] Global email count: {global_email_count}/{max_global_emails_per_hour}"
-            )
-
-            if global_email_count >= max_global_emails_per_hour:
-                logger.warning(
-                    f"[OTP_DEBUG] Global email limit reached: {global_email_count} emails sent in the last hour"
-                )
-                return {
-                    "success": False,
-                    "message": "Email service temporarily unavailable. Please try again later.",
-                    "error_code": "EMAIL_SERVICE_LIMIT",
-                    "status_code": 503,
-                }
-            logger.info(f"[OTP_DEBUG] Global email limit check passed")
-
         # Skip rate limiting checks if admin override is enabled
         if not admin_override:
             logger.info(f"[OTP_DEBUG] Checking user rate limits for {user.id}")
-            # Check rate limiting using cache
-            rate_limit_key = OTPValidator.get_rate_limit_key(user, otp_type)
-            attempts = cache.get(rate_limit_key, 0)
+            # Atomically reserve one of the user's OTP requests for the hour
+            user_rate_key = OTPValidator.get_rate_limit_key(user, otp_type)
+            reserved, attempts = reserve_slot(user_rate_key, 5, 3600)
             logger.info(f"[OTP_DEBUG] User rate limit attempts: {attempts}/5")
 
-            if attempts >= 5:  # Max 5 OTP requests per hour
+            if not reserved:  # Max 5 OTP requests per hour
                 logger.warning(
                     f"[OTP_DEBUG] User rate limit exceeded for {user.id}: {attempts} attempts"
                 )
@@ -456,20 +439,23 @@ def send_otp_utility(
                     "error_code": "RATE_LIMIT_EXCEEDED",
                     "status_code": 429,
                 }
+            rate_limit_key = user_rate_key
 
-            # Check resend cooldown
-            cooldown_key = OTPValidator.get_resend_cooldown_key(user, otp_type)
-            cooldown_active = cache.get(cooldown_key)
-            logger.info(f"[OTP_DEBUG] Cooldown check: {cooldown_active}")
+            # Claim the resend cooldown; only one concurrent request wins it
+            user_cooldown_key = OTPValidator.get_resend_cooldown_key(user, otp_type)
+            cooldown_claimed = cache.add(user_cooldown_key, True, 60)  # 1 minute
+            logger.info(f"[OTP_DEBUG] Cooldown claimed: {cooldown_claimed}")
 
-            if cooldown_active:
+            if not cooldown_claimed:
                 logger.warning(f"[OTP_DEBUG] Cooldown active for user {user.id}")
+                release_user_limits()
                 return {
                     "success": False,
                     "message": "Please wait before requesting another OTP.",
                     "error_code": "COOLDOWN_ACTIVE",
                     "status_code": 429,
                 }
+            cooldown_key = user_cooldown_key
             logger.info(f"[OTP_DEBUG] All rate limit checks passed")
         else:
             logger.info(f"[OTP_DEBUG] Skipping rate limit checks due to admin override")
@@ -491,14 +477,40 @@ def send_otp_utility(
                 f"[OTP_DEBUG] Attempting to send email OTP to {recipient_email}"
             )
 
+            # Atomically reserve a slot in the global hourly email budget so
+            # concurrent requests cannot overshoot it
+            global_email_key = OTPValidator.get_global_email_limit_key()
+            if not admin_override:
+                reserved, global_email_count = reserve_slot(
+                    global_email_key, 1000, 3600  # 1 hour window
+                )
+                if not reserved:
+                    logger.warning(
+                        f"[OTP_DEBUG] Global email limit reached: {global_email_count} emails sent in the last hour"
+                    )
+                    release_user_limits()
+                    return {
+                        "success": False,
+                        "message": "Email service temporarily unavailable. Please try again later.",
+                        "error_code": "EMAIL_SERVICE_LIMIT",
+                        "status_code": 503,
+                    }
+
             # Send OTP email
             logger.info(f"[OTP_DEBUG] Calling OTPEmailService.send_otp_email")
-            email_sent = OTPEmailService.send_otp_email(user, otp, otp_type)
+            try:
+                email_sent = OTPEmailService.send_otp_email(user, otp, otp_type)
+            except Exception:
+                email_sent = False
+                logger.exception("[OTP_DEBUG] OTPEmailService.send_otp_email raised")
             logger.info(
                 f"[OTP_DEBUG] OTPEmailService.send_otp_email returned: {email_sent}"
             )
 
             if not email_sent:
+                if not admin_override:
+                    decr_counter(global_email_key)
+                release_user_limits()
                 logger.error(
                     f"[OTP_DEBUG] Email sending failed for user {user.id} to {recipient_email}"
                 )
@@ -508,31 +520,7 @@ def send_otp_utility(
                     "error_code": "EMAIL_SEND_FAILED",
                 }
 
-            logger.info(f"[OTP_DEBUG] Email sent successfully, updating counters")
-
-            # Update global email counter (only if not admin override)
-            if not admin_override:
-                global_email_key = "global_otp_emails_sent_hourly"
-                global_email_count = cache.get(global_email_key, 0)
-                new_global_count = global_email_count + 1
-                cache.set(global_email_key, new_global_count, 3600)  # 1 hour expiry
-                logger.info(
-                    f"[OTP_DEBUG] Updated global email counter: {global_email_count} -> {new_global_count}"
-                )
-
-            # Update rate limiting (only if not admin override)
-            if not admin_override:
-                rate_limit_key = OTPValidator.get_rate_limit_key(user, otp_type)
-                attempts = cache.get(rate_limit_key, 0)
-                new_attempts = attempts + 1
-                cache.set(rate_limit_key, new_attempts, 3600)  # 1 hour expiry
-                logger.info(
-                    f"[OTP_DEBUG] Updated user rate limit: {attempts} -> {new_attempts}"
-                )
-
-                cooldown_key = OTPValidator.get_resend_cooldown_key(user, otp_type)
-                cache.set(cooldown_key, True, 60)  # 1 minute cooldown
-                logger.info(f"[OTP_DEBUG] Set cooldown for user {user.id}")
+            logger.info(f"[OTP_DEBUG] Email sent successfully")
 
             # Log admin override if applicable
             if admin_override:
@@ -561,6 +549,7 @@ def send_otp_utility(
             )
             # TODO: Implement SMS sending logic here
             # For now, return error indicating SMS not implemented
+            release_user_limits()
             return {
                 "success": False,
                 "message": "SMS OTP delivery not implemented yet.",
@@ -571,6 +560,7 @@ def send_otp_utility(
             logger.error(
                 f"[OTP_DEBUG] No valid delivery method found for user {user.id}"
             )
+            release_user_limits()
             return {
                 "success": False,
                 "message": "No valid delivery method available.",
@@ -581,6 +571,7 @@ def send_otp_utility(
         logger.exception(
             f"[OTP_DEBUG] Exception in send_otp_utility for user {user.id}: {str(e)}"
         )
+        release_user_limits()
         return {
             "success": False,
             "message": "Failed to send OTP. Please try again later.",
@@ -702,7 +693,7 @@ def verify_otp_utility(user, otp_code, otp_type, admin_override=False, admin_use
             hourly_verification_key = OTPValidator.get_hourly_verification_key(
                 user, otp_type
             )
-            hourly_attempts = cache.get(hourly_verification_key, 0)
+            hourly_attempts = get_counter(hourly_verification_key)
             max_hourly_attempts = 5
             logger.info(
                 f"[VERIFY_DEBUG] Hourly verification attempts: {hourly_attempts}/{max_hourly_attempts}"
@@ -722,7 +713,7 @@ def verify_otp_utility(user, otp_code, otp_type, admin_override=False, admin_use
             otp_verification_key = OTPValidator.get_otp_verification_key(
                 user, otp_type, otp.id
             )
-            otp_attempts = cache.get(otp_verification_key, 0)
+            otp_attempts = get_counter(otp_verification_key)
             max_otp_attempts = 3
             logger.info(
                 f"[VERIFY_DEBUG] OTP-specific attempts: {otp_attempts}/{max_otp_attempts}"
@@ -738,17 +729,22 @@ def verify_otp_utility(user, otp_code, otp_type, admin_override=False, admin_use
                     "error_code": "OTP_MAX_ATTEMPTS_REACHED",
                 }
 
-            # Increment both counters
-            hourly_attempts += 1
-            otp_attempts += 1
+            # Increment both counters atomically (1 hour windows)
+            hourly_attempts = incr_counter(hourly_verification_key, 3600)
+            otp_attempts = incr_counter(otp_verification_key, 3600)
             logger.info(
                 f"[VERIFY_DEBUG] Incremented counters - Hourly: {hourly_attempts}, OTP: {otp_attempts}"
             )
 
-            # Store with appropriate expiry times
-            cache.set(hourly_verification_key, hourly_attempts, 3600)  # 1 hour expiry
-            cache.set(otp_verification_key, otp_attempts, 3600)  # 1 hour expiry
-            logger.info(f"[VERIFY_DEBUG] Rate limit counters updated in cache")
+            # Concurrent attempts may have raced past the checks above
+            if hourly_attempts > max_hourly_attempts or otp_attempts > max_otp_attempts:
+                return {
+                    "success": False,
+                    "message": "Too many verification attempts. Please try again later.",
+                    "error_code": "HOURLY_LIMIT_EXCEEDED"
+                    if hourly_attempts > max_hourly_attempts
+                    else "OTP_MAX_ATTEMPTS_REACHED",
+                }
         else:
             logger.info(
                 f"[VERIFY_DEBUG] Skipping rate limit checks due to admin override"
@@ -1204,9 +1204,10 @@ class ResendOTPView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Check cooldown
+            # Claim the cooldown atomically so concurrent requests cannot both
+            # send; it is released again if sending fails
             cooldown_key = f"otp_cooldown:{user.id}:{otp_type}"
-            if cache.get(cooldown_key):
+            if not cache.add(cooldown_key, True, timeout=60):  # 1 minute cooldown
                 return Response(
                     {
                         "message": "Please wait before requesting another OTP.",
@@ -1217,11 +1218,10 @@ class ResendOTPView(APIView):
 
             # Send OTP
             result = send_otp_utility(user, otp_type, user.email)
+            if not result["success"]:
+                cache.delete(cooldown_key)
 
             if result["success"]:
-                # Set cooldown
-                cache.set(cooldown_key, True, timeout=60)  # 1 minute cooldown
-
                 return Response(
                     {
                         "message": result["message"],
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    GiST index on coordinates::geography, used by the ST_DWithin radius
+    filter and KNN (<->) ordering of nearest-centre queries
+    (utils.spatial.nearest).
+    """
+
+    dependencies = [
+        ('ServiceRequest', '0004_recyclingcenter_servicerequest_recycling_center'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS recycling_centers_coordinates_geog_idx '
+                'ON recycling_centers USING GIST ((coordinates::geography));',
+            reverse_sql='DROP INDEX IF EXISTS recycling_centers_coordinates_geog_idx;',
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import ServiceRequest, ServiceRequestTimelineEvent
+from .models import (
+    ServiceRequest,
+    ServiceRequestTimelineEvent,
+    CitizenReport,
+    RecyclingCenter,
+)
 from .services import ServiceRequestNotificationService
+from apps.WasteBin.tiles import invalidate_tiles
 import logging
 
 logger = logging.getLogger(__name__)
@@ -103,3 +109,35 @@ def handle_service_request_delete(sender, instance, **kwargs):
 
     # Clean up related data if needed
     # Note: Timeline events will be automatically deleted due to CASCADE
+
+
+# Drop the cached map tiles showing a report or recycling centre when it
+# changes. A moved point also invalidates the tiles at its previous position.
+def _previous_point(sender, instance, field):
+    if instance._state.adding or not instance.pk:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=CitizenReport)
+def remember_report_location(sender, instance, **kwargs):
+    instance._previous_location = _previous_point(sender, instance, "location")
+
+
+@receiver(post_save, sender=CitizenReport)
+@receiver(post_delete, sender=CitizenReport)
+def invalidate_report_tiles(sender, instance, **kwargs):
+    points = [instance.location, getattr(instance, "_previous_location", None)]
+    invalidate_tiles("reports", points)
+
+
+@receiver(pre_save, sender=RecyclingCenter)
+def remember_recycling_centre_coordinates(sender, instance, **kwargs):
+    instance._previous_coordinates = _previous_point(sender, instance, "coordinates")
+
+
+@receiver(post_save, sender=RecyclingCenter)
+@receiver(post_delete, sender=RecyclingCenter)
+def invalidate_recycling_centre_tiles(sender, instance, **kwargs):
+    points = [instance.coordinates, getattr(instance, "_previous_coordinates", None)]
+    invalidate_tiles("recycling-centres", points)
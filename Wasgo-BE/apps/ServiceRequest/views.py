@@ -685,8 +685,7 @@ class RecyclingCenterViewSet(viewsets.ModelViewSet):
     def nearest(self, request):
         """Find nearest recycling centers to a location"""
         from django.contrib.gis.geos import Point
-        from django.contrib.gis.db.models.functions import Distance
-        from django.contrib.gis.measure import D
+        from utils.spatial import nearest
 
         # Get location parameters
         latitude = request.query_params.get("latitude")
@@ -703,19 +702,20 @@ class RecyclingCenterViewSet(viewsets.ModelViewSet):
         # Create point from coordinates
         user_location = Point(float(longitude), float(latitude), srid=4326)
 
-        # Find centers within radius
-        queryset = (
-            RecyclingCenter.objects.filter(status="active")
-            .annotate(distance=Distance("coordinates", user_location))
-            .filter(distance__lte=D(km=radius_km))
-            .order_by("distance")[:max_results]
+        # Find centers within radius, closest first (geography GiST index)
+        queryset = nearest(
+            RecyclingCenter.objects.filter(status="active"),
+            "coordinates",
+            user_location,
+            radius_km * 1000,
+            max_results,
         )
 
         # Serialize with distance
         centers_data = []
         for center in queryset:
             center_dict = RecyclingCenterListSerializer(center).data
-            center_dict["distance_km"] = round(center.distance.km, 2)
+            center_dict["distance_km"] = round(center.distance_m / 1000, 2)
             centers_data.append(center_dict)
 
         return Response(centers_data)
@@ -0,0 +1,346 @@
+"""
+Alert evaluation engine for sensor readings.
+
+Keeps a per-bin cache of the alert types that are currently open so that
+readings which do not change anything never touch the ``bin_alerts`` table.
+The database is only written on state transitions: an alert is opened, an
+open alert is escalated to a higher priority, or a condition clears and the
+alert is auto-resolved.
+
+The cache is per process and may be stale, so it is only trusted to skip
+work: readings that leave every alert condition clear never query the
+table. Whenever a plan touches alerts, ``commit`` first reconciles it with
+the open alerts in the database while the bins are locked. Alerts another
+worker already opened are escalated or reused instead of duplicated, alerts
+resolved elsewhere meanwhile are opened again if still needed, and only
+alerts actually resolved by this worker count towards the fleet deltas.
+"""
+
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BinAlert, SmartBin
+from .utils import evaluate_sensor_reading_alerts, resolve_related_alerts
+
+PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+# Alert types driven purely by sensor values, closed automatically once a
+# reading shows the condition has cleared. Fire and vandalism alerts stay
+# open until someone resolves them.
+AUTO_RESOLVE_TYPES = {"full", "overflow", "low_battery", "offline"}
+
+
+@dataclass
+class AlertPlan:
+    """DB changes produced by evaluating a batch of readings"""
+
+    to_create: list = field(default_factory=list)
+    to_escalate: list = field(default_factory=list)
+    to_resolve: list = field(default_factory=list)
+    # bin ID -> {alert_type: (alert_id, priority)} after the plan is applied
+    state: dict = field(default_factory=dict)
+    # alert ID -> stored priority, for escalated and resolved alerts
+    previous_priority: dict = field(default_factory=dict)
+    # Alerts the cache shows as open and a reading still needs:
+    # alert ID -> (bin ID, sensor ID, latest alert spec)
+    still_open: dict = field(default_factory=dict)
+
+    def __bool__(self):
+        return bool(
+            self.to_create or self.to_escalate or self.to_resolve or self.still_open
+        )
+
+    def priority_deltas(self):
+        """Change in open alert counts per priority once the plan is applied"""
+        deltas = Counter()
+        for alert in self.to_create:
+            deltas[alert.priority] += 1
+        for alert in self.to_escalate:
+            deltas[self.previous_priority[alert.id]] -= 1
+            deltas[alert.priority] += 1
+        for alert_id in self.to_resolve:
+            deltas[self.previous_priority[alert_id]] -= 1
+        return deltas
+
+
+class AlertEngine:
+    """Evaluate readings against open alerts held in an in-process cache"""
+
+    def __init__(self, ttl_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # bin ID -> (loaded_at, {alert_type: (alert_id, priority)})
+        self._open = {}
+
+    def warm(self, bin_ids):
+        """Load open alerts for any bins missing from (or expired in) the cache"""
+        now = time.monotonic()
+        with self._lock:
+            missing = [
+                bin_id
+                for bin_id in set(bin_ids)
+                if bin_id not in self._open
+                or now - self._open[bin_id][0] > self.ttl_seconds
+            ]
+        if not missing:
+            return
+
+        loaded = {bin_id: {} for bin_id in missing}
+        rows = BinAlert.objects.filter(
+            bin_id__in=missing, is_resolved=False
+        ).values_list("bin_id", "alert_type", "id", "priority")
+        for bin_id, alert_type, alert_id, priority in rows:
+            current = loaded[bin_id].get(alert_type)
+            if current is None or PRIORITY_RANK[priority] > PRIORITY_RANK[current[1]]:
+                loaded[bin_id][alert_type] = (alert_id, priority)
+
+        with self._lock:
+            for bin_id, open_alerts in loaded.items():
+                self._open[bin_id] = (now, open_alerts)
+
+    def open_alerts(self, bin_id):
+        """Return a copy of the cached open alerts for a bin"""
+        with self._lock:
+            entry = self._open.get(bin_id)
+            return dict(entry[1]) if entry else {}
+
+    def invalidate(self, bin_ids=None):
+        """Drop cached state for the given bins (or everything)"""
+        with self._lock:
+            if bin_ids is None:
+                self._open.clear()
+                return
+            for bin_id in bin_ids:
+                self._open.pop(bin_id, None)
+
+    def evaluate(self, pairs):
+        """
+        Evaluate (bin, reading) pairs, in order, against the open alerts.
+
+        Readings for the same bin are applied one after another so a batch
+        behaves like the same readings arriving individually. Returns an
+        ``AlertPlan``; nothing is written until ``commit`` is called.
+        """
+        pairs = list(pairs)
+        self.warm(bin_obj.pk for bin_obj, _ in pairs)
+
+        plan = AlertPlan()
+        new_alerts = {}
+        escalated = {}
+
+        for bin_obj, reading in pairs:
+            state = plan.state.get(bin_obj.pk)
+            if state is None:
+                state = plan.state[bin_obj.pk] = self.open_alerts(bin_obj.pk)
+
+            wanted = {
+                spec["alert_type"]: spec
+                for spec in evaluate_sensor_reading_alerts(bin_obj, reading)
+            }
+
+            for alert_type, spec in wanted.items():
+                current = state.get(alert_type)
+                if current is None:
+                    alert = BinAlert(bin=bin_obj, sensor=reading.sensor, **spec)
+                    new_alerts[alert.id] = alert
+                    state[alert_type] = (alert.id, alert.priority)
+                    continue
+
+                alert_id = current[0]
+                if alert_id not in new_alerts:
+                    plan.still_open[alert_id] = (bin_obj.pk, reading.sensor_id, spec)
+                if PRIORITY_RANK[spec["priority"]] > PRIORITY_RANK[current[1]]:
+                    if alert_id in new_alerts:
+                        new_alerts[alert_id].priority = spec["priority"]
+                        new_alerts[alert_id].message = spec["message"]
+                    else:
+                        escalated[alert_id] = (spec["priority"], spec["message"])
+                        plan.previous_priority.setdefault(alert_id, current[1])
+                    state[alert_type] = (alert_id, spec["priority"])
+
+            for alert_type in AUTO_RESOLVE_TYPES & (set(state) - set(wanted)):
+                alert_id, priority = state.pop(alert_type)
+                # Opened and cleared within the same batch: never persist it
+                if new_alerts.pop(alert_id, None) is None:
+                    escalated.pop(alert_id, None)
+                    plan.still_open.pop(alert_id, None)
+                    plan.previous_priority.setdefault(alert_id, priority)
+                    plan.to_resolve.append(alert_id)
+
+        plan.to_create = list(new_alerts.values())
+        plan.to_escalate = [
+            BinAlert(id=alert_id, priority=priority, message=message)
+            for alert_id, (priority, message) in escalated.items()
+        ]
+        return plan
+
+    def plan_open(self, entries):
+        """
+        Plan opening alerts that are not already open.
+
+        ``entries`` are (bin_id, sensor_id, spec) tuples, where ``spec`` has
+        the same shape as ``evaluate_sensor_reading_alerts`` output. Used by
+        callers that raise alerts without a reading, such as the heartbeat
+        sweeper.
+        """
+        entries = list(entries)
+        self.warm(bin_id for bin_id, _, _ in entries)
+
+        plan = AlertPlan()
+        planned = set()
+        for bin_id, sensor_id, spec in entries:
+            state = plan.state.get(bin_id)
+            if state is None:
+                state = plan.state[bin_id] = self.open_alerts(bin_id)
+            current = state.get(spec["alert_type"])
+            if current is not None:
+                if current[0] not in planned:
+                    plan.still_open[current[0]] = (bin_id, sensor_id, spec)
+                continue
+            alert = BinAlert(bin_id=bin_id, sensor_id=sensor_id, **spec)
+            plan.to_create.append(alert)
+            planned.add(alert.id)
+            state[spec["alert_type"]] = (alert.id, alert.priority)
+        return plan
+
+    def commit(self, plan):
+        """
+        Write a plan to the database.
+
+        Must be called inside the caller's transaction; the cache is only
+        updated once that transaction commits.
+        """
+        self._reconcile(plan)
+        if plan.to_create:
+            BinAlert.objects.bulk_create(plan.to_create)
+        if plan.to_escalate:
+            now = timezone.now()
+            for alert in plan.to_escalate:
+                alert.updated_at = now
+            BinAlert.objects.bulk_update(
+                plan.to_escalate, ["priority", "message", "updated_at"]
+            )
+        if plan.to_resolve:
+            # Only alerts still open count towards the fleet deltas
+            plan.to_resolve = resolve_related_alerts(alert_ids=plan.to_resolve)
+
+        transaction.on_commit(lambda: self._store(plan.state))
+        return plan.to_create
+
+    def _reconcile(self, plan):
+        """
+        Bring a plan made from the cache in line with the database.
+
+        With the affected bins locked: planned alerts already opened by
+        another worker are reused (and escalated if this plan needs a higher
+        priority), escalations use the stored priority, and alerts the cache
+        shows as open but which were resolved meanwhile are opened again.
+        """
+        bin_ids = {alert.bin_id for alert in plan.to_create}
+        bin_ids.update(bin_id for bin_id, _, _ in plan.still_open.values())
+        if not bin_ids and not plan.to_resolve:
+            return
+        bin_ids = sorted(bin_ids)
+        # Serialise check-then-insert with other workers opening alerts
+        list(
+            SmartBin.objects.select_for_update()
+            .filter(pk__in=bin_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+        open_by_type = {}
+        open_priority = {}
+        rows = BinAlert.objects.filter(
+            Q(bin_id__in=bin_ids) | Q(id__in=plan.to_resolve), is_resolved=False
+        ).values_list("bin_id", "alert_type", "id", "priority")
+        for bin_id, alert_type, alert_id, priority in rows:
+            open_priority[alert_id] = priority
+            current = open_by_type.get((bin_id, alert_type))
+            if current is None or PRIORITY_RANK[priority] > PRIORITY_RANK[current[1]]:
+                open_by_type[(bin_id, alert_type)] = (alert_id, priority)
+
+        for alert_id in plan.to_resolve:
+            if alert_id in open_priority:
+                plan.previous_priority[alert_id] = open_priority[alert_id]
+
+        escalations = {alert.id: alert for alert in plan.to_escalate}
+        for alert_id in list(escalations):
+            stored = open_priority.get(alert_id)
+            if stored is None:
+                continue
+            plan.previous_priority[alert_id] = stored
+            wanted = escalations[alert_id].priority
+            if PRIORITY_RANK[stored] >= PRIORITY_RANK[wanted]:
+                # Already escalated by another worker
+                del escalations[alert_id]
+                self._point_state(plan, alert_id, alert_id, stored)
+
+        to_create = []
+        for alert in plan.to_create:
+            found = open_by_type.get((alert.bin_id, alert.alert_type))
+            if found is None:
+                to_create.append(alert)
+            else:
+                self._adopt(plan, escalations, alert, found)
+
+        for alert_id, (bin_id, sensor_id, spec) in plan.still_open.items():
+            if alert_id in open_priority:
+                continue
+            # Resolved elsewhere while the cache still showed it as open
+            escalations.pop(alert_id, None)
+            plan.previous_priority.pop(alert_id, None)
+            alert = BinAlert(bin_id=bin_id, sensor_id=sensor_id, **spec)
+            priority = plan.state.get(bin_id, {}).get(spec["alert_type"])
+            if priority is not None and priority[0] == alert_id:
+                alert.priority = priority[1]
+            self._point_state(plan, alert_id, alert.id, alert.priority)
+            found = open_by_type.get((bin_id, alert.alert_type))
+            if found is not None:
+                self._adopt(plan, escalations, alert, found)
+            else:
+                to_create.append(alert)
+
+        plan.to_create = to_create
+        plan.to_escalate = list(escalations.values())
+
+    @staticmethod
+    def _point_state(plan, old_id, alert_id, priority):
+        """Replace ``old_id`` in the plan's resulting state"""
+        for open_alerts in plan.state.values():
+            for alert_type, (current_id, _) in open_alerts.items():
+                if current_id == old_id:
+                    open_alerts[alert_type] = (alert_id, priority)
+                    return
+
+    def _adopt(self, plan, escalations, alert, found):
+        """Use an alert already open in the database instead of ``alert``"""
+        existing_id, stored = found
+        priority = stored
+        if PRIORITY_RANK[alert.priority] > PRIORITY_RANK[stored]:
+            current = escalations.get(existing_id)
+            if (
+                current is None
+                or PRIORITY_RANK[alert.priority] > PRIORITY_RANK[current.priority]
+            ):
+                escalations[existing_id] = BinAlert(
+                    id=existing_id, priority=alert.priority, message=alert.message
+                )
+            plan.previous_priority[existing_id] = stored
+            priority = escalations[existing_id].priority
+        self._point_state(plan, alert.id, existing_id, priority)
+
+    def _store(self, state):
+        now = time.monotonic()
+        with self._lock:
+            for bin_id, open_alerts in state.items():
+                self._open[bin_id] = (now, open_alerts)
+
+
+alert_engine = AlertEngine()
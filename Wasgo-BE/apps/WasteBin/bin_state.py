@@ -0,0 +1,122 @@
+"""
+Last-known bin state cache shared by every worker.
+
+Holds the "live" part of each bin (fill level, status, battery, signal,
+online flag, position) keyed by bin ID in the Django cache. The ingestion
+path writes it through on commit, edits and the heartbeat sweeper
+invalidate it, and readers hydrate any number of bins with one
+``get_many`` round-trip, falling back to a single database query for misses.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SmartBin
+
+logger = logging.getLogger(__name__)
+
+
+def bin_state(bin_obj):
+    """Live state of a bin; battery and signal come from its sensor"""
+    sensor = bin_obj.sensor
+    location = bin_obj.location
+    return {
+        "bin_id": str(bin_obj.pk),
+        "fill_level": bin_obj.fill_level,
+        "fill_status": bin_obj.fill_status,
+        "status": bin_obj.status,
+        "is_online": bin_obj.current_online_status,
+        "battery_level": sensor.battery_level if sensor else None,
+        "signal_strength": sensor.signal_strength if sensor else None,
+        "temperature": bin_obj.temperature,
+        "humidity": bin_obj.humidity,
+        "lng": location.x if location else None,
+        "lat": location.y if location else None,
+        "last_reading_at": (
+            bin_obj.last_reading_at.isoformat() if bin_obj.last_reading_at else None
+        ),
+    }
+
+
+class BinStateCache:
+    """Write-through cache of ``bin_state`` dicts"""
+
+    KEY_PREFIX = "wastebin_bin_state:"
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, "SMART_BIN_STATE_CACHE_SECONDS", 3600)
+
+    def key(self, bin_id):
+        return f"{self.KEY_PREFIX}{bin_id}"
+
+    def store(self, bins):
+        """Write the current state of bins (with ``sensor`` loaded)"""
+        states = {self.key(bin_obj.pk): bin_state(bin_obj) for bin_obj in bins}
+        if states:
+            cache.set_many(states, self.timeout())
+
+    def get_many(self, bin_ids, loaded=None):
+        """
+        Return {bin_id: state} for the given bins.
+
+        Cache misses are filled from ``loaded`` (bin instances the caller
+        already has, with ``sensor`` joined) or else from one query, and
+        written back. Unknown bins are left out.
+        """
+        bin_ids = [str(bin_id) for bin_id in bin_ids]
+        if not bin_ids:
+            return {}
+
+        cached = cache.get_many([self.key(bin_id) for bin_id in bin_ids])
+        states = {}
+        missing = []
+        for bin_id in bin_ids:
+            state = cached.get(self.key(bin_id))
+            if state is None:
+                missing.append(bin_id)
+            else:
+                states[bin_id] = state
+
+        if missing:
+            loaded = {str(bin_obj.pk): bin_obj for bin_obj in loaded or []}
+            bins = [loaded[bin_id] for bin_id in missing if bin_id in loaded]
+            remaining = [bin_id for bin_id in missing if bin_id not in loaded]
+            if remaining:
+                bins += list(
+                    SmartBin.objects.filter(id__in=remaining).select_related("sensor")
+                )
+            fresh = {str(bin_obj.pk): bin_state(bin_obj) for bin_obj in bins}
+            if fresh:
+                cache.set_many(
+                    {self.key(bin_id): state for bin_id, state in fresh.items()},
+                    self.timeout(),
+                )
+            states.update(fresh)
+
+        return states
+
+    def invalidate(self, bin_ids):
+        keys = [self.key(bin_id) for bin_id in bin_ids]
+        if keys:
+            cache.delete_many(keys)
+
+
+bin_state_cache = BinStateCache()
+
+
+def store_bin_states(bins):
+    """Write-through hook for ``transaction.on_commit``; never raises"""
+    try:
+        bin_state_cache.store(bins)
+    except Exception:
+        logger.exception("Failed to update bin state cache")
+
+
+def invalidate_bin_states(bin_ids):
+    try:
+        bin_state_cache.invalidate(bin_ids)
+    except Exception:
+        logger.exception("Failed to invalidate bin state cache")
@@ -0,0 +1,132 @@
+"""
+Server-side clustering of smart bins for the map.
+
+Bins inside the requested bounding box (found through the GiST index on
+``location``) are snapped to a grid whose cell size follows the zoom level
+with ``ST_SnapToGrid`` and aggregated per cell in a single GROUP BY query.
+The number of clusters returned is bounded by the viewport size, not by the
+number of bins in the fleet.
+"""
+
+import math
+
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Polygon
+from django.db.models import (
+    Avg,
+    Case,
+    CharField,
+    Count,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Max,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+
+from .models import SmartBin
+
+# Grid cells per 256px map tile, i.e. clusters roughly 64px apart on screen
+CELLS_PER_TILE = 4
+# Hard cap on grid cells covered by one request
+MAX_CLUSTER_CELLS = 4096
+
+# Higher is worse; the worst status in a cluster is reported
+STATUS_SEVERITY = {
+    "active": 0,
+    "inactive": 1,
+    "full": 2,
+    "maintenance": 3,
+    "offline": 4,
+    "damaged": 5,
+}
+SEVERITY_STATUS = {rank: status for status, rank in STATUS_SEVERITY.items()}
+
+
+class SnapToGrid(Func):
+    function = "ST_SnapToGrid"
+    output_field = PointField(srid=4326)
+
+
+class PointX(Func):
+    function = "ST_X"
+    output_field = FloatField()
+
+
+class PointY(Func):
+    function = "ST_Y"
+    output_field = FloatField()
+
+
+def cell_size_for(bbox, zoom):
+    """
+    Grid cell size in degrees for a zoom level, grown if needed so the
+    bounding box spans at most MAX_CLUSTER_CELLS cells.
+    """
+    size = 360.0 / (2**zoom) / CELLS_PER_TILE
+    width = max(bbox[2] - bbox[0], size)
+    height = max(bbox[3] - bbox[1], size)
+    cells = (width / size) * (height / size)
+    if cells > MAX_CLUSTER_CELLS:
+        size *= math.sqrt(cells / MAX_CLUSTER_CELLS)
+    return size
+
+
+class BinClusterService:
+    """Aggregate bins into grid clusters for a bounding box and zoom level"""
+
+    @staticmethod
+    def clusters(queryset, bbox, zoom):
+        size = cell_size_for(bbox, zoom)
+        envelope = Polygon.from_bbox(bbox)
+        envelope.srid = 4326
+
+        severity = Case(
+            *[
+                When(status=status, then=Value(rank))
+                for status, rank in STATUS_SEVERITY.items()
+            ],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+        rows = (
+            queryset.filter(location__bboverlaps=envelope)
+            .annotate(cell=SnapToGrid(F("location"), Value(size)))
+            .values("cell")
+            .annotate(
+                count=Count("id"),
+                lng=Avg(PointX(F("location"))),
+                lat=Avg(PointY(F("location"))),
+                avg_fill_level=Avg("fill_level"),
+                max_fill_level=Max("fill_level"),
+                full_count=Count("id", filter=Q(fill_level__gte=80)),
+                offline_count=Count("id", filter=Q(status="offline")),
+                worst_severity=Max(severity),
+                # Only meaningful for single-bin clusters
+                any_bin_id=Max(Cast("id", output_field=CharField())),
+            )
+            .order_by()
+        )
+
+        clusters = []
+        for row in rows:
+            cluster = {
+                "lng": row["lng"],
+                "lat": row["lat"],
+                "count": row["count"],
+                "avg_fill_level": round(row["avg_fill_level"] or 0, 1),
+                "max_fill_level": row["max_fill_level"],
+                "full_count": row["full_count"],
+                "offline_count": row["offline_count"],
+                "worst_status": SEVERITY_STATUS.get(row["worst_severity"], "active"),
+            }
+            if row["count"] == 1:
+                cluster["bin_id"] = row["any_bin_id"]
+            clusters.append(cluster)
+
+        return {"zoom": zoom, "cell_size": size, "clusters": clusters}
@@ -3,20 +3,60 @@ WebSocket consumers for smart bin real-time updates
 """
 
 import json
+import math
+import uuid
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from .models import SmartBin, BinAlert, SensorReading
+from .bin_state import bin_state_cache
+from .dashboard import fleet_counters
+from .realtime import (
+    ALL_BINS_GROUP,
+    FLEET_DASHBOARD_GROUP,
+    MAX_VIEWPORT_CELLS,
+    bin_group_name,
+    cell_group_name,
+    cells_for_bbox,
+    clamp_bbox,
+    in_bbox,
+)
 
 User = get_user_model()
 
+# Upper bound on bins a single connection may subscribe to
+MAX_SUBSCRIBED_BINS = 1000
+
+
+def parse_bin_ids(values):
+    """Normalise client supplied bin IDs, dropping anything that is not a UUID"""
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    bin_ids = []
+    for value in values:
+        try:
+            bin_ids.append(str(uuid.UUID(str(value))))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return bin_ids
+
 
 class SmartBinConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time smart bin updates"""
 
     async def connect(self):
+        self.viewport = None
+        self.viewport_groups = []
+        # Bin IDs joined through subscribe messages, left again on disconnect
+        self.subscribed_bins = set()
         self.bin_id = self.scope["url_route"]["kwargs"].get("bin_id")
-        self.room_group_name = f"bin_{self.bin_id}" if self.bin_id else "smart_bins"
+        if self.bin_id:
+            # Match the canonical UUID form used when events are published
+            self.bin_id = (parse_bin_ids(self.bin_id) or [self.bin_id])[0]
+        self.room_group_name = (
+            bin_group_name(self.bin_id) if self.bin_id else ALL_BINS_GROUP
+        )
 
         # Join room group
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
@@ -25,17 +65,20 @@ class SmartBinConsumer(AsyncWebsocketConsumer):
 
         # Send initial bin data if specific bin
         if self.bin_id:
-            bin_data = await self.get_bin_data()
-            if bin_data:
+            bin_ids = parse_bin_ids(self.bin_id)
+            bins_data = await self.get_bins_data(bin_ids) if bin_ids else []
+            if bins_data:
                 await self.send(
                     text_data=json.dumps(
-                        {"type": "bin:status_change", "data": bin_data}
+                        {"type": "bin:status_change", "data": bins_data[0]}
                     )
                 )
 
     async def disconnect(self, close_code):
         # Leave room group
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        await self.remove_bin_subscriptions(list(self.subscribed_bins))
+        await self.clear_viewport()
 
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
@@ -46,20 +89,115 @@ class SmartBinConsumer(AsyncWebsocketConsumer):
             await self.subscribe_to_bin(data)
         elif message_type == "unsubscribe_bin":
             await self.unsubscribe_from_bin(data)
+        elif message_type == "subscribe_bins":
+            await self.subscribe_to_bins(data)
+        elif message_type == "unsubscribe_bins":
+            await self.unsubscribe_from_bins(data)
+        elif message_type == "subscribe_viewport":
+            await self.subscribe_to_viewport(data)
+        elif message_type == "unsubscribe_viewport":
+            await self.clear_viewport()
 
     async def subscribe_to_bin(self, data):
         """Subscribe to specific bin updates"""
-        bin_id = data.get("bin_id")
-        if bin_id:
-            room_name = f"bin_{bin_id}"
-            await self.channel_layer.group_add(room_name, self.channel_name)
+        await self.add_bin_subscriptions(parse_bin_ids(data.get("bin_id")))
 
     async def unsubscribe_from_bin(self, data):
         """Unsubscribe from specific bin updates"""
-        bin_id = data.get("bin_id")
-        if bin_id:
-            room_name = f"bin_{bin_id}"
-            await self.channel_layer.group_discard(room_name, self.channel_name)
+        await self.remove_bin_subscriptions(parse_bin_ids(data.get("bin_id")))
+
+    async def subscribe_to_bins(self, data):
+        """
+        Subscribe to many bins at once.
+
+        Answers with a single ``bin:snapshot`` message holding the current
+        state of every requested bin, read in one cache round-trip.
+        """
+        bin_ids = parse_bin_ids(data.get("bin_ids", []))
+        await self.add_bin_subscriptions(bin_ids)
+
+        requested = [bin_id for bin_id in bin_ids if bin_id in self.subscribed_bins]
+        bins_data = await self.get_bins_data(requested) if requested else []
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "bin:snapshot",
+                    "data": {
+                        "bins": bins_data,
+                        "subscribed": len(self.subscribed_bins),
+                        "limit": MAX_SUBSCRIBED_BINS,
+                    },
+                }
+            )
+        )
+
+    async def unsubscribe_from_bins(self, data):
+        """Unsubscribe from many bins at once"""
+        await self.remove_bin_subscriptions(parse_bin_ids(data.get("bin_ids", [])))
+
+    async def add_bin_subscriptions(self, bin_ids):
+        for bin_id in bin_ids:
+            if bin_id in self.subscribed_bins:
+                continue
+            if len(self.subscribed_bins) >= MAX_SUBSCRIBED_BINS:
+                break
+            await self.channel_layer.group_add(bin_group_name(bin_id), self.channel_name)
+            self.subscribed_bins.add(bin_id)
+
+    async def remove_bin_subscriptions(self, bin_ids):
+        for bin_id in bin_ids:
+            if bin_id not in self.subscribed_bins:
+                continue
+            self.subscribed_bins.discard(bin_id)
+            # The URL room group stays joined until disconnect
+            if bin_group_name(bin_id) != self.room_group_name:
+                await self.channel_layer.group_discard(
+                    bin_group_name(bin_id), self.channel_name
+                )
+
+    async def subscribe_to_viewport(self, data):
+        """
+        Only receive telemetry for bins inside a map bounding box.
+
+        ``bbox`` is [min_lng, min_lat, max_lng, max_lat]. Small viewports
+        join the grid cell groups covering them; viewports spanning more than
+        MAX_VIEWPORT_CELLS cells keep the fleet-wide stream and filter it.
+        """
+        try:
+            bbox = [float(value) for value in data.get("bbox", [])]
+        except (TypeError, ValueError):
+            bbox = []
+        if (
+            len(bbox) != 4
+            or not all(math.isfinite(value) for value in bbox)
+            or bbox[0] > bbox[2]
+            or bbox[1] > bbox[3]
+        ):
+            await self.send(
+                text_data=json.dumps(
+                    {
+                        "type": "error",
+                        "message": "bbox must be [min_lng, min_lat, max_lng, max_lat]",
+                    }
+                )
+            )
+            return
+
+        await self.clear_viewport()
+        self.viewport = clamp_bbox(bbox)
+
+        # None (too many cells): stay on the fleet stream and filter it
+        cells = cells_for_bbox(self.viewport, MAX_VIEWPORT_CELLS)
+        if cells is not None:
+            self.viewport_groups = [cell_group_name(cell) for cell in cells]
+            for group in self.viewport_groups:
+                await self.channel_layer.group_add(group, self.channel_name)
+
+    async def clear_viewport(self):
+        for group in self.viewport_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.viewport_groups = []
+        self.viewport = None
 
     # Handler methods for broadcasting events
     async def bin_fill_level_update(self, event):
@@ -82,6 +220,21 @@ class SmartBinConsumer(AsyncWebsocketConsumer):
             text_data=json.dumps({"type": "bin:status_change", "data": event["data"]})
         )
 
+    async def bin_telemetry(self, event):
+        """Handle batched live telemetry, filtered to the viewport if one is set"""
+        bins = event["data"]["bins"]
+        if self.viewport:
+            # Cell groups already cover the viewport; skip the fleet-wide copy
+            if event.get("scope") == "fleet" and self.viewport_groups:
+                return
+            bins = [item for item in bins if in_bbox(item, self.viewport)]
+            if not bins:
+                return
+
+        await self.send(
+            text_data=json.dumps({"type": "bin:telemetry", "data": {"bins": bins}})
+        )
+
     async def bin_sensor_data(self, event):
         """Handle real-time sensor data"""
         await self.send(
@@ -89,30 +242,17 @@ class SmartBinConsumer(AsyncWebsocketConsumer):
         )
 
     @database_sync_to_async
-    def get_bin_data(self):
-        """Get current bin data"""
-        try:
-            bin = SmartBin.objects.get(id=self.bin_id)
-            return {
-                "bin_id": bin.id,
-                "fill_level": bin.fill_level,
-                "status": bin.status,
-                "battery_level": bin.battery_level,
-                "signal_strength": bin.signal_strength,
-                "temperature": bin.temperature,
-                "humidity": bin.humidity,
-                "last_reading_at": (
-                    bin.last_reading_at.isoformat() if bin.last_reading_at else None
-                ),
-            }
-        except SmartBin.DoesNotExist:
-            return None
+    def get_bins_data(self, bin_ids):
+        """Current state of the given bins from the hot state cache"""
+        states = bin_state_cache.get_many(bin_ids)
+        return [states[bin_id] for bin_id in bin_ids if bin_id in states]
 
 
 class DashboardConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time dashboard updates"""
 
     async def connect(self):
+        self.fleet_subscribed = False
         self.user_id = (
             self.scope["user"].id if self.scope["user"].is_authenticated else None
         )
@@ -125,9 +265,17 @@ class DashboardConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Staff dashboards get pushed fleet counters instead of polling
+        if self.scope["user"].is_authenticated and self.scope["user"].is_staff:
+            await self.subscribe_to_fleet()
+
     async def disconnect(self, close_code):
         # Leave room group
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.fleet_subscribed:
+            await self.channel_layer.group_discard(
+                FLEET_DASHBOARD_GROUP, self.channel_name
+            )
 
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
@@ -140,9 +288,23 @@ class DashboardConsumer(AsyncWebsocketConsumer):
     async def subscribe_to_dashboard(self, data):
         """Subscribe to dashboard updates"""
         dashboard_type = data.get("dashboard_type", "general")
+        if dashboard_type == "fleet":
+            if self.scope["user"].is_authenticated and self.scope["user"].is_staff:
+                await self.subscribe_to_fleet()
+            return
         room_name = f"dashboard_{dashboard_type}_{self.user_id}"
         await self.channel_layer.group_add(room_name, self.channel_name)
 
+    async def subscribe_to_fleet(self):
+        """Join the fleet counters group and send the current counters"""
+        if not self.fleet_subscribed:
+            await self.channel_layer.group_add(FLEET_DASHBOARD_GROUP, self.channel_name)
+            self.fleet_subscribed = True
+        snapshot = await database_sync_to_async(fleet_counters.snapshot)()
+        await self.send(
+            text_data=json.dumps({"type": "dashboard:update", "data": snapshot})
+        )
+
     # Handler methods for broadcasting events
     async def dashboard_update(self, event):
         """Handle dashboard updates"""
@@ -0,0 +1,242 @@
+"""
+Incrementally maintained fleet counters pushed to ``DashboardConsumer``.
+
+Counters (bins by status / fill status / area, open alerts by priority) are
+seeded from the database with two grouped queries and then kept current by
+applying deltas as readings and alerts are committed. Changes are not pushed
+one by one: groups are marked dirty and a background publisher sends at most
+one ``dashboard_update`` per group per interval, carrying the latest counters.
+
+Counters live in the Django cache so every worker process applies its deltas
+to the same values. They are reseeded every ``SMART_BIN_COUNTERS_RESEED_SECONDS``
+(or after ``invalidate``) to bound drift from changes made outside the
+ingestion path.
+"""
+
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import SmartBin, BinAlert
+from .realtime import FLEET_DASHBOARD_GROUP
+
+logger = logging.getLogger(__name__)
+
+COUNTER_DIMENSIONS = {
+    "status": [choice for choice, _ in SmartBin.STATUS_CHOICES],
+    "fill_status": [choice for choice, _ in SmartBin.FILL_STATUS],
+    "alert_priority": [choice for choice, _ in BinAlert.PRIORITY_LEVELS],
+}
+
+
+class FleetCounters:
+    """Fleet aggregates stored as individual cache counters"""
+
+    PREFIX = "wastebin_counters"
+    SEEDED_KEY = f"{PREFIX}:seeded"
+    AREAS_KEY = f"{PREFIX}:areas"
+
+    @classmethod
+    def key(cls, dimension, value):
+        return f"{cls.PREFIX}:{dimension}:{value}"
+
+    @staticmethod
+    def reseed_seconds():
+        return getattr(settings, "SMART_BIN_COUNTERS_RESEED_SECONDS", 300)
+
+    def seed(self):
+        """Recompute every counter from the database and store it"""
+        values = {
+            self.key(dimension, value): 0
+            for dimension, choices in COUNTER_DIMENSIONS.items()
+            for value in choices
+        }
+        areas = {}
+
+        groups = (
+            SmartBin.objects.values("status", "fill_status", "area")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for group in groups:
+            status_key = self.key("status", group["status"])
+            fill_key = self.key("fill_status", group["fill_status"])
+            values[status_key] = values.get(status_key, 0) + group["count"]
+            values[fill_key] = values.get(fill_key, 0) + group["count"]
+            areas[group["area"]] = areas.get(group["area"], 0) + group["count"]
+
+        open_alerts = (
+            BinAlert.objects.filter(is_resolved=False)
+            .values("priority")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for group in open_alerts:
+            values[self.key("alert_priority", group["priority"])] = group["count"]
+
+        cache.set_many(values, None)
+        cache.set(self.AREAS_KEY, areas, None)
+        cache.set(self.SEEDED_KEY, timezone.now(), self.reseed_seconds())
+        return values, areas
+
+    def apply(self, deltas):
+        """
+        Apply ``{(dimension, value): delta}`` to the shared counters.
+
+        Skipped while the counters are due for a reseed, since the reseed
+        reads the already committed change.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas or cache.get(self.SEEDED_KEY) is None:
+            return
+        for (dimension, value), delta in deltas.items():
+            try:
+                cache.incr(self.key(dimension, value), delta)
+            except ValueError:
+                # Counter evicted or never seeded: rebuild on next read
+                self.invalidate()
+                return
+
+    def invalidate(self):
+        cache.delete(self.SEEDED_KEY)
+
+    def snapshot(self):
+        """Current counters, reseeding first when they are missing or expired"""
+        if cache.get(self.SEEDED_KEY) is None:
+            values, areas = self.seed()
+        else:
+            keys = [
+                self.key(dimension, value)
+                for dimension, choices in COUNTER_DIMENSIONS.items()
+                for value in choices
+            ]
+            values = cache.get_many(keys)
+            areas = cache.get(self.AREAS_KEY) or {}
+
+        def counts(dimension):
+            return {
+                value: values.get(self.key(dimension, value), 0)
+                for value in COUNTER_DIMENSIONS[dimension]
+            }
+
+        bins_by_status = counts("status")
+        alerts_by_priority = counts("alert_priority")
+        return {
+            "kind": "fleet_counters",
+            "total_bins": sum(bins_by_status.values()),
+            "bins_by_status": bins_by_status,
+            "bins_by_fill_status": counts("fill_status"),
+            "bins_by_area": areas,
+            "open_alerts": sum(alerts_by_priority.values()),
+            "open_alerts_by_priority": alerts_by_priority,
+            "generated_at": timezone.now().isoformat(),
+        }
+
+
+class DashboardPublisher:
+    """
+    Coalesce dashboard changes into at most one push per group per interval.
+
+    ``mark_dirty`` is cheap and can be called for every change; a daemon
+    thread wakes every ``interval`` seconds and sends the latest counters to
+    each dirty group. A cache lock per group keeps the rate limit across
+    worker processes; a group that loses the lock stays dirty and is retried
+    on the next tick, so the final state is always delivered.
+    """
+
+    def __init__(self, counters, interval=1.0):
+        self.counters = counters
+        self.interval = interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def mark_dirty(self, group=FLEET_DASHBOARD_GROUP):
+        with self._lock:
+            self._dirty.add(group)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="dashboard-publisher", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self):
+        """Send pending updates now, honouring the per-group rate limit"""
+        with self._lock:
+            groups, self._dirty = self._dirty, set()
+        if not groups:
+            return
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        pending = set()
+        snapshot = None
+        for group in groups:
+            throttle_key = f"{FleetCounters.PREFIX}:sent:{group}"
+            if not cache.add(throttle_key, 1, max(1, int(self.interval))):
+                pending.add(group)
+                continue
+            try:
+                if snapshot is None:
+                    snapshot = self.counters.snapshot()
+                async_to_sync(channel_layer.group_send)(
+                    group, {"type": "dashboard_update", "data": snapshot}
+                )
+            except Exception:
+                logger.exception("Failed to publish dashboard update to %s", group)
+
+        if pending:
+            with self._lock:
+                self._dirty |= pending
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Dashboard publisher flush failed")
+            finally:
+                # A reseed may have opened a connection on this thread
+                connection.close()
+            with self._lock:
+                if not self._dirty:
+                    self._thread = None
+                    return
+
+
+fleet_counters = FleetCounters()
+dashboard_publisher = DashboardPublisher(fleet_counters)
+
+
+def record_fleet_changes(deltas):
+    """
+    Apply counter deltas and schedule a dashboard push.
+
+    Meant for ``transaction.on_commit`` callbacks; failures are logged so
+    they never affect ingestion.
+    """
+    try:
+        fleet_counters.apply(deltas)
+        dashboard_publisher.mark_dirty()
+    except Exception:
+        logger.exception("Failed to record fleet counter changes")
+
+
+def invalidate_fleet_counters():
+    """Force a reseed (for changes made outside the ingestion path) and push"""
+    try:
+        fleet_counters.invalidate()
+        dashboard_publisher.mark_dirty()
+    except Exception:
+        logger.exception("Failed to invalidate fleet counters")
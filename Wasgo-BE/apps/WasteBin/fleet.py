@@ -0,0 +1,137 @@
+"""
+Fleet-wide smart bin summary used by the dashboard endpoints.
+
+The summary is computed with one grouped conditional-aggregation query over
+``smart_bins`` (plus one over ``bin_alerts``) and cached as a snapshot shared
+by every worker. A snapshot older than ``SMART_BIN_SUMMARY_CACHE_SECONDS`` is
+recomputed by a single worker while the others keep serving the previous
+one, so dashboards polling every few seconds do not each rescan the table.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import SmartBin, BinAlert
+
+logger = logging.getLogger(__name__)
+
+FULL_FILL_LEVEL = 80
+
+MAINTENANCE_CONDITION = (
+    Q(sensor__battery_level__lt=20)
+    | Q(sensor__signal_strength__lt=30)
+    | Q(status__in=["maintenance", "damaged"])
+)
+
+
+class FleetSummaryService:
+    """Compute and cache the fleet summary snapshot"""
+
+    CACHE_KEY = "wastebin_fleet_summary"
+    LOCK_KEY = "wastebin_fleet_summary_lock"
+
+    @staticmethod
+    def max_age():
+        return getattr(settings, "SMART_BIN_SUMMARY_CACHE_SECONDS", 10)
+
+    @staticmethod
+    def compute():
+        """
+        Build the summary from the database.
+
+        Bins are grouped by (area, status) with every counter computed as a
+        filtered aggregate in the same query; the groups are then folded into
+        fleet totals and the per-status/per-area breakdowns.
+        """
+        groups = (
+            SmartBin.objects.values("area", "status")
+            .annotate(
+                total=Count("id"),
+                full=Count("id", filter=Q(fill_level__gte=FULL_FILL_LEVEL)),
+                maintenance=Count("id", filter=MAINTENANCE_CONDITION),
+                fill_sum=Coalesce(Sum("fill_level"), 0),
+                weight_sum=Coalesce(Sum("current_weight_kg"), 0.0),
+            )
+            .order_by()
+        )
+
+        summary = {
+            "total_bins": 0,
+            "active_bins": 0,
+            "full_bins": 0,
+            "offline_bins": 0,
+            "maintenance_required": 0,
+            "average_fill_level": 0,
+            "total_weight_kg": 0.0,
+            "bins_by_status": {},
+            "bins_by_area": {},
+        }
+        fill_sum = 0
+        for group in groups:
+            total = group["total"]
+            bin_status = group["status"]
+            summary["total_bins"] += total
+            summary["full_bins"] += group["full"]
+            summary["maintenance_required"] += group["maintenance"]
+            summary["total_weight_kg"] += group["weight_sum"]
+            fill_sum += group["fill_sum"]
+            if bin_status == "active":
+                summary["active_bins"] += total
+            elif bin_status == "offline":
+                summary["offline_bins"] += total
+            by_status = summary["bins_by_status"]
+            by_status[bin_status] = by_status.get(bin_status, 0) + total
+            by_area = summary["bins_by_area"]
+            by_area[group["area"]] = by_area.get(group["area"], 0) + total
+
+        if summary["total_bins"]:
+            summary["average_fill_level"] = fill_sum / summary["total_bins"]
+
+        summary.update(
+            BinAlert.objects.aggregate(
+                open_alerts=Count("id", filter=Q(is_resolved=False)),
+                resolved_alerts=Count("id", filter=Q(is_resolved=True)),
+            )
+        )
+        summary["generated_at"] = timezone.now()
+        return summary
+
+    @staticmethod
+    def get_summary(force_refresh=False):
+        """
+        Return the cached snapshot, recomputing it when it is older than
+        ``max_age()`` seconds. Only the worker that wins the refresh lock
+        recomputes; concurrent callers get the previous snapshot meanwhile.
+        """
+        max_age = FleetSummaryService.max_age()
+        snapshot = None if force_refresh else cache.get(FleetSummaryService.CACHE_KEY)
+
+        if snapshot is not None:
+            age = (timezone.now() - snapshot["generated_at"]).total_seconds()
+            if age < max_age:
+                return snapshot
+
+        # With no snapshot to fall back on, compute even without the lock
+        acquired = cache.add(FleetSummaryService.LOCK_KEY, 1, max_age)
+        if not acquired and snapshot is not None:
+            return snapshot
+
+        try:
+            snapshot = FleetSummaryService.compute()
+        finally:
+            # Never release a lock held by another worker
+            if acquired:
+                cache.delete(FleetSummaryService.LOCK_KEY)
+
+        # Kept past max_age so stale reads are served while one worker refreshes
+        cache.set(FleetSummaryService.CACHE_KEY, snapshot, max_age * 6)
+        return snapshot
+
+    @staticmethod
+    def invalidate():
+        cache.delete(FleetSummaryService.CACHE_KEY)
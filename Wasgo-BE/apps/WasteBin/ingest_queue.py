@@ -0,0 +1,231 @@
+"""
+Asynchronous ingestion queue for IoT sensor readings.
+
+In ``async`` ingest mode the sensor-data endpoints validate the payload,
+append it to a queue and return 202 straight away. The
+``process_sensor_queue`` management command runs a worker pool that drains
+the queue in micro-batches through ``SensorIngestionService.ingest_batch``.
+"""
+
+import logging
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SensorIngestItem
+from .services import SensorIngestionService
+
+logger = logging.getLogger(__name__)
+
+
+def encode_payload(data):
+    """Make a validated sensor payload JSON-safe for storage in the queue"""
+    payload = dict(data)
+    if payload.get("timestamp") is not None:
+        payload["timestamp"] = payload["timestamp"].isoformat()
+    return payload
+
+
+def decode_payload(payload):
+    """Inverse of ``encode_payload``"""
+    data = dict(payload)
+    if data.get("timestamp"):
+        data["timestamp"] = parse_datetime(data["timestamp"])
+    return data
+
+
+class DatabaseIngestQueue:
+    """Durable outbox backed by the ``sensor_ingest_queue`` table"""
+
+    MAX_ATTEMPTS = 5
+    # Items claimed by a worker that died are handed out again after this
+    VISIBILITY_TIMEOUT = timedelta(minutes=5)
+
+    def enqueue(self, items):
+        """Append validated payloads to the queue, returning how many were added"""
+        rows = [SensorIngestItem(payload=encode_payload(item)) for item in items]
+        SensorIngestItem.objects.bulk_create(rows)
+        return len(rows)
+
+    def claim(self, batch_size):
+        """
+        Claim up to ``batch_size`` items for processing.
+
+        Uses ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers
+        never receive the same rows. Returns a list of (token, payload).
+        """
+        now = timezone.now()
+        stale_before = now - self.VISIBILITY_TIMEOUT
+
+        with transaction.atomic():
+            rows = list(
+                SensorIngestItem.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status="pending")
+                    | Q(status="processing", claimed_at__lt=stale_before)
+                )
+                .order_by("id")
+                .values_list("id", "payload")[:batch_size]
+            )
+            if rows:
+                SensorIngestItem.objects.filter(id__in=[r[0] for r in rows]).update(
+                    status="processing",
+                    claimed_at=now,
+                    attempts=F("attempts") + 1,
+                )
+        return rows
+
+    def ack(self, tokens):
+        """Remove successfully processed items"""
+        SensorIngestItem.objects.filter(id__in=tokens).delete()
+
+    def fail(self, tokens, error):
+        """Return items to the queue, parking them once they run out of attempts"""
+        SensorIngestItem.objects.filter(id__in=tokens).update(
+            status=Case(
+                When(attempts__gte=self.MAX_ATTEMPTS, then=Value("failed")),
+                default=Value("pending"),
+            ),
+            claimed_at=None,
+            last_error=error[:2000],
+        )
+
+    def pending_count(self):
+        return SensorIngestItem.objects.filter(status="pending").count()
+
+
+class InMemoryIngestQueue:
+    """In-process stand-in for the durable queue, intended for tests"""
+
+    MAX_ATTEMPTS = DatabaseIngestQueue.MAX_ATTEMPTS
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = deque()
+        self._in_flight = {}
+        self._next_token = 1
+        self.failed = []
+
+    def enqueue(self, items):
+        with self._lock:
+            for item in items:
+                self._items.append((self._next_token, encode_payload(item), 0))
+                self._next_token += 1
+        return len(items)
+
+    def claim(self, batch_size):
+        claimed = []
+        with self._lock:
+            while self._items and len(claimed) < batch_size:
+                token, payload, attempts = self._items.popleft()
+                self._in_flight[token] = (payload, attempts + 1)
+                claimed.append((token, payload))
+        return claimed
+
+    def ack(self, tokens):
+        with self._lock:
+            for token in tokens:
+                self._in_flight.pop(token, None)
+
+    def fail(self, tokens, error):
+        with self._lock:
+            for token in tokens:
+                # Unknown or already acked tokens are ignored, as in the database
+                entry = self._in_flight.pop(token, None)
+                if entry is None:
+                    continue
+                payload, attempts = entry
+                if attempts >= self.MAX_ATTEMPTS:
+                    self.failed.append((token, payload, error))
+                else:
+                    self._items.append((token, payload, attempts))
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._items)
+
+
+QUEUE_BACKENDS = {
+    "database": DatabaseIngestQueue,
+    "memory": InMemoryIngestQueue,
+}
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_ingest_queue():
+    """Return the process-wide ingest queue configured in settings"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                backend = getattr(settings, "SENSOR_INGEST_QUEUE_BACKEND", "database")
+                _queue = QUEUE_BACKENDS[backend]()
+    return _queue
+
+
+def is_async_ingest_enabled():
+    """Whether the sensor-data endpoints should enqueue instead of persisting"""
+    return getattr(settings, "SENSOR_INGEST_MODE", "sync") == "async"
+
+
+def ingest_claimed(queue, claimed):
+    """
+    Ingest claimed (token, payload) items, acking or failing each of them.
+
+    When a batch raises, it is split in halves and each half retried, so
+    only the items that fail on their own go back to the queue (and are
+    eventually parked) while the rest of the batch is persisted.
+    """
+    tokens = [token for token, _ in claimed]
+    items = [decode_payload(payload) for _, payload in claimed]
+
+    try:
+        results = SensorIngestionService.ingest_batch(items)
+    except Exception as e:
+        if len(claimed) > 1:
+            middle = len(claimed) // 2
+            logger.warning(
+                "Batch of %s sensor readings failed (%s); retrying in halves",
+                len(claimed),
+                e,
+            )
+            ingest_claimed(queue, claimed[:middle])
+            ingest_claimed(queue, claimed[middle:])
+            return
+        logger.exception("Failed to ingest queued sensor reading %s", tokens[0])
+        queue.fail(tokens, str(e))
+        return
+
+    # Unknown sensors will not succeed on retry, so they are logged and dropped
+    rejected = [r for r in results if r["status"] != "success"]
+    if rejected:
+        logger.warning(
+            "Dropped %s queued readings with no matching bin: %s",
+            len(rejected),
+            sorted({str(r["sensor_id"]) for r in rejected}),
+        )
+
+    queue.ack(tokens)
+
+
+def process_next_batch(queue=None, batch_size=500):
+    """
+    Claim and ingest one micro-batch from the queue.
+
+    Returns the number of items claimed (0 when the queue is empty).
+    """
+    queue = queue or get_ingest_queue()
+    claimed = queue.claim(batch_size)
+    if not claimed:
+        return 0
+
+    ingest_claimed(queue, claimed)
+    return len(claimed)
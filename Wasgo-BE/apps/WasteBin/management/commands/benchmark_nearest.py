@@ -0,0 +1,81 @@
+import time
+
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.core.management.base import BaseCommand
+
+from apps.ServiceRequest.models import RecyclingCenter
+from apps.WasteBin.models import SmartBin
+from utils.spatial import nearest
+
+TARGETS = {
+    "bins": (
+        lambda: SmartBin.objects.filter(status="active", is_public=True),
+        "location",
+        "smart_bins_location_geog_idx",
+    ),
+    "recycling-centres": (
+        lambda: RecyclingCenter.objects.filter(status="active"),
+        "coordinates",
+        "recycling_centers_coordinates_geog_idx",
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old Distance/distance__lte nearest query with the indexed "
+        "ST_DWithin + KNN query: timings and EXPLAIN ANALYZE plans"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--latitude", type=float, required=True)
+        parser.add_argument("--longitude", type=float, required=True)
+        parser.add_argument("--radius-km", type=float, default=2.0)
+        parser.add_argument("--limit", type=int, default=5)
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument(
+            "--target", choices=sorted(TARGETS), action="append",
+            help="Only benchmark this target; may be repeated (default: all)",
+        )
+        parser.add_argument(
+            "--plans", action="store_true", help="Print the full query plans"
+        )
+
+    def handle(self, *args, **options):
+        point = Point(options["longitude"], options["latitude"], srid=4326)
+        radius_km = options["radius_km"]
+        limit = options["limit"]
+
+        for target in options.get("target") or sorted(TARGETS):
+            base, field, index_name = TARGETS[target]
+            queries = {
+                "distance filter": lambda: (
+                    base()
+                    .annotate(distance=Distance(field, point))
+                    .filter(distance__lte=D(km=radius_km))
+                    .order_by("distance")[:limit]
+                ),
+                "dwithin + knn": lambda: nearest(
+                    base(), field, point, radius_km * 1000, limit
+                ),
+            }
+
+            self.stdout.write(self.style.MIGRATE_HEADING(target))
+            for label, build in queries.items():
+                # Warm up once so both variants run with a hot cache
+                list(build())
+                started = time.perf_counter()
+                for _ in range(options["runs"]):
+                    list(build())
+                avg_ms = (time.perf_counter() - started) * 1000 / options["runs"]
+
+                plan = build().explain(analyze=True, buffers=True)
+                uses_index = index_name in plan
+                self.stdout.write(
+                    f"  {label:<16} {avg_ms:8.2f} ms/query   "
+                    f"{index_name}: {'used' if uses_index else 'not used'}"
+                )
+                if options["plans"]:
+                    self.stdout.write(plan)
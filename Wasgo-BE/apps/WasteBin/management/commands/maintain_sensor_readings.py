@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.WasteBin import partitions
+from apps.WasteBin.models import SensorReading
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the partitioned sensor_readings table: create upcoming monthly "
+        "partitions, drop (or export then drop) expired ones and strip old raw_data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Create partitions this many months past the current one (default: 3)",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            default=getattr(settings, "SENSOR_READINGS_RETENTION_MONTHS", 12),
+            help="Drop partitions older than this many months (0 keeps everything)",
+        )
+        parser.add_argument(
+            "--export-dir",
+            type=str,
+            help="Export each expired partition to CSV in this directory before dropping it",
+        )
+        parser.add_argument(
+            "--strip-raw-after-days",
+            type=int,
+            default=getattr(settings, "SENSOR_READINGS_RAW_DATA_DAYS", 0),
+            help="Clear raw_data on readings older than this many days (0 disables)",
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError(
+                "sensor_readings is not partitioned; run the WasteBin migrations first"
+            )
+
+        created = partitions.ensure_partitions(
+            timezone.now(), months_ahead=options["months_ahead"]
+        )
+        self.stdout.write(f"Created {len(created)} partitions {created or ''}")
+
+        if options["retain_months"] > 0:
+            cutoff = partitions.add_months(
+                partitions.month_start(timezone.now()), -options["retain_months"]
+            )
+            dropped = partitions.drop_partitions_before(
+                cutoff, export_dir=options.get("export_dir")
+            )
+            self.stdout.write(
+                self.style.WARNING(f"Dropped {len(dropped)} partitions {dropped or ''}")
+            )
+
+        if options["strip_raw_after_days"] > 0:
+            stripped = self.strip_raw_data(
+                timezone.now() - timedelta(days=options["strip_raw_after_days"])
+            )
+            self.stdout.write(f"Cleared raw_data on {stripped} readings")
+
+    def strip_raw_data(self, cutoff):
+        """Null out raw_data before ``cutoff``, one month (partition) at a time"""
+        total = 0
+        for month, _ in partitions.list_partitions():
+            start, end = partitions.month_range(month)
+            if start >= cutoff:
+                break
+            total += SensorReading.objects.filter(
+                timestamp__gte=start,
+                timestamp__lt=min(end, cutoff),
+                raw_data__isnull=False,
+            ).update(raw_data=None)
+        return total
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.WasteBin.dashboard import dashboard_publisher
+from apps.WasteBin.ingest_queue import get_ingest_queue, process_next_batch
+from apps.WasteBin.realtime import telemetry_publisher
+
+
+class Command(BaseCommand):
+    help = "Drain the asynchronous sensor ingestion queue with a pool of workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of worker threads (default: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Readings claimed per micro-batch (default: 500)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the queue is empty (default: 1.0)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of running forever",
+        )
+
+    def handle(self, *args, **options):
+        self.queue = get_ingest_queue()
+        self.batch_size = options["batch_size"]
+        self.poll_interval = options["poll_interval"]
+        self.once = options["once"]
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self.processed_lock = threading.Lock()
+
+        workers = [
+            threading.Thread(target=self.run_worker, name=f"sensor-ingest-{i}")
+            for i in range(max(1, options["workers"]))
+        ]
+
+        self.stdout.write(
+            f"Starting {len(workers)} sensor ingest workers "
+            f"(batch size {self.batch_size})"
+        )
+        for worker in workers:
+            worker.start()
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            self.stop_event.set()
+            for worker in workers:
+                worker.join()
+
+        # Push any dashboard and telemetry changes still waiting for a tick
+        dashboard_publisher.flush()
+        telemetry_publisher.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {self.processed} queued sensor readings")
+        )
+
+    def run_worker(self):
+        """Claim and ingest micro-batches until stopped (or the queue is empty)"""
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                count = process_next_batch(self.queue, self.batch_size)
+                with self.processed_lock:
+                    self.processed += count
+
+                if count == 0:
+                    if self.once:
+                        return
+                    time.sleep(self.poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.WasteBin.rollups import RESOLUTIONS, ReadingRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuild hourly/daily sensor reading rollups from raw readings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=1,
+            help="Rebuild rollups for this many days back from now (default: 1)",
+        )
+        parser.add_argument(
+            "--since",
+            type=str,
+            help="Rebuild from this ISO date instead of --days (e.g. 2024-01-01)",
+        )
+        parser.add_argument(
+            "--resolution",
+            choices=RESOLUTIONS,
+            action="append",
+            help="Only rebuild this resolution; may be repeated (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        if options.get("since"):
+            try:
+                start = datetime.fromisoformat(options["since"].replace("Z", "+00:00"))
+            except ValueError:
+                raise CommandError("Invalid --since date. Use ISO format (YYYY-MM-DD)")
+            if timezone.is_naive(start):
+                start = timezone.make_aware(start)
+        else:
+            start = end - timedelta(days=options["days"])
+
+        resolutions = options.get("resolution") or RESOLUTIONS
+        written = ReadingRollupService.rebuild(start, end, resolutions)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} {'/'.join(resolutions)} rollups from {start:%Y-%m-%d}"
+            )
+        )
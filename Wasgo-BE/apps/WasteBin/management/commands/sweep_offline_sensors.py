@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.WasteBin.services import OnlineStatusService
+
+
+class Command(BaseCommand):
+    help = "Mark sensors and bins offline when they stop sending heartbeats"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missed-intervals",
+            type=int,
+            default=getattr(settings, "SENSOR_HEARTBEAT_MISSED_INTERVALS", 3),
+            help="Transmission intervals a sensor may miss before it is offline",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, sweeping every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="Seconds between sweeps when --loop is set (default: 60)",
+        )
+
+    def handle(self, *args, **options):
+        missed_intervals = options["missed_intervals"]
+
+        if not options["loop"]:
+            self.sweep(missed_intervals)
+            return
+
+        self.stdout.write(f"Sweeping for offline sensors every {options['interval']}s")
+        try:
+            while True:
+                close_old_connections()
+                self.sweep(missed_intervals)
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
+
+    def sweep(self, missed_intervals):
+        changes = OnlineStatusService.sweep_stale_sensors(missed_intervals)
+        if changes:
+            self.stdout.write(
+                self.style.WARNING(f"Marked {len(changes)} bins offline")
+            )
+        else:
+            self.stdout.write("No stale sensors found")
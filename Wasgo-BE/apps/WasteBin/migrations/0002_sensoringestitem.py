@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WasteBin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorIngestItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(help_text='Validated sensor payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('enqueued_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Ingest Item',
+                'verbose_name_plural': 'Sensor Ingest Items',
+                'db_table': 'sensor_ingest_queue',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='sensor_inge_status_b1f1ef_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WasteBin', '0002_sensoringestitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensor',
+            index=models.Index(fields=['last_data_transmission'], name='sensors_last_da_0200c8_idx'),
+        ),
+    ]
@@ -0,0 +1,137 @@
+"""
+Convert ``sensor_readings`` into a table partitioned by month on ``timestamp``.
+
+PostgreSQL requires the partition key in the primary key, so the table's
+primary key becomes (id, timestamp); ``id`` is still unique per reading and
+Django continues to treat it as the primary key.
+
+The DDL is inlined rather than taken from ``apps.WasteBin.partitions`` so
+that later changes to that module cannot alter this migration. Reversing it
+copies the rows back into an ordinary table with ``id`` as primary key.
+"""
+
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+DEFAULT_PARTITION = "sensor_readings_default"
+# Monthly partitions are created this far past the current month
+MONTHS_AHEAD = 3
+# Index names are schema-wide, so both directions drop them before reuse
+INDEXES = [
+    ("sensor_readings_bin_id_idx", "(bin_id)"),
+    ("sensor_readings_sensor_id_idx", "(sensor_id)"),
+    ("sensor_read_bin_id_b4d814_idx", '(bin_id, "timestamp" DESC)'),
+    ("sensor_read_timesta_56e803_idx", '("timestamp")'),
+]
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            ["sensor_readings"],
+        )
+        return cursor.fetchone() is not None
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def add_constraints_and_indexes(execute):
+    execute(
+        "ALTER TABLE sensor_readings ADD CONSTRAINT sensor_readings_bin_id_fk "
+        "FOREIGN KEY (bin_id) REFERENCES smart_bins (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute(
+        "ALTER TABLE sensor_readings ADD CONSTRAINT sensor_readings_sensor_id_fk "
+        "FOREIGN KEY (sensor_id) REFERENCES sensors (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    for name, columns in INDEXES:
+        execute(f"CREATE INDEX {name} ON sensor_readings {columns}")
+
+
+def partition_sensor_readings(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql" or is_partitioned(connection):
+        return
+
+    execute = schema_editor.execute
+    execute("ALTER TABLE sensor_readings RENAME TO sensor_readings_legacy")
+    # Free up names that the partitioned table reuses
+    execute(
+        "ALTER TABLE sensor_readings_legacy "
+        "RENAME CONSTRAINT sensor_readings_pkey TO sensor_readings_legacy_pkey"
+    )
+    for name, _ in INDEXES:
+        execute(f"DROP INDEX IF EXISTS {name}")
+    execute(
+        "CREATE TABLE sensor_readings (LIKE sensor_readings_legacy "
+        "INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (\"timestamp\")"
+    )
+    execute('ALTER TABLE sensor_readings ADD PRIMARY KEY (id, "timestamp")')
+    add_constraints_and_indexes(execute)
+    execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF sensor_readings DEFAULT")
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN("timestamp") FROM sensor_readings_legacy')
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+    # One partition per month from the oldest reading up to MONTHS_AHEAD
+    # past now; the default partition is still empty at this point
+    month = date(oldest.year, oldest.month, 1)
+    now = timezone.now()
+    last = add_months(date(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = add_months(month, 1)
+        execute(
+            f"CREATE TABLE sensor_readings_{month.year}{month.month:02d} "
+            f"PARTITION OF sensor_readings FOR VALUES "
+            f"FROM ('{month.isoformat()}T00:00:00+00:00') "
+            f"TO ('{following.isoformat()}T00:00:00+00:00')"
+        )
+        month = following
+
+    execute("INSERT INTO sensor_readings SELECT * FROM sensor_readings_legacy")
+    execute("DROP TABLE sensor_readings_legacy")
+
+
+def unpartition_sensor_readings(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql" or not is_partitioned(connection):
+        return
+
+    execute = schema_editor.execute
+    execute("ALTER TABLE sensor_readings RENAME TO sensor_readings_partitioned")
+    execute(
+        "ALTER TABLE sensor_readings_partitioned "
+        "RENAME CONSTRAINT sensor_readings_pkey TO sensor_readings_partitioned_pkey"
+    )
+    for name, _ in INDEXES:
+        execute(f"DROP INDEX IF EXISTS {name}")
+    execute(
+        "CREATE TABLE sensor_readings (LIKE sensor_readings_partitioned "
+        "INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    execute("ALTER TABLE sensor_readings ADD PRIMARY KEY (id)")
+    add_constraints_and_indexes(execute)
+    execute("INSERT INTO sensor_readings SELECT * FROM sensor_readings_partitioned")
+    # Drops every partition along with the parent
+    execute("DROP TABLE sensor_readings_partitioned")
+
+
+class Migration(migrations.Migration):
+
+    atomic = True
+
+    dependencies = [
+        ('WasteBin', '0003_sensor_last_data_transmission_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_sensor_readings, unpartition_sensor_readings),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WasteBin', '0004_partition_sensor_readings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day (UTC)')),
+                ('reading_count', models.PositiveIntegerField(default=0)),
+                ('fill_level_min', models.IntegerField()),
+                ('fill_level_max', models.IntegerField()),
+                ('fill_level_sum', models.BigIntegerField()),
+                ('weight_first_kg', models.FloatField(blank=True, null=True)),
+                ('weight_last_kg', models.FloatField(blank=True, null=True)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('battery_min', models.IntegerField()),
+                ('battery_max', models.IntegerField()),
+                ('battery_sum', models.BigIntegerField()),
+                ('first_reading_at', models.DateTimeField()),
+                ('last_reading_at', models.DateTimeField()),
+                ('bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_rollups', to='WasteBin.smartbin')),
+            ],
+            options={
+                'verbose_name': 'Sensor Reading Rollup',
+                'verbose_name_plural': 'Sensor Reading Rollups',
+                'db_table': 'sensor_reading_rollups',
+                'ordering': ['-bucket'],
+                'unique_together': {('bin', 'resolution', 'bucket')},
+            },
+        ),
+    ]
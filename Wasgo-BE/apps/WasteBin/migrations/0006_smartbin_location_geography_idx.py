@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    GiST index on location::geography, used by the ST_DWithin radius filter
+    and KNN (<->) ordering of nearest-bin queries (utils.spatial.nearest).
+    """
+
+    dependencies = [
+        ('WasteBin', '0005_sensorreadingrollup'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS smart_bins_location_geog_idx '
+                'ON smart_bins USING GIST ((location::geography));',
+            reverse_sql='DROP INDEX IF EXISTS smart_bins_location_geog_idx;',
+        ),
+    ]
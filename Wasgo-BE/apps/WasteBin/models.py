@@ -179,20 +179,24 @@ class SmartBin(Basemodel):
 
         return bin_number
 
+    @staticmethod
+    def fill_status_for(fill_level):
+        """Map a fill level percentage to its fill status"""
+        if fill_level >= 100:
+            return "overflow"
+        if fill_level >= 80:
+            return "full"
+        if fill_level >= 60:
+            return "high"
+        if fill_level >= 40:
+            return "medium"
+        if fill_level >= 20:
+            return "low"
+        return "empty"
+
     def update_fill_status(self):
         """Update fill status based on fill level"""
-        if self.fill_level >= 100:
-            self.fill_status = "overflow"
-        elif self.fill_level >= 80:
-            self.fill_status = "full"
-        elif self.fill_level >= 60:
-            self.fill_status = "high"
-        elif self.fill_level >= 40:
-            self.fill_status = "medium"
-        elif self.fill_level >= 20:
-            self.fill_status = "low"
-        else:
-            self.fill_status = "empty"
+        self.fill_status = self.fill_status_for(self.fill_level)
         self.save(update_fields=["fill_status"])
 
     def needs_collection(self):
@@ -230,7 +234,12 @@ class SmartBin(Basemodel):
 
     def check_and_set_online(self):
         """Set sensor as online if sensor is active"""
-        if self.sensor and self.sensor.is_active and self.sensor.signal_strength > 30:
+        if (
+            self.sensor
+            and self.sensor.is_active
+            and self.sensor.signal_strength > 30
+            and self.sensor.status != "offline"
+        ):
             self.is_online = True
         else:
             self.is_online = False
@@ -251,12 +260,32 @@ class SmartBin(Basemodel):
 
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def online_condition():
+        """Q expression matching bins whose sensor is currently online"""
+        return models.Q(
+            sensor__is_active=True, sensor__signal_strength__gt=30
+        ) & ~models.Q(sensor__status="offline")
+
+    @classmethod
+    def online_annotation(cls):
+        """Derived online flag for use with ``queryset.annotate(online_now=...)``"""
+        return models.Case(
+            models.When(cls.online_condition(), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        )
+
     @property
     def current_online_status(self):
         """Get current online status by checking sensor conditions"""
         if not self.sensor:
             return False
-        return self.sensor.is_active and self.sensor.signal_strength > 30
+        return (
+            self.sensor.is_active
+            and self.sensor.signal_strength > 30
+            and self.sensor.status != "offline"
+        )
 
     def __str__(self):
         return f"{self.name} - {self.bin_number} ({self.fill_level}%)"
@@ -538,11 +567,18 @@ class Sensor(Basemodel):
             models.Index(fields=["category"]),
             models.Index(fields=["battery_level"]),
             models.Index(fields=["signal_strength"]),
+            models.Index(fields=["last_data_transmission"]),
         ]
 
 
 class SensorReading(Basemodel):
-    """Historical sensor readings from smart bins"""
+    """
+    Historical sensor readings from smart bins.
+
+    Stored in a table range-partitioned by month on ``timestamp`` (see
+    ``apps.WasteBin.partitions``); filter on ``timestamp`` so queries only
+    scan the months they need.
+    """
 
     bin = models.ForeignKey(SmartBin, on_delete=models.CASCADE, related_name="readings")
     sensor = models.ForeignKey(
@@ -594,6 +630,75 @@ class SensorReading(Basemodel):
         ]
 
 
+class SensorReadingRollup(models.Model):
+    """Hourly and daily aggregates of sensor readings per bin"""
+
+    RESOLUTIONS = [
+        ("hour", "Hourly"),
+        ("day", "Daily"),
+    ]
+
+    bin = models.ForeignKey(
+        SmartBin, on_delete=models.CASCADE, related_name="reading_rollups"
+    )
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Start of the hour/day (UTC)")
+    reading_count = models.PositiveIntegerField(default=0)
+
+    # Fill level
+    fill_level_min = models.IntegerField()
+    fill_level_max = models.IntegerField()
+    fill_level_sum = models.BigIntegerField()
+
+    # Weight (first/last reported weight in the bucket)
+    weight_first_kg = models.FloatField(null=True, blank=True)
+    weight_last_kg = models.FloatField(null=True, blank=True)
+
+    # Temperature (not every reading reports one)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+    temperature_sum = models.FloatField(default=0)
+    temperature_count = models.PositiveIntegerField(default=0)
+
+    # Battery
+    battery_min = models.IntegerField()
+    battery_max = models.IntegerField()
+    battery_sum = models.BigIntegerField()
+
+    first_reading_at = models.DateTimeField()
+    last_reading_at = models.DateTimeField()
+
+    @property
+    def fill_level_avg(self):
+        return self.fill_level_sum / self.reading_count if self.reading_count else None
+
+    @property
+    def battery_avg(self):
+        return self.battery_sum / self.reading_count if self.reading_count else None
+
+    @property
+    def temperature_avg(self):
+        if not self.temperature_count:
+            return None
+        return self.temperature_sum / self.temperature_count
+
+    @property
+    def weight_delta_kg(self):
+        if self.weight_first_kg is None or self.weight_last_kg is None:
+            return None
+        return self.weight_last_kg - self.weight_first_kg
+
+    def __str__(self):
+        return f"{self.bin_id} - {self.resolution} - {self.bucket}"
+
+    class Meta:
+        db_table = "sensor_reading_rollups"
+        verbose_name = "Sensor Reading Rollup"
+        verbose_name_plural = "Sensor Reading Rollups"
+        ordering = ["-bucket"]
+        unique_together = [["bin", "resolution", "bucket"]]
+
+
 class BinAlert(Basemodel):
     """Alerts generated for bins requiring attention"""
 
@@ -663,3 +768,32 @@ class BinAlert(Basemodel):
         verbose_name = "Bin Alert"
         verbose_name_plural = "Bin Alerts"
         ordering = ["-created_at", "-priority"]
+
+
+class SensorIngestItem(models.Model):
+    """Durable queue of validated sensor payloads awaiting asynchronous ingestion"""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("failed", "Failed"),
+    ]
+
+    payload = models.JSONField(help_text="Validated sensor payload")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Ingest item {self.id} ({self.status})"
+
+    class Meta:
+        db_table = "sensor_ingest_queue"
+        verbose_name = "Sensor Ingest Item"
+        verbose_name_plural = "Sensor Ingest Items"
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
@@ -0,0 +1,183 @@
+"""
+Monthly range partitioning for the ``sensor_readings`` table.
+
+``sensor_readings`` is a PostgreSQL table partitioned by RANGE on
+``timestamp`` with one partition per calendar month
+(``sensor_readings_YYYYMM``) plus a ``sensor_readings_default`` partition
+that catches out-of-range device clocks. Queries filtered on ``timestamp``
+only touch the matching months, and old data is removed by dropping whole
+partitions instead of running large DELETEs.
+"""
+
+import logging
+import os
+import re
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "sensor_readings"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{PARENT_TABLE}_(\d{{4}})(\d{{2}})$")
+
+
+def month_start(value):
+    """First day of the month containing ``value`` (date or datetime)"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Shift a first-of-month date by ``count`` months"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_{month.year}{month.month:02d}"
+
+
+def month_range(month):
+    """Aware UTC datetimes bounding ``month`` as [start, end)"""
+    return (
+        datetime.combine(month, time.min, tzinfo=dt_timezone.utc),
+        datetime.combine(add_months(month, 1), time.min, tzinfo=dt_timezone.utc),
+    )
+
+
+def _bound(month):
+    """Partition bound literal for the start of ``month`` in UTC"""
+    return month_range(month)[0].isoformat()
+
+
+def is_partitioned(using=None):
+    """
+    Whether ``sensor_readings`` is a partitioned table on the ``using``
+    connection (the default database connection if not given)
+    """
+    using = using or connection
+    if using.vendor != "postgresql":
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return the monthly partitions as a sorted list of (month, table_name)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((date(int(match[1]), int(match[2]), 1), name))
+    return sorted(partitions)
+
+
+def create_partition(month, schema_editor=None):
+    """
+    Create the partition for ``month`` if it does not exist yet.
+
+    Rows for that month already sitting in the default partition are moved
+    into the new partition before it is attached, as PostgreSQL requires.
+    """
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    execute = schema_editor.execute if schema_editor else _execute
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                return False
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+                [lower, upper],
+            )
+            default_has_rows = cursor.fetchone()[0]
+
+        if not default_has_rows:
+            execute(
+                f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+        else:
+            execute(
+                f"CREATE TABLE {name} (LIKE {PARENT_TABLE} "
+                f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            execute(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE \"timestamp\" >= '{lower}' AND \"timestamp\" < '{upper}' "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            )
+            execute(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+
+    logger.info("Created sensor readings partition %s", name)
+    return True
+
+
+def ensure_partitions(start, months_ahead=3, schema_editor=None):
+    """Create monthly partitions from ``start`` up to ``months_ahead`` past now"""
+    month = month_start(start)
+    last = add_months(month_start(timezone.now()), months_ahead)
+    created = []
+    while month <= last:
+        if create_partition(month, schema_editor):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def export_partition(name, export_dir):
+    """Dump a partition to ``<export_dir>/<name>.csv`` using COPY"""
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"{name}.csv")
+    with connection.cursor() as cursor, open(path, "w", encoding="utf-8") as fh:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH CSV HEADER", fh)
+    return path
+
+
+def drop_partitions_before(cutoff_month, export_dir=None):
+    """
+    Detach and drop every monthly partition that ends on or before
+    ``cutoff_month``, exporting each one first when ``export_dir`` is given.
+
+    Returns the names of the dropped partitions.
+    """
+    dropped = []
+    for month, name in list_partitions():
+        if add_months(month, 1) > cutoff_month:
+            continue
+        if export_dir:
+            path = export_partition(name, export_dir)
+            logger.info("Exported %s to %s", name, path)
+        with transaction.atomic():
+            _execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+            _execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
+
+
+def _execute(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
@@ -0,0 +1,193 @@
+"""
+Helpers for pushing smart bin events to the websocket consumers
+"""
+
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ALL_BINS_GROUP = "smart_bins"
+# DashboardConsumer group receiving fleet counter updates (staff only)
+FLEET_DASHBOARD_GROUP = "dashboard_fleet"
+
+
+def bin_group_name(bin_id):
+    """Channel layer group used by SmartBinConsumer for a single bin"""
+    return f"bin_{bin_id}"
+
+
+def broadcast_bin_status_changes(changes):
+    """
+    Send a ``bin_status_change`` event for each changed bin.
+
+    Each change is a dict that must include ``bin_id``; it is delivered to
+    the bin's own group and to the fleet-wide ``smart_bins`` group.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not changes:
+        return
+
+    send = async_to_sync(channel_layer.group_send)
+    for change in changes:
+        event = {"type": "bin_status_change", "data": change}
+        try:
+            send(bin_group_name(change["bin_id"]), event)
+            send(ALL_BINS_GROUP, event)
+        except Exception:
+            logger.exception("Failed to broadcast status change for bin %s", change["bin_id"])
+
+
+# Map viewport subscriptions: telemetry is also sent to coarse lat/lng grid
+# cell groups so a client only joins the cells covering its viewport
+MAX_VIEWPORT_CELLS = 256
+
+
+def telemetry_cell_degrees():
+    return getattr(settings, "SMART_BIN_TELEMETRY_CELL_DEGREES", 0.05)
+
+
+def cell_for(lng, lat):
+    size = telemetry_cell_degrees()
+    return math.floor(lng / size), math.floor(lat / size)
+
+
+def cell_group_name(cell):
+    return f"bins_cell_{cell[0]}_{cell[1]}"
+
+
+def clamp_bbox(bbox):
+    """``bbox`` limited to valid longitudes and latitudes"""
+    return [
+        max(-180.0, min(180.0, bbox[0])),
+        max(-90.0, min(90.0, bbox[1])),
+        max(-180.0, min(180.0, bbox[2])),
+        max(-90.0, min(90.0, bbox[3])),
+    ]
+
+
+def cells_for_bbox(bbox, limit=MAX_VIEWPORT_CELLS):
+    """
+    Grid cells covering ``bbox`` (min_lng, min_lat, max_lng, max_lat), or
+    None when there are more than ``limit``. The count is checked before
+    any cell is built, so huge viewports cost nothing.
+    """
+    bbox = clamp_bbox(bbox)
+    min_x, min_y = cell_for(bbox[0], bbox[1])
+    max_x, max_y = cell_for(bbox[2], bbox[3])
+    if (max_x - min_x + 1) * (max_y - min_y + 1) > limit:
+        return None
+    return [
+        (x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)
+    ]
+
+
+def in_bbox(item, bbox):
+    lng, lat = item.get("lng"), item.get("lat")
+    if lng is None or lat is None:
+        return False
+    return bbox[0] <= lng <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+
+def bin_telemetry(bin_obj):
+    """Compact live state of a bin as sent to map clients"""
+    location = bin_obj.location
+    return {
+        "bin_id": str(bin_obj.pk),
+        "fill_level": bin_obj.fill_level,
+        "fill_status": bin_obj.fill_status,
+        "status": bin_obj.status,
+        "is_online": bin_obj.is_online,
+        "lng": location.x if location else None,
+        "lat": location.y if location else None,
+        "ts": bin_obj.last_reading_at.isoformat() if bin_obj.last_reading_at else None,
+    }
+
+
+class TelemetryPublisher:
+    """
+    Batch bin telemetry into one ``bin_telemetry`` message per group per window.
+
+    ``publish`` only records the latest state per bin, so several readings
+    for the same bin inside a window collapse into one update. Every window
+    a daemon thread sends the pending updates once to ``smart_bins``
+    (scope "fleet"), once per map grid cell (scope "cell") and once per bin
+    group (scope "bin").
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def window():
+        return getattr(settings, "SMART_BIN_TELEMETRY_WINDOW_SECONDS", 0.5)
+
+    def publish(self, bins):
+        with self._lock:
+            for bin_obj in bins:
+                self._pending[str(bin_obj.pk)] = bin_telemetry(bin_obj)
+            if self._pending and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(
+                    target=self._run, name="bin-telemetry-publisher", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        channel_layer = get_channel_layer()
+        if channel_layer is None or not pending:
+            return
+
+        send = async_to_sync(channel_layer.group_send)
+        updates = list(pending.values())
+
+        by_cell = {}
+        for update in updates:
+            if update["lng"] is not None and update["lat"] is not None:
+                cell = cell_for(update["lng"], update["lat"])
+                by_cell.setdefault(cell_group_name(cell), []).append(update)
+
+        messages = [(ALL_BINS_GROUP, "fleet", updates)]
+        messages += [(group, "cell", items) for group, items in by_cell.items()]
+        messages += [(bin_group_name(u["bin_id"]), "bin", [u]) for u in updates]
+
+        for group, scope, items in messages:
+            try:
+                send(
+                    group,
+                    {"type": "bin_telemetry", "scope": scope, "data": {"bins": items}},
+                )
+            except Exception:
+                logger.exception("Failed to publish bin telemetry to %s", group)
+
+    def _run(self):
+        while True:
+            time.sleep(self.window())
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Bin telemetry flush failed")
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+
+telemetry_publisher = TelemetryPublisher()
+
+
+def publish_bin_telemetry(bins):
+    """Queue bins for the next telemetry window (safe for ``on_commit``)"""
+    try:
+        telemetry_publisher.publish(bins)
+    except Exception:
+        logger.exception("Failed to queue bin telemetry")
@@ -0,0 +1,239 @@
+"""
+Hourly/daily rollups of sensor readings.
+
+Rollups are kept up to date incrementally by the ingestion path (one
+``INSERT ... ON CONFLICT DO UPDATE`` per batch) and can be rebuilt from the
+raw ``sensor_readings`` table with the ``rollup_sensor_readings`` command.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection
+
+from .models import SensorReadingRollup
+
+RESOLUTIONS = ("hour", "day")
+
+ROLLUP_TABLE = SensorReadingRollup._meta.db_table
+
+ROLLUP_COLUMNS = [
+    "bin_id",
+    "resolution",
+    "bucket",
+    "reading_count",
+    "fill_level_min",
+    "fill_level_max",
+    "fill_level_sum",
+    "weight_first_kg",
+    "weight_last_kg",
+    "temperature_min",
+    "temperature_max",
+    "temperature_sum",
+    "temperature_count",
+    "battery_min",
+    "battery_max",
+    "battery_sum",
+    "first_reading_at",
+    "last_reading_at",
+]
+
+# Merge a partial aggregate into an existing bucket
+MERGE_ASSIGNMENTS = """
+    reading_count = r.reading_count + EXCLUDED.reading_count,
+    fill_level_min = LEAST(r.fill_level_min, EXCLUDED.fill_level_min),
+    fill_level_max = GREATEST(r.fill_level_max, EXCLUDED.fill_level_max),
+    fill_level_sum = r.fill_level_sum + EXCLUDED.fill_level_sum,
+    weight_first_kg = CASE WHEN EXCLUDED.first_reading_at < r.first_reading_at
+        THEN COALESCE(EXCLUDED.weight_first_kg, r.weight_first_kg)
+        ELSE COALESCE(r.weight_first_kg, EXCLUDED.weight_first_kg) END,
+    weight_last_kg = CASE WHEN EXCLUDED.last_reading_at >= r.last_reading_at
+        THEN COALESCE(EXCLUDED.weight_last_kg, r.weight_last_kg)
+        ELSE COALESCE(r.weight_last_kg, EXCLUDED.weight_last_kg) END,
+    temperature_min = LEAST(r.temperature_min, EXCLUDED.temperature_min),
+    temperature_max = GREATEST(r.temperature_max, EXCLUDED.temperature_max),
+    temperature_sum = r.temperature_sum + EXCLUDED.temperature_sum,
+    temperature_count = r.temperature_count + EXCLUDED.temperature_count,
+    battery_min = LEAST(r.battery_min, EXCLUDED.battery_min),
+    battery_max = GREATEST(r.battery_max, EXCLUDED.battery_max),
+    battery_sum = r.battery_sum + EXCLUDED.battery_sum,
+    first_reading_at = LEAST(r.first_reading_at, EXCLUDED.first_reading_at),
+    last_reading_at = GREATEST(r.last_reading_at, EXCLUDED.last_reading_at)
+"""
+
+# Replace a bucket with a freshly computed aggregate
+REPLACE_ASSIGNMENTS = ",\n".join(
+    f"    {column} = EXCLUDED.{column}" for column in ROLLUP_COLUMNS[3:]
+)
+
+
+def truncate(value, resolution):
+    """Start of the UTC hour/day containing ``value``"""
+    value = value.astimezone(dt_timezone.utc)
+    if resolution == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class ReadingRollupService:
+    """Maintain and rebuild ``SensorReadingRollup`` rows"""
+
+    @staticmethod
+    def aggregate(readings):
+        """
+        Fold readings into partial rollups keyed by (bin_id, resolution, bucket).
+
+        Pure Python; used to turn an ingestion batch into one upsert.
+        """
+        buckets = {}
+        for reading in readings:
+            for resolution in RESOLUTIONS:
+                key = (reading.bin_id, resolution, truncate(reading.timestamp, resolution))
+                agg = buckets.get(key)
+                if agg is None:
+                    agg = buckets[key] = {
+                        "reading_count": 0,
+                        "fill_level_min": reading.fill_level,
+                        "fill_level_max": reading.fill_level,
+                        "fill_level_sum": 0,
+                        "weight_first": None,
+                        "weight_last": None,
+                        "temperature_min": None,
+                        "temperature_max": None,
+                        "temperature_sum": 0.0,
+                        "temperature_count": 0,
+                        "battery_min": reading.battery_level,
+                        "battery_max": reading.battery_level,
+                        "battery_sum": 0,
+                        "first_reading_at": reading.timestamp,
+                        "last_reading_at": reading.timestamp,
+                    }
+
+                agg["reading_count"] += 1
+                agg["fill_level_min"] = min(agg["fill_level_min"], reading.fill_level)
+                agg["fill_level_max"] = max(agg["fill_level_max"], reading.fill_level)
+                agg["fill_level_sum"] += reading.fill_level
+                agg["battery_min"] = min(agg["battery_min"], reading.battery_level)
+                agg["battery_max"] = max(agg["battery_max"], reading.battery_level)
+                agg["battery_sum"] += reading.battery_level
+                agg["first_reading_at"] = min(agg["first_reading_at"], reading.timestamp)
+                agg["last_reading_at"] = max(agg["last_reading_at"], reading.timestamp)
+
+                if reading.weight_kg is not None:
+                    first = agg["weight_first"]
+                    last = agg["weight_last"]
+                    if first is None or reading.timestamp < first[0]:
+                        agg["weight_first"] = (reading.timestamp, reading.weight_kg)
+                    if last is None or reading.timestamp >= last[0]:
+                        agg["weight_last"] = (reading.timestamp, reading.weight_kg)
+
+                if reading.temperature is not None:
+                    agg["temperature_min"] = (
+                        reading.temperature
+                        if agg["temperature_min"] is None
+                        else min(agg["temperature_min"], reading.temperature)
+                    )
+                    agg["temperature_max"] = (
+                        reading.temperature
+                        if agg["temperature_max"] is None
+                        else max(agg["temperature_max"], reading.temperature)
+                    )
+                    agg["temperature_sum"] += reading.temperature
+                    agg["temperature_count"] += 1
+        return buckets
+
+    @staticmethod
+    def apply_readings(readings):
+        """
+        Merge newly inserted readings into their hourly and daily buckets.
+
+        Issues a single upsert for the whole batch; call it inside the
+        transaction that inserts the readings.
+        """
+        buckets = ReadingRollupService.aggregate(readings)
+        if not buckets:
+            return 0
+
+        rows = []
+        # Rows in conflict-key order so concurrent upserts lock them consistently
+        for (bin_id, resolution, bucket), agg in sorted(buckets.items()):
+            rows.append(
+                [
+                    bin_id,
+                    resolution,
+                    bucket,
+                    agg["reading_count"],
+                    agg["fill_level_min"],
+                    agg["fill_level_max"],
+                    agg["fill_level_sum"],
+                    agg["weight_first"][1] if agg["weight_first"] else None,
+                    agg["weight_last"][1] if agg["weight_last"] else None,
+                    agg["temperature_min"],
+                    agg["temperature_max"],
+                    agg["temperature_sum"],
+                    agg["temperature_count"],
+                    agg["battery_min"],
+                    agg["battery_max"],
+                    agg["battery_sum"],
+                    agg["first_reading_at"],
+                    agg["last_reading_at"],
+                ]
+            )
+
+        placeholders = "(" + ", ".join(["%s"] * len(ROLLUP_COLUMNS)) + ")"
+        sql = (
+            f"INSERT INTO {ROLLUP_TABLE} AS r ({', '.join(ROLLUP_COLUMNS)}) "
+            f"VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT (bin_id, resolution, bucket) DO UPDATE SET {MERGE_ASSIGNMENTS}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for row in rows for value in row])
+        return len(rows)
+
+    @staticmethod
+    def rebuild(start, end, resolutions=RESOLUTIONS):
+        """
+        Recompute every bucket overlapping [start, end) from raw readings.
+
+        The range is widened to whole days so partially covered buckets are
+        rebuilt completely. Returns the number of rollup rows written.
+        """
+        start = truncate(start, "day")
+        end = truncate(end, "day") + timedelta(days=1)
+
+        written = 0
+        with connection.cursor() as cursor:
+            for resolution in resolutions:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {ROLLUP_TABLE} AS r ({', '.join(ROLLUP_COLUMNS)})
+                    SELECT
+                        bin_id,
+                        %s,
+                        date_trunc(%s, "timestamp" AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                        COUNT(*),
+                        MIN(fill_level),
+                        MAX(fill_level),
+                        SUM(fill_level),
+                        (ARRAY_AGG(weight_kg ORDER BY "timestamp")
+                            FILTER (WHERE weight_kg IS NOT NULL))[1],
+                        (ARRAY_AGG(weight_kg ORDER BY "timestamp" DESC)
+                            FILTER (WHERE weight_kg IS NOT NULL))[1],
+                        MIN(temperature),
+                        MAX(temperature),
+                        COALESCE(SUM(temperature), 0),
+                        COUNT(temperature),
+                        MIN(battery_level),
+                        MAX(battery_level),
+                        SUM(battery_level),
+                        MIN("timestamp"),
+                        MAX("timestamp")
+                    FROM sensor_readings
+                    WHERE "timestamp" >= %s AND "timestamp" < %s
+                    GROUP BY 1, 3
+                    ON CONFLICT (bin_id, resolution, bucket) DO UPDATE SET
+                    {REPLACE_ASSIGNMENTS}
+                    """,
+                    [resolution, resolution, start, end],
+                )
+                written += cursor.rowcount
+        return written
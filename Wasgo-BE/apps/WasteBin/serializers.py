@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from django.contrib.auth import get_user_model
-from .models import BinType, SmartBin, Sensor, SensorReading, BinAlert
+from django.utils import timezone
+from datetime import timedelta
+from .models import (
+    BinType,
+    SmartBin,
+    Sensor,
+    SensorReading,
+    SensorReadingRollup,
+    BinAlert,
+)
 
 User = get_user_model()
 
@@ -12,6 +21,18 @@ class BinTypeSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+READINGS_WINDOW_DEFAULT = 50
+READINGS_WINDOW_MAX = 500
+
+
+def readings_count_for(sensor):
+    """Reading count from the ``readings_total`` annotation, falling back to a COUNT"""
+    count = getattr(sensor, "readings_total", None)
+    if count is None:
+        count = sensor.readings.count()
+    return count
+
+
 class SensorSerializer(serializers.ModelSerializer):
     """Serializer for Sensor model"""
 
@@ -36,10 +57,17 @@ class SensorSerializer(serializers.ModelSerializer):
 
     def get_readings_count(self, obj):
         """Get the number of readings for this sensor"""
-        return obj.readings.count()
+        return readings_count_for(obj)
 
 
 class SensorReadingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for SensorReading.
+
+    Reads ``bin`` and ``sensor`` for display fields, so querysets passed in
+    should use ``select_related("bin", "sensor")``.
+    """
+
     bin_name = serializers.CharField(source="bin.name", read_only=True)
     bin_number = serializers.CharField(source="bin.bin_number", read_only=True)
     sensor_number = serializers.CharField(source="sensor.sensor_number", read_only=True)
@@ -59,25 +87,24 @@ class SensorReadingSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["created_at", "updated_at"]
 
+    def _bin_location(self, obj):
+        return obj.bin.location if obj.bin_id and obj.bin else None
+
     def get_latitude(self, obj):
         """Get latitude from bin location"""
-        if obj.bin and obj.bin.location:
-            return obj.bin.location.y  # Django PointField uses y for latitude
-        return None
+        location = self._bin_location(obj)
+        return location.y if location else None  # Django PointField uses y for latitude
 
     def get_longitude(self, obj):
         """Get longitude from bin location"""
-        if obj.bin and obj.bin.location:
-            return obj.bin.location.x  # Django PointField uses x for longitude
-        return None
+        location = self._bin_location(obj)
+        return location.x if location else None  # Django PointField uses x for longitude
 
     def get_location(self, obj):
         """Get location as GeoJSON point"""
-        if obj.bin and obj.bin.location:
-            return {
-                "type": "Point",
-                "coordinates": [obj.bin.location.x, obj.bin.location.y],
-            }
+        location = self._bin_location(obj)
+        if location:
+            return {"type": "Point", "coordinates": [location.x, location.y]}
         return None
 
     def get_raw_latitude(self, obj):
@@ -93,6 +120,37 @@ class SensorReadingSerializer(serializers.ModelSerializer):
         return None
 
 
+class SensorReadingRollupSerializer(serializers.ModelSerializer):
+    """Hourly/daily aggregate of a bin's sensor readings"""
+
+    fill_level_avg = serializers.FloatField(read_only=True)
+    battery_avg = serializers.FloatField(read_only=True)
+    temperature_avg = serializers.FloatField(read_only=True)
+    weight_delta_kg = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SensorReadingRollup
+        fields = [
+            "bucket",
+            "resolution",
+            "reading_count",
+            "fill_level_min",
+            "fill_level_max",
+            "fill_level_avg",
+            "weight_first_kg",
+            "weight_last_kg",
+            "weight_delta_kg",
+            "temperature_min",
+            "temperature_max",
+            "temperature_avg",
+            "battery_min",
+            "battery_max",
+            "battery_avg",
+            "first_reading_at",
+            "last_reading_at",
+        ]
+
+
 class SensorDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for Sensor with readings"""
 
@@ -111,9 +169,7 @@ class SensorDetailSerializer(serializers.ModelSerializer):
     readings_count = serializers.SerializerMethodField()
     recent_readings = serializers.SerializerMethodField()
     assigned_bin = serializers.SerializerMethodField()
-    sensor_readings = SensorReadingSerializer(
-        source="readings", many=True, read_only=True
-    )
+    sensor_readings = serializers.SerializerMethodField()
 
     class Meta:
         model = Sensor
@@ -122,7 +178,32 @@ class SensorDetailSerializer(serializers.ModelSerializer):
 
     def get_readings_count(self, obj):
         """Get the number of readings for this sensor"""
-        return obj.readings.count()
+        return readings_count_for(obj)
+
+    def get_sensor_readings(self, obj):
+        """
+        A bounded window of readings, newest first.
+
+        ``readings_limit`` (default 50, max 500) sets the window size and
+        ``readings_before`` (ISO timestamp) pages back past the oldest
+        reading already returned.
+        """
+        request = self.context.get("request")
+        params = request.query_params if request else {}
+
+        try:
+            limit = int(params.get("readings_limit", READINGS_WINDOW_DEFAULT))
+        except (TypeError, ValueError):
+            limit = READINGS_WINDOW_DEFAULT
+        limit = max(0, min(limit, READINGS_WINDOW_MAX))
+
+        readings = obj.readings.select_related("bin", "sensor").order_by("-timestamp")
+        before = params.get("readings_before")
+        if before:
+            before = serializers.DateTimeField().to_internal_value(before)
+            readings = readings.filter(timestamp__lt=before)
+
+        return SensorReadingSerializer(readings[:limit], many=True).data
 
     def get_recent_readings(self, obj):
         """Get recent readings for this sensor"""
@@ -165,6 +246,11 @@ class SensorDetailSerializer(serializers.ModelSerializer):
         return None
 
 
+def live_state(serializer, obj):
+    """Hot-cache state for ``obj`` if the view passed ``bin_states`` in the context"""
+    return serializer.context.get("bin_states", {}).get(str(obj.pk))
+
+
 class SmartBinSerializer(GeoFeatureModelSerializer):
     """Serializer for SmartBin with geospatial support"""
 
@@ -214,9 +300,11 @@ class SmartBinSerializer(GeoFeatureModelSerializer):
 
     def get_is_online(self, obj):
         """Get current online status"""
-        # Update the online status and return it
-        obj.check_and_set_online()
-        return obj.is_online
+        # Prefer the value annotated by the queryset (no extra query)
+        online_now = getattr(obj, "online_now", None)
+        if online_now is not None:
+            return online_now
+        return obj.current_online_status
 
 
 class SmartBinListSerializer(GeoFeatureModelSerializer):
@@ -262,17 +350,24 @@ class SmartBinListSerializer(GeoFeatureModelSerializer):
 
     def get_battery_level(self, obj):
         """Get battery level from sensor if available"""
-        return obj.get_battery_level()
+        state = live_state(self, obj)
+        return state["battery_level"] if state else obj.get_battery_level()
 
     def get_signal_strength(self, obj):
         """Get signal strength from sensor if available"""
-        return obj.get_signal_strength()
+        state = live_state(self, obj)
+        return state["signal_strength"] if state else obj.get_signal_strength()
 
     def get_is_online(self, obj):
         """Get current online status"""
-        # Update the online status and return it
-        obj.check_and_set_online()
-        return obj.is_online
+        state = live_state(self, obj)
+        if state:
+            return state["is_online"]
+        # Prefer the value annotated by the queryset (no extra query)
+        online_now = getattr(obj, "online_now", None)
+        if online_now is not None:
+            return online_now
+        return obj.current_online_status
 
 
 class SmartBinListJSONSerializer(serializers.ModelSerializer):
@@ -320,11 +415,13 @@ class SmartBinListJSONSerializer(serializers.ModelSerializer):
 
     def get_battery_level(self, obj):
         """Get battery level from sensor if available"""
-        return obj.get_battery_level()
+        state = live_state(self, obj)
+        return state["battery_level"] if state else obj.get_battery_level()
 
     def get_signal_strength(self, obj):
         """Get signal strength from sensor if available"""
-        return obj.get_signal_strength()
+        state = live_state(self, obj)
+        return state["signal_strength"] if state else obj.get_signal_strength()
 
     def get_latitude(self, obj):
         """Get latitude from location"""
@@ -340,9 +437,14 @@ class SmartBinListJSONSerializer(serializers.ModelSerializer):
 
     def get_is_online(self, obj):
         """Get current online status"""
-        # Update the online status and return it
-        obj.check_and_set_online()
-        return obj.is_online
+        state = live_state(self, obj)
+        if state:
+            return state["is_online"]
+        # Prefer the value annotated by the queryset (no extra query)
+        online_now = getattr(obj, "online_now", None)
+        if online_now is not None:
+            return online_now
+        return obj.current_online_status
 
 
 class SensorDataInputSerializer(serializers.Serializer):
@@ -408,3 +510,49 @@ class NearestBinSerializer(serializers.Serializer):
     radius_km = serializers.FloatField(default=2.0)
     bin_type = serializers.CharField(required=False)
     max_results = serializers.IntegerField(default=5, max_value=20)
+
+
+class ReadingTimeSeriesQuerySerializer(serializers.Serializer):
+    """Query parameters for the bin readings time series"""
+
+    hours = serializers.IntegerField(default=24, min_value=1)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    points = serializers.IntegerField(required=False, min_value=3, max_value=10000)
+
+    def validate(self, data):
+        end = data.get("end") or timezone.now()
+        start = data.get("start") or end - timedelta(hours=data["hours"])
+        if start >= end:
+            raise serializers.ValidationError("start must be before end")
+        data["start"] = start
+        data["end"] = end
+        return data
+
+
+class BinClusterQuerySerializer(serializers.Serializer):
+    """Query parameters for the bin map clustering endpoint"""
+
+    bbox = serializers.CharField(
+        help_text="min_lng,min_lat,max_lng,max_lat of the visible map area"
+    )
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+    status = serializers.CharField(required=False)
+    bin_type = serializers.CharField(required=False)
+
+    def validate_bbox(self, value):
+        try:
+            bbox = [float(part) for part in value.split(",")]
+        except ValueError:
+            bbox = []
+        if (
+            len(bbox) != 4
+            or bbox[0] >= bbox[2]
+            or bbox[1] >= bbox[3]
+            or not (-180 <= bbox[0] <= 180 and -180 <= bbox[2] <= 180)
+            or not (-90 <= bbox[1] <= 90 and -90 <= bbox[3] <= 90)
+        ):
+            raise serializers.ValidationError(
+                "bbox must be min_lng,min_lat,max_lng,max_lat"
+            )
+        return bbox
@@ -0,0 +1,506 @@
+"""
+Sensor data ingestion services for the WasteBin app
+"""
+
+import logging
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .alerts import alert_engine
+from .bin_state import invalidate_bin_states, store_bin_states
+from .dashboard import record_fleet_changes
+from .models import SmartBin, Sensor, SensorReading
+from .realtime import broadcast_bin_status_changes, publish_bin_telemetry
+from .rollups import ReadingRollupService
+from .tiles import invalidate_tiles
+
+logger = logging.getLogger(__name__)
+
+
+class SensorIngestionService:
+    """Persist IoT sensor readings and keep bin/sensor state up to date"""
+
+    MAX_BATCH_SIZE = 1000
+
+    # Columns touched on SmartBin / Sensor when a reading is applied
+    BIN_UPDATE_FIELDS = [
+        "fill_level",
+        "fill_status",
+        "current_weight_kg",
+        "temperature",
+        "humidity",
+        "status",
+        "is_online",
+        "last_reading_at",
+        "updated_at",
+    ]
+    SENSOR_UPDATE_FIELDS = [
+        "status",
+        "battery_level",
+        "signal_strength",
+        "last_data_transmission",
+        "updated_at",
+    ]
+
+    @staticmethod
+    def _parse_sensor_id(value):
+        """Return the sensor primary key as a UUID, or None if malformed"""
+        try:
+            return uuid.UUID(str(value))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def get_bins_for_sensors(sensor_ids, lock=False):
+        """
+        Resolve the bins for a set of sensor IDs in a single query.
+
+        With ``lock`` the bin rows are locked (``SELECT ... FOR UPDATE``, in
+        primary key order so concurrent batches cannot deadlock) until the
+        surrounding transaction ends.
+
+        Returns a dict mapping the sensor UUID to its SmartBin (with the
+        sensor already joined).
+        """
+        if not sensor_ids:
+            return {}
+        bins = SmartBin.objects.select_related("sensor").filter(
+            sensor_id__in=sensor_ids
+        )
+        if lock:
+            bins = bins.select_for_update(of=("self",)).order_by("pk")
+        return {bin_obj.sensor_id: bin_obj for bin_obj in bins}
+
+    @staticmethod
+    def build_reading(bin_obj, data, timestamp):
+        """Build an unsaved SensorReading for the given bin and payload"""
+        return SensorReading(
+            bin=bin_obj,
+            sensor=bin_obj.sensor,
+            timestamp=timestamp,
+            fill_level=data["fill_level"],
+            weight_kg=data.get("weight_kg"),
+            temperature=data.get("temperature"),
+            humidity=data.get("humidity"),
+            battery_level=data["battery_level"],
+            signal_strength=data["signal_strength"],
+            motion_detected=data.get("motion_detected", False),
+            lid_open=data.get("lid_open", False),
+            error_code=data.get("error_code", ""),
+            raw_data=data.get("raw_data"),
+        )
+
+    @staticmethod
+    def fleet_deltas(before, bins, alert_plan=None):
+        """
+        Dashboard counter deltas for bins whose status or fill status changed.
+
+        ``before`` maps bin ID -> (status, fill_status) prior to applying
+        readings.
+        """
+        deltas = Counter()
+        for bin_obj in bins:
+            old_status, old_fill_status = before[bin_obj.pk]
+            if bin_obj.status != old_status:
+                deltas[("status", old_status)] -= 1
+                deltas[("status", bin_obj.status)] += 1
+            if bin_obj.fill_status != old_fill_status:
+                deltas[("fill_status", old_fill_status)] -= 1
+                deltas[("fill_status", bin_obj.fill_status)] += 1
+        if alert_plan:
+            for priority, delta in alert_plan.priority_deltas().items():
+                deltas[("alert_priority", priority)] += delta
+        return deltas
+
+    @staticmethod
+    def tile_changed(before, bin_obj):
+        """Whether a bin's map tile attributes (status, fill status) changed"""
+        return before[bin_obj.pk] != (bin_obj.status, bin_obj.fill_status)
+
+    @staticmethod
+    def apply_reading(bin_obj, data, timestamp, now=None):
+        """
+        Apply a reading to the in-memory bin and sensor state.
+
+        Readings older than the bin's last reading are kept as history but
+        do not overwrite the current state. Returns True if the bin state
+        was changed and False for stale readings.
+        """
+        if bin_obj.last_reading_at and timestamp < bin_obj.last_reading_at:
+            return False
+
+        now = now or timezone.now()
+
+        bin_obj.fill_level = data["fill_level"]
+        bin_obj.fill_status = SmartBin.fill_status_for(bin_obj.fill_level)
+        if data.get("weight_kg") is not None:
+            bin_obj.current_weight_kg = data["weight_kg"]
+        bin_obj.temperature = data.get("temperature")
+        bin_obj.humidity = data.get("humidity")
+        bin_obj.last_reading_at = timestamp
+        bin_obj.updated_at = now
+
+        # A reading proves the sensor is reporting again
+        if bin_obj.status == "offline":
+            bin_obj.status = "active"
+        if bin_obj.needs_collection() and bin_obj.status != "full":
+            bin_obj.status = "full"
+
+        sensor = bin_obj.sensor
+        if sensor:
+            if sensor.status == "offline":
+                sensor.status = "active"
+            sensor.battery_level = data["battery_level"]
+            sensor.signal_strength = data["signal_strength"]
+            sensor.last_data_transmission = timestamp
+            sensor.updated_at = now
+
+        bin_obj.check_and_set_online()
+        return True
+
+    @staticmethod
+    def ingest(data):
+        """
+        Persist a single validated sensor payload.
+
+        The bin is locked for the duration of the transaction, so concurrent
+        uploads for the same bin are applied one after the other. Fill
+        status, online state and alert transitions are computed in memory
+        and committed in that transaction: one UPDATE for the bin,
+        one for its sensor, one INSERT for the reading, one rollup upsert and
+        alert writes only when an alert is opened, escalated or auto-resolved.
+
+        Raises:
+            SmartBin.DoesNotExist: if no bin is attached to the sensor
+        """
+        now = timezone.now()
+        sensor_uuid = SensorIngestionService._parse_sensor_id(data["sensor_id"])
+        if sensor_uuid is None:
+            raise SmartBin.DoesNotExist("Smart bin not found")
+
+        with transaction.atomic():
+            # Lock the bin so concurrent uploads for it apply one at a time
+            bin_obj = SensorIngestionService.get_bins_for_sensors(
+                {sensor_uuid}, lock=True
+            ).get(sensor_uuid)
+            if bin_obj is None:
+                raise SmartBin.DoesNotExist("Smart bin not found")
+
+            before = {bin_obj.pk: (bin_obj.status, bin_obj.fill_status)}
+            timestamp = data.get("timestamp") or now
+            reading = SensorIngestionService.build_reading(bin_obj, data, timestamp)
+            applied = SensorIngestionService.apply_reading(
+                bin_obj, data, timestamp, now
+            )
+            alert_plan = alert_engine.evaluate(
+                [(bin_obj, reading)] if applied else []
+            )
+
+            if applied:
+                bin_obj.save(update_fields=SensorIngestionService.BIN_UPDATE_FIELDS)
+                if bin_obj.sensor:
+                    bin_obj.sensor.save(
+                        update_fields=SensorIngestionService.SENSOR_UPDATE_FIELDS
+                    )
+
+            # Alerts have already been evaluated above
+            reading._alerts_evaluated = True
+            reading.save()
+            ReadingRollupService.apply_readings([reading])
+
+            if alert_plan:
+                alert_engine.commit(alert_plan)
+
+            deltas = SensorIngestionService.fleet_deltas(before, [bin_obj], alert_plan)
+            if any(deltas.values()):
+                transaction.on_commit(lambda: record_fleet_changes(deltas))
+            if applied:
+                transaction.on_commit(lambda: store_bin_states([bin_obj]))
+                transaction.on_commit(lambda: publish_bin_telemetry([bin_obj]))
+            if SensorIngestionService.tile_changed(before, bin_obj):
+                transaction.on_commit(
+                    lambda: invalidate_tiles("bins", [bin_obj.location])
+                )
+
+        return bin_obj
+
+    @staticmethod
+    @transaction.atomic
+    def ingest_batch(items):
+        """
+        Persist a batch of validated sensor payloads.
+
+        All bins are resolved and locked with one query, readings are written
+        with a single bulk INSERT (plus one upsert into the hourly/daily
+        rollups) and the latest bin/sensor state with one bulk UPDATE per
+        table, all inside one transaction. The bin locks make concurrent
+        batches for the same bin apply one after the other.
+
+        Args:
+            items: list of ``SensorDataInputSerializer.validated_data`` dicts
+
+        Returns:
+            list: one result dict per item, in input order
+        """
+        now = timezone.now()
+        sensor_ids = {
+            SensorIngestionService._parse_sensor_id(item["sensor_id"])
+            for item in items
+        }
+        sensor_ids.discard(None)
+        bins_by_sensor = SensorIngestionService.get_bins_for_sensors(
+            sensor_ids, lock=True
+        )
+        before = {
+            bin_obj.pk: (bin_obj.status, bin_obj.fill_status)
+            for bin_obj in bins_by_sensor.values()
+        }
+
+        results = []
+        readings = []
+        applied = []
+        changed_bins = {}
+
+        for item in items:
+            sensor_uuid = SensorIngestionService._parse_sensor_id(item["sensor_id"])
+            bin_obj = bins_by_sensor.get(sensor_uuid)
+            if bin_obj is None:
+                results.append(
+                    {
+                        "sensor_id": item["sensor_id"],
+                        "status": "error",
+                        "errors": {"sensor_id": ["Smart bin not found"]},
+                    }
+                )
+                continue
+
+            timestamp = item.get("timestamp") or now
+            reading = SensorIngestionService.build_reading(bin_obj, item, timestamp)
+            readings.append(reading)
+
+            if SensorIngestionService.apply_reading(bin_obj, item, timestamp, now):
+                changed_bins[bin_obj.pk] = bin_obj
+                applied.append((bin_obj, reading))
+
+            results.append(
+                {
+                    "sensor_id": item["sensor_id"],
+                    "status": "success",
+                    "bin_number": bin_obj.bin_number,
+                }
+            )
+
+        if not readings:
+            return results
+
+        sensors = [b.sensor for b in changed_bins.values() if b.sensor]
+        alert_plan = alert_engine.evaluate(applied)
+
+        with transaction.atomic():
+            SensorReading.objects.bulk_create(readings)
+            ReadingRollupService.apply_readings(readings)
+            if changed_bins:
+                SmartBin.objects.bulk_update(
+                    list(changed_bins.values()),
+                    SensorIngestionService.BIN_UPDATE_FIELDS,
+                )
+            if sensors:
+                Sensor.objects.bulk_update(
+                    sensors, SensorIngestionService.SENSOR_UPDATE_FIELDS
+                )
+            if alert_plan:
+                alert_engine.commit(alert_plan)
+
+            deltas = SensorIngestionService.fleet_deltas(
+                before, changed_bins.values(), alert_plan
+            )
+            if any(deltas.values()):
+                transaction.on_commit(lambda: record_fleet_changes(deltas))
+            if changed_bins:
+                transaction.on_commit(
+                    lambda: store_bin_states(list(changed_bins.values()))
+                )
+                transaction.on_commit(
+                    lambda: publish_bin_telemetry(list(changed_bins.values()))
+                )
+            tile_points = [
+                bin_obj.location
+                for bin_obj in changed_bins.values()
+                if SensorIngestionService.tile_changed(before, bin_obj)
+            ]
+            if tile_points:
+                transaction.on_commit(lambda: invalidate_tiles("bins", tile_points))
+
+        logger.info(
+            "Ingested %s readings for %s bins (%s alerts opened, %s resolved)",
+            len(readings),
+            len(changed_bins),
+            len(alert_plan.to_create),
+            len(alert_plan.to_resolve),
+        )
+        return results
+
+
+class OnlineStatusService:
+    """Keep the stored ``SmartBin.is_online`` flag in step with sensor state"""
+
+    @staticmethod
+    def sync_online_flags():
+        """
+        Flip ``is_online`` for bins whose sensor state no longer matches it.
+
+        Issues one set-based UPDATE per direction instead of saving bins one
+        by one. Returns (went_online, went_offline) row counts.
+        """
+        online = SmartBin.online_condition()
+        went_online = (
+            SmartBin.objects.filter(online, is_online=False)
+            .update(is_online=True, updated_at=timezone.now())
+        )
+        went_offline = (
+            SmartBin.objects.filter(is_online=True)
+            .exclude(online)
+            .update(is_online=False, updated_at=timezone.now())
+        )
+        return went_online, went_offline
+
+    @staticmethod
+    def heartbeat_timeout(missed_intervals):
+        """
+        Per-sensor silence allowed before it is considered offline.
+
+        ``data_transmission_interval`` x ``missed_intervals``, falling back to
+        SENSOR_DEFAULT_TRANSMISSION_INTERVAL and never shorter than
+        SENSOR_HEARTBEAT_MIN_INTERVAL.
+        """
+        default_interval = getattr(settings, "SENSOR_DEFAULT_TRANSMISSION_INTERVAL", 300)
+        min_interval = getattr(settings, "SENSOR_HEARTBEAT_MIN_INTERVAL", 60)
+        interval = Greatest(
+            Coalesce(F("data_transmission_interval"), Value(default_interval)),
+            Value(min_interval),
+        )
+        return ExpressionWrapper(
+            interval * Value(timedelta(seconds=missed_intervals)),
+            output_field=DurationField(),
+        )
+
+    @staticmethod
+    def sweep_stale_sensors(missed_intervals=None, now=None):
+        """
+        Mark sensors that have stopped reporting (and their bins) offline.
+
+        Sensors are selected through the ``last_data_transmission`` index,
+        then flipped with set-based UPDATEs. Offline alerts are opened and
+        ``bin_status_change`` events broadcast only for bins whose sensor
+        actually changed state. Returns the list of broadcast changes.
+        """
+        now = now or timezone.now()
+        missed_intervals = missed_intervals or getattr(
+            settings, "SENSOR_HEARTBEAT_MISSED_INTERVALS", 3
+        )
+        min_interval = getattr(settings, "SENSOR_HEARTBEAT_MIN_INTERVAL", 60)
+
+        deadline = ExpressionWrapper(
+            Value(now, output_field=DateTimeField())
+            - OnlineStatusService.heartbeat_timeout(missed_intervals),
+            output_field=DateTimeField(),
+        )
+        stale_sensors = Sensor.objects.filter(
+            status="active",
+            # Coarse, index-friendly bound first; the exact per-sensor check follows
+            last_data_transmission__lt=now
+            - timedelta(seconds=min_interval * missed_intervals),
+        ).filter(last_data_transmission__lt=deadline)
+
+        with transaction.atomic():
+            last_seen = dict(
+                stale_sensors.select_for_update(skip_locked=True).values_list(
+                    "id", "last_data_transmission"
+                )
+            )
+            if not last_seen:
+                return []
+
+            Sensor.objects.filter(id__in=last_seen, status="active").update(
+                status="offline", updated_at=now
+            )
+
+            bins = list(
+                SmartBin.objects.filter(sensor_id__in=last_seen).values(
+                    "id", "bin_number", "status", "sensor_id", "location"
+                )
+            )
+            SmartBin.objects.filter(id__in=[b["id"] for b in bins]).update(
+                is_online=False,
+                status=Case(
+                    When(status="active", then=Value("offline")),
+                    default=F("status"),
+                ),
+                updated_at=now,
+            )
+
+            alert_plan = alert_engine.plan_open(
+                (
+                    b["id"],
+                    b["sensor_id"],
+                    {
+                        "alert_type": "offline",
+                        "priority": "high",
+                        "message": f"Bin {b['bin_number']} sensor has stopped reporting "
+                        f"(last seen {last_seen[b['sensor_id']].isoformat()})",
+                    },
+                )
+                for b in bins
+            )
+            if alert_plan:
+                alert_engine.commit(alert_plan)
+
+            went_offline = sum(1 for b in bins if b["status"] == "active")
+            deltas = Counter(
+                {("status", "active"): -went_offline, ("status", "offline"): went_offline}
+            )
+            if alert_plan:
+                for priority, delta in alert_plan.priority_deltas().items():
+                    deltas[("alert_priority", priority)] += delta
+            transaction.on_commit(lambda: record_fleet_changes(deltas))
+            transaction.on_commit(
+                lambda: invalidate_bin_states([b["id"] for b in bins])
+            )
+            transaction.on_commit(
+                lambda: invalidate_tiles("bins", [b["location"] for b in bins])
+            )
+
+            changes = [
+                {
+                    "bin_id": str(b["id"]),
+                    "bin_number": b["bin_number"],
+                    "status": "offline" if b["status"] == "active" else b["status"],
+                    "is_online": False,
+                    "reason": "heartbeat_timeout",
+                    "last_data_transmission": last_seen[b["sensor_id"]].isoformat(),
+                }
+                for b in bins
+            ]
+            transaction.on_commit(lambda: broadcast_bin_status_changes(changes))
+
+        logger.info(
+            "Heartbeat sweep marked %s sensors and %s bins offline",
+            len(last_seen),
+            len(bins),
+        )
+        return changes
@@ -9,7 +9,9 @@ def create_alerts_from_sensor_reading(sender, instance, created, **kwargs):
     """
     Automatically create alerts when a new sensor reading is created
     """
-    if created:
+    # Readings persisted through SensorIngestionService have already had
+    # their alerts evaluated in memory
+    if created and not getattr(instance, "_alerts_evaluated", False):
         # Create alerts based on the sensor reading
         alerts_created = create_bin_alert_from_sensor_reading(instance)
 
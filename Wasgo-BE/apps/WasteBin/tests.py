@@ -0,0 +1,1194 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from utils.great_circle import haversine_km
+from utils.spatial import nearest
+
+from .alerts import alert_engine
+from .bin_state import bin_state_cache
+from .clustering import MAX_CLUSTER_CELLS, BinClusterService, cell_size_for
+from .consumers import SmartBinConsumer, parse_bin_ids
+from .dashboard import DashboardPublisher, FleetCounters
+from .fleet import FleetSummaryService
+from .ingest_queue import (
+    DatabaseIngestQueue,
+    InMemoryIngestQueue,
+    decode_payload,
+    encode_payload,
+    ingest_claimed,
+    process_next_batch,
+)
+from .models import (
+    BinAlert,
+    BinType,
+    Sensor,
+    SensorIngestItem,
+    SensorReading,
+    SensorReadingRollup,
+    SmartBin,
+)
+from .partitions import (
+    add_months,
+    create_partition,
+    drop_partitions_before,
+    is_partitioned,
+    list_partitions,
+    month_range,
+    month_start,
+    partition_name,
+)
+from .realtime import (
+    ALL_BINS_GROUP,
+    TelemetryPublisher,
+    bin_group_name,
+    cell_for,
+    cell_group_name,
+    cells_for_bbox,
+    clamp_bbox,
+)
+from .rollups import ReadingRollupService
+from .serializers import SensorDetailSerializer, readings_count_for
+from .services import OnlineStatusService, SensorIngestionService
+from .tiles import get_tile, invalidate_tiles, tiles_containing
+from .timeseries import lttb_indices
+
+T0 = datetime(2026, 3, 2, 9, 0, tzinfo=dt_timezone.utc)
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "wastebin-tests",
+    }
+}
+
+
+def create_bin(bin_number, location=(-0.187, 5.6037), **fields):
+    """A saved bin with its own active sensor"""
+    bin_type, _ = BinType.objects.get_or_create(
+        name="general", defaults={"color_code": "#808080"}
+    )
+    sensor = Sensor.objects.create(
+        model="FillSense 2",
+        serial_number=f"SN-{bin_number}",
+        installation_date=date(2025, 1, 1),
+    )
+    fields = {"address": "1 High Street", "area": "Osu", **fields}
+    return SmartBin.objects.create(
+        bin_number=bin_number,
+        name=f"Bin {bin_number}",
+        bin_type=bin_type,
+        sensor=sensor,
+        location=Point(*location, srid=4326),
+        installation_date=date(2025, 1, 1),
+        **fields,
+    )
+
+
+def payload(bin_obj, fill_level, timestamp=T0, **fields):
+    """A validated sensor payload for a bin"""
+    return {
+        "sensor_id": str(bin_obj.sensor_id),
+        "fill_level": fill_level,
+        "battery_level": 90,
+        "signal_strength": 80,
+        "timestamp": timestamp,
+        **fields,
+    }
+
+
+class IngestBatchTests(TestCase):
+    def setUp(self):
+        alert_engine.invalidate()
+        self.bin = create_bin("BIN901")
+        self.other = create_bin("BIN902")
+
+    def test_results_follow_input_order(self):
+        items = [
+            payload(self.bin, 30),
+            {**payload(self.other, 40), "sensor_id": "not-a-sensor"},
+            payload(self.other, 50),
+        ]
+
+        results = SensorIngestionService.ingest_batch(items)
+
+        self.assertEqual(
+            [r["status"] for r in results], ["success", "error", "success"]
+        )
+        self.assertEqual(results[0]["bin_number"], "BIN901")
+        self.assertEqual(results[1]["errors"], {"sensor_id": ["Smart bin not found"]})
+        self.assertEqual(SensorReading.objects.count(), 2)
+
+    def test_latest_reading_wins_and_older_ones_are_kept(self):
+        items = [
+            payload(self.bin, 60, T0 + timedelta(minutes=10)),
+            payload(self.bin, 20, T0),
+            payload(self.bin, 45, T0 + timedelta(minutes=5)),
+        ]
+
+        SensorIngestionService.ingest_batch(items)
+
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.fill_level, 60)
+        self.assertEqual(self.bin.fill_status, "high")
+        self.assertEqual(self.bin.last_reading_at, T0 + timedelta(minutes=10))
+        self.assertEqual(SensorReading.objects.filter(bin=self.bin).count(), 3)
+        self.other.refresh_from_db()
+        self.assertIsNone(self.other.last_reading_at)
+
+    def test_full_bin_is_marked_and_sensor_updated(self):
+        SensorIngestionService.ingest_batch(
+            [payload(self.bin, 85, battery_level=55, signal_strength=70)]
+        )
+
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.status, "full")
+        self.assertTrue(self.bin.is_online)
+        sensor = Sensor.objects.get(pk=self.bin.sensor_id)
+        self.assertEqual(sensor.battery_level, 55)
+        self.assertEqual(sensor.last_data_transmission, T0)
+
+
+class LttbTests(SimpleTestCase):
+    def setUp(self):
+        self.x = np.arange(1000, dtype=float)
+        # Slow fill with a sharp drop at each collection
+        self.y = (self.x % 250) / 2.5
+
+    def test_output_size_and_endpoints(self):
+        for threshold in (3, 10, 100, 999):
+            keep = lttb_indices(self.x, self.y, threshold)
+
+            self.assertEqual(len(keep), threshold)
+            self.assertEqual(keep[0], 0)
+            self.assertEqual(keep[-1], len(self.x) - 1)
+            self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_keeps_the_shape_of_the_curve(self):
+        keep = lttb_indices(self.x, self.y, 50)
+
+        self.assertGreaterEqual(self.y[keep].max(), 0.95 * self.y.max())
+        # Every collection drop is still visible
+        for drop in (250, 500, 750):
+            self.assertTrue(np.any(np.abs(keep - drop) <= 2))
+
+    def test_small_inputs_are_returned_whole(self):
+        np.testing.assert_array_equal(
+            lttb_indices(self.x[:5], self.y[:5], 10), np.arange(5)
+        )
+        np.testing.assert_array_equal(lttb_indices(self.x, self.y, 2), np.arange(1000))
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        alert_engine.invalidate()
+        self.bin = create_bin("BIN911")
+
+    def test_ingest_updates_the_bin(self):
+        bin_obj = SensorIngestionService.ingest(payload(self.bin, 42, weight_kg=12.5))
+
+        self.assertEqual(bin_obj.pk, self.bin.pk)
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.fill_level, 42)
+        self.assertEqual(self.bin.fill_status, "medium")
+        self.assertEqual(self.bin.current_weight_kg, 12.5)
+        self.assertEqual(SensorReading.objects.filter(bin=self.bin).count(), 1)
+
+    def test_unknown_or_malformed_sensor(self):
+        for sensor_id in ("not-a-uuid", "00000000-0000-0000-0000-000000000000"):
+            with self.assertRaises(SmartBin.DoesNotExist):
+                SensorIngestionService.ingest(
+                    {**payload(self.bin, 10), "sensor_id": sensor_id}
+                )
+        self.assertFalse(SensorReading.objects.exists())
+
+    def test_stale_reading_is_stored_without_changing_state(self):
+        SensorIngestionService.ingest(payload(self.bin, 70, T0))
+        SensorIngestionService.ingest(payload(self.bin, 10, T0 - timedelta(hours=1)))
+
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.fill_level, 70)
+        self.assertEqual(self.bin.last_reading_at, T0)
+        self.assertEqual(SensorReading.objects.filter(bin=self.bin).count(), 2)
+
+    def test_reading_brings_an_offline_bin_back(self):
+        SmartBin.objects.filter(pk=self.bin.pk).update(status="offline")
+        Sensor.objects.filter(pk=self.bin.sensor_id).update(status="offline")
+
+        SensorIngestionService.ingest(payload(self.bin, 15))
+
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.status, "active")
+        self.assertTrue(self.bin.is_online)
+        self.assertEqual(Sensor.objects.get(pk=self.bin.sensor_id).status, "active")
+
+
+def ingest_unless_bad(items):
+    """Stand-in for ingest_batch that fails any batch with a "bad" reading"""
+    if any(item["sensor_id"] == "bad" for item in items):
+        raise ValueError("bad reading")
+    return [{"sensor_id": item["sensor_id"], "status": "success"} for item in items]
+
+
+class InMemoryIngestQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = InMemoryIngestQueue()
+        self.queue.enqueue([{"sensor_id": str(n), "timestamp": T0} for n in range(5)])
+
+    def test_payloads_round_trip(self):
+        data = {"sensor_id": "s-1", "fill_level": 50, "timestamp": T0}
+
+        self.assertEqual(encode_payload(data)["timestamp"], T0.isoformat())
+        self.assertEqual(decode_payload(encode_payload(data)), data)
+
+    def test_claim_ack_and_fail(self):
+        claimed = self.queue.claim(3)
+
+        self.assertEqual([token for token, _ in claimed], [1, 2, 3])
+        self.assertEqual(self.queue.pending_count(), 2)
+        self.queue.ack([1, 2])
+        self.queue.fail([3, 99], "boom")
+        self.assertEqual(self.queue.pending_count(), 3)
+        # Already acked or unknown tokens are ignored
+        self.queue.fail([1], "boom")
+        self.assertEqual(self.queue.pending_count(), 3)
+
+    def test_items_are_parked_after_max_attempts(self):
+        queue = InMemoryIngestQueue()
+        queue.enqueue([{"sensor_id": "s-1"}])
+
+        for _ in range(queue.MAX_ATTEMPTS):
+            (token, _), *_ = queue.claim(10)
+            queue.fail([token], "boom")
+
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertEqual([error for _, _, error in queue.failed], ["boom"])
+
+
+@mock.patch.object(
+    SensorIngestionService, "ingest_batch", side_effect=ingest_unless_bad
+)
+class IngestClaimedTests(SimpleTestCase):
+    def test_failing_batch_is_retried_in_halves(self, ingest_batch):
+        queue = InMemoryIngestQueue()
+        sensor_ids = ["a", "b", "bad", "c", "d", "e"]
+        queue.enqueue([{"sensor_id": sensor_id} for sensor_id in sensor_ids])
+
+        self.assertEqual(process_next_batch(queue, batch_size=10), 6)
+
+        ingested = [
+            item["sensor_id"]
+            for call in ingest_batch.call_args_list
+            if "bad" not in [i["sensor_id"] for i in call.args[0]]
+            for item in call.args[0]
+        ]
+        self.assertEqual(sorted(ingested), ["a", "b", "c", "d", "e"])
+        # Only the bad reading goes back to the queue
+        self.assertEqual(queue.pending_count(), 1)
+        self.assertEqual(queue.claim(10)[0][1], {"sensor_id": "bad"})
+
+    def test_successful_batch_is_acked(self, ingest_batch):
+        queue = InMemoryIngestQueue()
+        queue.enqueue([{"sensor_id": "a"}, {"sensor_id": "b"}])
+
+        ingest_claimed(queue, queue.claim(10))
+
+        ingest_batch.assert_called_once()
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertEqual(queue.claim(10), [])
+        self.assertEqual(process_next_batch(queue), 0)
+
+
+class DatabaseIngestQueueTests(TestCase):
+    def setUp(self):
+        self.queue = DatabaseIngestQueue()
+        self.queue.enqueue([{"sensor_id": "a"}, {"sensor_id": "b"}])
+
+    def test_claimed_items_are_not_handed_out_twice(self):
+        first = self.queue.claim(1)
+        second = self.queue.claim(10)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual([payload for _, payload in second], [{"sensor_id": "b"}])
+        self.assertEqual(self.queue.claim(10), [])
+        self.assertEqual(
+            SensorIngestItem.objects.filter(status="processing", attempts=1).count(),
+            2,
+        )
+
+    def test_stale_claims_are_handed_out_again(self):
+        (token, _), *_ = self.queue.claim(10)
+        SensorIngestItem.objects.filter(id=token).update(
+            claimed_at=T0 - self.queue.VISIBILITY_TIMEOUT
+        )
+
+        self.assertEqual([t for t, _ in self.queue.claim(10)], [token])
+
+    def test_fail_parks_items_after_max_attempts(self):
+        (token, _), *_ = self.queue.claim(1)
+        self.queue.fail([token], "boom")
+        self.assertEqual(SensorIngestItem.objects.get(id=token).status, "pending")
+
+        SensorIngestItem.objects.filter(id=token).update(
+            attempts=self.queue.MAX_ATTEMPTS
+        )
+        self.queue.fail([token], "boom")
+
+        item = SensorIngestItem.objects.get(id=token)
+        self.assertEqual((item.status, item.last_error), ("failed", "boom"))
+        self.assertEqual(self.queue.pending_count(), 1)
+
+
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        alert_engine.invalidate()
+        self.bin = create_bin("BIN921")
+
+    def reading(self, fill_level):
+        return SensorIngestionService.build_reading(
+            self.bin, payload(self.bin, fill_level), T0
+        )
+
+    def evaluate(self, *fill_levels):
+        """Evaluate and commit readings, updating the cache as on commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = alert_engine.evaluate(
+                (self.bin, self.reading(fill_level)) for fill_level in fill_levels
+            )
+            if plan:
+                alert_engine.commit(plan)
+        return plan
+
+    def open_alerts(self):
+        return list(
+            BinAlert.objects.filter(bin=self.bin, is_resolved=False).values_list(
+                "alert_type", "priority"
+            )
+        )
+
+    def test_open_escalate_and_resolve(self):
+        plan = self.evaluate(85)
+        self.assertEqual(self.open_alerts(), [("full", "medium")])
+        self.assertEqual(plan.priority_deltas(), {"medium": 1})
+
+        plan = self.evaluate(95)
+        self.assertEqual(self.open_alerts(), [("full", "high")])
+        self.assertEqual(plan.priority_deltas(), {"medium": -1, "high": 1})
+
+        plan = self.evaluate(30)
+        self.assertEqual(self.open_alerts(), [])
+        self.assertEqual(plan.priority_deltas(), {"high": -1})
+        self.assertEqual(BinAlert.objects.filter(bin=self.bin).count(), 1)
+
+    def test_unchanged_condition_writes_nothing(self):
+        self.evaluate(85)
+
+        plan = self.evaluate(86)
+
+        self.assertEqual(
+            (plan.to_create, plan.to_escalate, plan.to_resolve), ([], [], [])
+        )
+        self.assertEqual(self.open_alerts(), [("full", "medium")])
+
+    def test_opened_and_cleared_in_one_batch_is_not_stored(self):
+        plan = self.evaluate(85, 30)
+
+        self.assertFalse(plan)
+        self.assertFalse(BinAlert.objects.exists())
+
+    def test_alert_resolved_elsewhere_is_opened_again(self):
+        self.evaluate(85)
+        BinAlert.objects.update(is_resolved=True)
+
+        plan = self.evaluate(92)
+
+        self.assertEqual(self.open_alerts(), [("full", "high")])
+        self.assertEqual(plan.priority_deltas(), {"high": 1})
+        self.assertEqual(BinAlert.objects.filter(bin=self.bin).count(), 2)
+
+    def test_alert_opened_elsewhere_is_escalated_not_duplicated(self):
+        alert_engine.warm([self.bin.pk])
+        existing = BinAlert.objects.create(
+            bin=self.bin, alert_type="full", priority="medium", message="Full"
+        )
+
+        plan = self.evaluate(95)
+
+        self.assertEqual(self.open_alerts(), [("full", "high")])
+        self.assertEqual(plan.priority_deltas(), {"medium": -1, "high": 1})
+        self.assertEqual(
+            alert_engine.open_alerts(self.bin.pk), {"full": (existing.id, "high")}
+        )
+
+
+class OnlineStatusTests(TestCase):
+    def setUp(self):
+        self.weak = create_bin("BIN931")
+        self.healthy = create_bin("BIN932")
+        Sensor.objects.filter(pk=self.weak.sensor_id).update(signal_strength=20)
+        SmartBin.objects.filter(pk=self.healthy.pk).update(is_online=False)
+
+    def test_online_is_derived_without_writes(self):
+        online = dict(
+            SmartBin.objects.annotate(
+                online_now=SmartBin.online_annotation()
+            ).values_list("bin_number", "online_now")
+        )
+
+        self.assertEqual(online, {"BIN931": False, "BIN932": True})
+        # The stored flags are left as they were
+        self.assertTrue(SmartBin.objects.get(pk=self.weak.pk).is_online)
+
+    def test_sync_online_flags(self):
+        self.assertEqual(OnlineStatusService.sync_online_flags(), (1, 1))
+        self.assertEqual(
+            dict(SmartBin.objects.values_list("bin_number", "is_online")),
+            {"BIN931": False, "BIN932": True},
+        )
+        self.assertEqual(OnlineStatusService.sync_online_flags(), (0, 0))
+
+
+@override_settings(
+    SENSOR_DEFAULT_TRANSMISSION_INTERVAL=300, SENSOR_HEARTBEAT_MIN_INTERVAL=60
+)
+class OfflineSweepTests(TestCase):
+    def setUp(self):
+        alert_engine.invalidate()
+        self.silent = create_bin("BIN941")
+        self.recent = create_bin("BIN942")
+        self.slow = create_bin("BIN943")
+        self.full = create_bin("BIN944", status="full")
+        self.last_seen(self.silent, hours=1)
+        self.last_seen(self.recent, minutes=10)
+        self.last_seen(self.full, hours=1)
+        # Reports every two hours, so an hour of silence is expected
+        self.last_seen(self.slow, hours=1)
+        Sensor.objects.filter(pk=self.slow.sensor_id).update(
+            data_transmission_interval=7200
+        )
+
+    def last_seen(self, bin_obj, **ago):
+        Sensor.objects.filter(pk=bin_obj.sensor_id).update(
+            last_data_transmission=T0 - timedelta(**ago)
+        )
+
+    def test_marks_silent_sensors_offline(self):
+        changes = OnlineStatusService.sweep_stale_sensors(3, now=T0)
+
+        self.assertEqual(
+            {c["bin_number"]: c["status"] for c in changes},
+            {"BIN941": "offline", "BIN944": "full"},
+        )
+        self.assertEqual(
+            dict(
+                SmartBin.objects.values_list("bin_number", "status").filter(
+                    is_online=False
+                )
+            ),
+            {"BIN941": "offline", "BIN944": "full"},
+        )
+        self.assertEqual(
+            set(Sensor.objects.filter(status="offline").values_list("pk", flat=True)),
+            {self.silent.sensor_id, self.full.sensor_id},
+        )
+        self.assertEqual(
+            set(
+                BinAlert.objects.filter(alert_type="offline").values_list(
+                    "bin__bin_number", "priority"
+                )
+            ),
+            {("BIN941", "high"), ("BIN944", "high")},
+        )
+
+    def test_sweep_is_idempotent(self):
+        OnlineStatusService.sweep_stale_sensors(3, now=T0)
+
+        self.assertEqual(OnlineStatusService.sweep_stale_sensors(3, now=T0), [])
+        self.assertEqual(BinAlert.objects.filter(alert_type="offline").count(), 2)
+
+
+class PartitionMonthTests(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(month_start(datetime(2026, 2, 17, 23, 59)), date(2026, 2, 1))
+        self.assertEqual(add_months(date(2026, 11, 1), 2), date(2027, 1, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -13), date(2024, 12, 1))
+
+    def test_names_and_ranges(self):
+        self.assertEqual(partition_name(date(2026, 3, 1)), "sensor_readings_202603")
+        self.assertEqual(
+            month_range(date(2025, 12, 1)),
+            (
+                datetime(2025, 12, 1, tzinfo=dt_timezone.utc),
+                datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            ),
+        )
+
+
+class PartitionTests(TestCase):
+    MONTH = date(2001, 5, 1)
+
+    def test_readings_table_is_partitioned(self):
+        self.assertTrue(is_partitioned())
+
+    def test_create_moves_rows_out_of_the_default_partition(self):
+        bin_obj = create_bin("BIN951")
+        SensorIngestionService.ingest_batch(
+            [payload(bin_obj, 40, datetime(2001, 5, 20, tzinfo=dt_timezone.utc))]
+        )
+
+        self.assertTrue(create_partition(self.MONTH))
+        self.assertFalse(create_partition(self.MONTH))
+
+        self.assertIn((self.MONTH, "sensor_readings_200105"), list_partitions())
+        self.assertEqual(SensorReading.objects.filter(timestamp__year=2001).count(), 1)
+
+    def test_drop_partitions_before(self):
+        create_partition(self.MONTH)
+        create_partition(add_months(self.MONTH, 1))
+
+        dropped = drop_partitions_before(add_months(self.MONTH, 1))
+
+        self.assertEqual(dropped, ["sensor_readings_200105"])
+        self.assertEqual(
+            [m for m, _ in list_partitions() if m.year == 2001], [date(2001, 6, 1)]
+        )
+
+
+def reading(minutes, fill_level, bin_id=1, weight_kg=None, temperature=None):
+    return SimpleNamespace(
+        bin_id=bin_id,
+        timestamp=T0 + timedelta(minutes=minutes),
+        fill_level=fill_level,
+        battery_level=100 - fill_level // 10,
+        weight_kg=weight_kg,
+        temperature=temperature,
+    )
+
+
+class RollupAggregateTests(SimpleTestCase):
+    def test_buckets_per_hour_and_day(self):
+        readings = [
+            reading(50, 30, weight_kg=6.0, temperature=21.0),
+            reading(10, 10, weight_kg=2.0),
+            reading(70, 40, weight_kg=8.0, temperature=25.0),
+            reading(20, 20, bin_id=2),
+        ]
+
+        buckets = ReadingRollupService.aggregate(readings)
+
+        self.assertEqual(
+            sorted(key for key in buckets if key[0] == 1),
+            [
+                (1, "day", datetime(2026, 3, 2, tzinfo=dt_timezone.utc)),
+                (1, "hour", T0),
+                (1, "hour", T0 + timedelta(hours=1)),
+            ],
+        )
+        hour = buckets[(1, "hour", T0)]
+        self.assertEqual(hour["reading_count"], 2)
+        self.assertEqual((hour["fill_level_min"], hour["fill_level_max"]), (10, 30))
+        self.assertEqual(hour["fill_level_sum"], 40)
+        # First/last weights follow the timestamps, not the input order
+        self.assertEqual(hour["weight_first"], (T0 + timedelta(minutes=10), 2.0))
+        self.assertEqual(hour["weight_last"], (T0 + timedelta(minutes=50), 6.0))
+        self.assertEqual(
+            (hour["temperature_sum"], hour["temperature_count"]), (21.0, 1)
+        )
+
+        day = buckets[(1, "day", datetime(2026, 3, 2, tzinfo=dt_timezone.utc))]
+        self.assertEqual(day["reading_count"], 3)
+        self.assertEqual(day["first_reading_at"], T0 + timedelta(minutes=10))
+        self.assertEqual(day["last_reading_at"], T0 + timedelta(minutes=70))
+        self.assertEqual((day["temperature_min"], day["temperature_max"]), (21.0, 25.0))
+
+
+class RollupStorageTests(TestCase):
+    def setUp(self):
+        self.bin = create_bin("BIN961")
+
+    def ingest(self, *readings):
+        SensorIngestionService.ingest_batch(
+            [
+                payload(
+                    self.bin, fill, T0 + timedelta(minutes=minutes), weight_kg=fill / 2
+                )
+                for minutes, fill in readings
+            ]
+        )
+
+    def hourly(self):
+        return SensorReadingRollup.objects.get(
+            bin=self.bin, resolution="hour", bucket=T0
+        )
+
+    def test_batches_merge_into_existing_buckets(self):
+        self.ingest((30, 40), (45, 60))
+        self.ingest((5, 20))
+
+        rollup = self.hourly()
+        self.assertEqual(rollup.reading_count, 3)
+        self.assertEqual((rollup.fill_level_min, rollup.fill_level_max), (20, 60))
+        self.assertEqual(rollup.fill_level_sum, 120)
+        self.assertEqual((rollup.weight_first_kg, rollup.weight_last_kg), (10, 30))
+        self.assertEqual(rollup.first_reading_at, T0 + timedelta(minutes=5))
+        self.assertEqual(rollup.last_reading_at, T0 + timedelta(minutes=45))
+        self.assertEqual(
+            SensorReadingRollup.objects.get(
+                bin=self.bin, resolution="day"
+            ).reading_count,
+            3,
+        )
+
+    def test_rebuild_recomputes_from_raw_readings(self):
+        self.ingest((30, 40), (45, 60), (5, 20))
+        SensorReadingRollup.objects.update(reading_count=99, fill_level_sum=0)
+
+        written = ReadingRollupService.rebuild(T0, T0 + timedelta(hours=1))
+
+        self.assertEqual(written, 2)
+        rollup = self.hourly()
+        self.assertEqual((rollup.reading_count, rollup.fill_level_sum), (3, 120))
+        self.assertEqual((rollup.weight_first_kg, rollup.weight_last_kg), (10, 30))
+
+
+class SensorReadingsWindowTests(TestCase):
+    def setUp(self):
+        self.bin = create_bin("BIN971")
+        SensorIngestionService.ingest_batch(
+            [payload(self.bin, 10 * n, T0 + timedelta(minutes=n)) for n in range(1, 6)]
+        )
+        self.sensor = Sensor.objects.get(pk=self.bin.sensor_id)
+
+    def window(self, **params):
+        request = SimpleNamespace(query_params=params)
+        serializer = SensorDetailSerializer(context={"request": request})
+        return [r["fill_level"] for r in serializer.get_sensor_readings(self.sensor)]
+
+    def test_newest_first_with_a_limit(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.window(readings_limit="2"), [50, 40])
+        self.assertEqual(self.window(), [50, 40, 30, 20, 10])
+        self.assertEqual(self.window(readings_limit="lots"), [50, 40, 30, 20, 10])
+
+    def test_pages_back_with_a_cursor(self):
+        before = (T0 + timedelta(minutes=4)).isoformat()
+
+        self.assertEqual(
+            self.window(readings_limit="2", readings_before=before), [30, 20]
+        )
+
+    def test_counts_come_from_the_annotation(self):
+        annotated = SimpleNamespace(readings_total=7)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(readings_count_for(annotated), 7)
+        self.assertEqual(readings_count_for(self.sensor), 5)
+
+    @mock.patch("apps.WasteBin.serializers.READINGS_WINDOW_MAX", 3)
+    def test_limit_is_capped(self):
+        self.assertEqual(self.window(readings_limit="1000"), [50, 40, 30])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SMART_BIN_SUMMARY_CACHE_SECONDS=10)
+class FleetSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_bin("BIN981", fill_level=90, current_weight_kg=40)
+        create_bin("BIN982", fill_level=30, current_weight_kg=10)
+        create_bin("BIN983", fill_level=50, area="Labone", status="offline")
+        damaged = create_bin("BIN984", fill_level=10, area="Labone", status="damaged")
+        BinAlert.objects.create(
+            bin=damaged, alert_type="damage", priority="high", message="Dented"
+        )
+
+    def test_compute(self):
+        summary = FleetSummaryService.compute()
+
+        self.assertEqual(
+            {key: summary[key] for key in summary if key != "generated_at"},
+            {
+                "total_bins": 4,
+                "active_bins": 2,
+                "full_bins": 1,
+                "offline_bins": 1,
+                "maintenance_required": 1,
+                "average_fill_level": 45,
+                "total_weight_kg": 50.0,
+                "bins_by_status": {"active": 2, "offline": 1, "damaged": 1},
+                "bins_by_area": {"Osu": 2, "Labone": 2},
+                "open_alerts": 1,
+                "resolved_alerts": 0,
+            },
+        )
+
+    def test_snapshot_is_reused_until_it_expires(self):
+        first = FleetSummaryService.get_summary()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(FleetSummaryService.get_summary(), first)
+        create_bin("BIN985")
+        self.assertEqual(
+            FleetSummaryService.get_summary(force_refresh=True)["total_bins"], 5
+        )
+
+    def test_stale_snapshot_is_served_while_another_worker_refreshes(self):
+        stale = {**FleetSummaryService.compute(), "generated_at": T0}
+        cache.set(FleetSummaryService.CACHE_KEY, stale)
+        cache.add(FleetSummaryService.LOCK_KEY, 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(FleetSummaryService.get_summary(), stale)
+
+        cache.delete(FleetSummaryService.LOCK_KEY)
+        self.assertNotEqual(FleetSummaryService.get_summary()["generated_at"], T0)
+        # The refreshing worker releases its lock
+        self.assertIsNone(cache.get(FleetSummaryService.LOCK_KEY))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FleetCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counters = FleetCounters()
+        create_bin("BIN991", fill_level=85, fill_status="full", status="full")
+        create_bin("BIN992", fill_level=10)
+        create_bin("BIN993", fill_level=15, area="Labone")
+
+    def test_seeded_snapshot(self):
+        snapshot = self.counters.snapshot()
+
+        self.assertEqual(snapshot["total_bins"], 3)
+        self.assertEqual(snapshot["bins_by_status"]["active"], 2)
+        self.assertEqual(snapshot["bins_by_status"]["full"], 1)
+        self.assertEqual(snapshot["bins_by_fill_status"]["empty"], 2)
+        self.assertEqual(snapshot["bins_by_area"], {"Osu": 2, "Labone": 1})
+        self.assertEqual(snapshot["open_alerts"], 0)
+
+    def test_deltas_are_applied_without_queries(self):
+        self.counters.snapshot()
+
+        with self.assertNumQueries(0):
+            self.counters.apply(
+                {
+                    ("status", "active"): -1,
+                    ("status", "full"): 1,
+                    ("alert_priority", "high"): 1,
+                }
+            )
+            snapshot = self.counters.snapshot()
+
+        self.assertEqual(snapshot["bins_by_status"]["active"], 1)
+        self.assertEqual(snapshot["bins_by_status"]["full"], 2)
+        self.assertEqual(snapshot["open_alerts_by_priority"]["high"], 1)
+
+    def test_deltas_before_seeding_are_left_to_the_seed(self):
+        self.counters.apply({("status", "full"): 5})
+
+        self.assertEqual(self.counters.snapshot()["bins_by_status"]["full"], 1)
+
+    def test_evicted_counter_forces_a_reseed(self):
+        self.counters.snapshot()
+        cache.delete(FleetCounters.key("status", "full"))
+
+        self.counters.apply({("status", "full"): 1})
+
+        self.assertIsNone(cache.get(FleetCounters.SEEDED_KEY))
+        self.assertEqual(self.counters.snapshot()["bins_by_status"]["full"], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardPublisherTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.counters = mock.Mock(snapshot=mock.Mock(return_value={"total_bins": 3}))
+        self.publisher = DashboardPublisher(self.counters, interval=60)
+        # Flushed by hand instead of by the background thread
+        self.publisher._run = lambda: None
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch(
+            "apps.WasteBin.dashboard.get_channel_layer", return_value=self.layer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_changes_are_coalesced_per_interval(self):
+        for _ in range(3):
+            self.publisher.mark_dirty("dashboard")
+        self.publisher.flush()
+
+        self.layer.group_send.assert_awaited_once_with(
+            "dashboard", {"type": "dashboard_update", "data": {"total_bins": 3}}
+        )
+
+        # Within the interval the group stays dirty instead of being sent
+        self.publisher.mark_dirty("dashboard")
+        self.publisher.flush()
+        self.assertEqual(self.layer.group_send.await_count, 1)
+        cache.delete(f"{FleetCounters.PREFIX}:sent:dashboard")
+        self.publisher.flush()
+        self.assertEqual(self.layer.group_send.await_count, 2)
+
+
+def live_bin(lng, lat, fill_level, pk=None):
+    """An unsaved bin carrying just what the telemetry message reads"""
+    return SimpleNamespace(
+        pk=pk or uuid.uuid4(),
+        location=Point(lng, lat, srid=4326),
+        fill_level=fill_level,
+        fill_status=SmartBin.fill_status_for(fill_level),
+        status="active",
+        is_online=True,
+        last_reading_at=T0,
+    )
+
+
+def make_consumer():
+    """A SmartBinConsumer wired to a mocked channel layer and socket"""
+    consumer = SmartBinConsumer()
+    consumer.channel_name = "test-channel"
+    consumer.channel_layer = mock.Mock(
+        group_add=mock.AsyncMock(), group_discard=mock.AsyncMock()
+    )
+    consumer.send = mock.AsyncMock()
+    consumer.room_group_name = ALL_BINS_GROUP
+    consumer.subscribed_bins = set()
+    consumer.viewport = None
+    consumer.viewport_groups = []
+    return consumer
+
+
+def sent_messages(consumer):
+    return [
+        json.loads(call.kwargs["text_data"]) for call in consumer.send.await_args_list
+    ]
+
+
+@override_settings(SMART_BIN_TELEMETRY_CELL_DEGREES=0.05)
+class TelemetryFanOutTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch(
+            "apps.WasteBin.realtime.get_channel_layer", return_value=self.layer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_viewport_cells(self):
+        cells = cells_for_bbox([-0.24, 5.52, -0.16, 5.64])
+
+        self.assertEqual(len(cells), 6)
+        self.assertIn(cell_for(-0.187, 5.6037), cells)
+
+    def test_oversized_viewport_has_no_cells(self):
+        self.assertIsNone(cells_for_bbox([-1e12, -1e12, 1e12, 1e12]))
+        self.assertEqual(clamp_bbox([-200, -100, 200, 100]), [-180, -90, 180, 90])
+
+    def test_superseded_updates_are_dropped(self):
+        publisher = TelemetryPublisher()
+        # Flushed by hand instead of by the background thread
+        publisher._run = lambda: None
+        first = live_bin(-0.187, 5.6037, 40)
+        other = live_bin(-0.187, 5.6037, 10)
+
+        publisher.publish([first, other])
+        publisher.publish([live_bin(-0.187, 5.6037, 55, pk=first.pk)])
+        publisher.flush()
+
+        sent = {
+            call.args[0]: call.args[1] for call in self.layer.group_send.await_args_list
+        }
+        cell = cell_group_name(cell_for(-0.187, 5.6037))
+        self.assertEqual(
+            set(sent),
+            {ALL_BINS_GROUP, cell, bin_group_name(first.pk), bin_group_name(other.pk)},
+        )
+        fleet = sent[ALL_BINS_GROUP]
+        self.assertEqual(fleet["scope"], "fleet")
+        self.assertEqual(
+            sorted(item["fill_level"] for item in fleet["data"]["bins"]), [10, 55]
+        )
+        self.assertEqual(len(sent[cell]["data"]["bins"]), 2)
+
+        publisher.flush()
+        self.assertEqual(self.layer.group_send.await_count, 4)
+
+    def test_viewport_filters_fleet_stream(self):
+        consumer = make_consumer()
+        async_to_sync(consumer.subscribe_to_viewport)(
+            {"bbox": [-0.24, 5.52, -0.16, 5.64]}
+        )
+        self.assertEqual(consumer.channel_layer.group_add.await_count, 6)
+
+        inside = {"bin_id": "a", "lng": -0.187, "lat": 5.6037}
+        outside = {"bin_id": "b", "lng": 1.5, "lat": 6.0}
+        for scope in ("fleet", "cell"):
+            async_to_sync(consumer.bin_telemetry)(
+                {
+                    "type": "bin_telemetry",
+                    "scope": scope,
+                    "data": {"bins": [inside, outside]},
+                }
+            )
+
+        # The fleet copy is skipped because the cell groups already cover it
+        self.assertEqual(
+            sent_messages(consumer),
+            [{"type": "bin:telemetry", "data": {"bins": [inside]}}],
+        )
+
+    def test_invalid_bbox_is_rejected(self):
+        consumer = make_consumer()
+        async_to_sync(consumer.subscribe_to_viewport)({"bbox": [1, 1, 0, 0]})
+
+        self.assertEqual(sent_messages(consumer)[0]["type"], "error")
+        consumer.channel_layer.group_add.assert_not_awaited()
+
+
+class BulkSubscriptionTests(SimpleTestCase):
+    def setUp(self):
+        self.consumer = make_consumer()
+        self.bin_ids = [str(uuid.uuid4()) for _ in range(3)]
+        self.consumer.get_bins_data = mock.AsyncMock(
+            side_effect=lambda ids: [{"bin_id": bin_id} for bin_id in ids]
+        )
+
+    def test_parse_bin_ids(self):
+        bin_id = uuid.uuid4()
+
+        self.assertEqual(
+            parse_bin_ids([str(bin_id).upper(), "42", None]), [str(bin_id)]
+        )
+        self.assertEqual(parse_bin_ids(str(bin_id)), [str(bin_id)])
+
+    def test_single_snapshot_for_many_bins(self):
+        async_to_sync(self.consumer.receive)(
+            json.dumps({"type": "subscribe_bins", "bin_ids": self.bin_ids + ["bad"]})
+        )
+
+        self.assertEqual(self.consumer.subscribed_bins, set(self.bin_ids))
+        self.assertEqual(self.consumer.channel_layer.group_add.await_count, 3)
+        self.consumer.get_bins_data.assert_awaited_once_with(self.bin_ids)
+        [message] = sent_messages(self.consumer)
+        self.assertEqual(message["type"], "bin:snapshot")
+        self.assertEqual(len(message["data"]["bins"]), 3)
+        self.assertEqual(message["data"]["subscribed"], 3)
+
+    def test_subscriptions_are_capped(self):
+        with mock.patch("apps.WasteBin.consumers.MAX_SUBSCRIBED_BINS", 2):
+            async_to_sync(self.consumer.subscribe_to_bins)({"bin_ids": self.bin_ids})
+
+        self.assertEqual(self.consumer.subscribed_bins, set(self.bin_ids[:2]))
+        self.consumer.get_bins_data.assert_awaited_once_with(self.bin_ids[:2])
+        self.assertEqual(sent_messages(self.consumer)[0]["data"]["limit"], 2)
+
+    def test_disconnect_leaves_every_group(self):
+        async_to_sync(self.consumer.subscribe_to_bins)({"bin_ids": self.bin_ids})
+        async_to_sync(self.consumer.subscribe_to_viewport)(
+            {"bbox": [-0.24, 5.52, -0.16, 5.64]}
+        )
+
+        async_to_sync(self.consumer.disconnect)(1000)
+
+        left = {
+            call.args[0]
+            for call in self.consumer.channel_layer.group_discard.await_args_list
+        }
+        self.assertTrue({bin_group_name(bin_id) for bin_id in self.bin_ids} <= left)
+        self.assertIn(ALL_BINS_GROUP, left)
+        self.assertEqual(len(left), 1 + 3 + 6)
+        self.assertEqual(self.consumer.subscribed_bins, set())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BinStateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        alert_engine.invalidate()
+        self.bin = create_bin("BIN995", fill_level=35)
+        self.other = create_bin("BIN996", fill_level=70)
+
+    def test_misses_are_loaded_in_one_query(self):
+        bin_ids = [self.bin.pk, self.other.pk, uuid.uuid4()]
+
+        with self.assertNumQueries(1):
+            states = bin_state_cache.get_many(bin_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(bin_state_cache.get_many(bin_ids[:2]), states)
+
+        self.assertEqual(set(states), {str(self.bin.pk), str(self.other.pk)})
+        state = states[str(self.bin.pk)]
+        self.assertEqual(state["fill_level"], 35)
+        self.assertEqual(state["battery_level"], self.bin.sensor.battery_level)
+
+    def test_loaded_bins_fill_misses_without_queries(self):
+        bins = list(SmartBin.objects.select_related("sensor"))
+
+        with self.assertNumQueries(0):
+            states = bin_state_cache.get_many([b.pk for b in bins], loaded=bins)
+
+        self.assertEqual(len(states), 2)
+
+    def test_ingest_writes_through_and_invalidate_evicts(self):
+        bin_state_cache.get_many([self.bin.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SensorIngestionService.ingest_batch([payload(self.bin, 85)])
+
+        with self.assertNumQueries(0):
+            state = bin_state_cache.get_many([self.bin.pk])[str(self.bin.pk)]
+        self.assertEqual(state["fill_level"], 85)
+        self.assertEqual(state["battery_level"], 90)
+
+        bin_state_cache.invalidate([self.bin.pk])
+        with self.assertNumQueries(1):
+            bin_state_cache.get_many([self.bin.pk])
+
+
+class ClusterCellSizeTests(SimpleTestCase):
+    def test_cell_size_follows_zoom(self):
+        bbox = [-0.3, 5.5, -0.1, 5.7]
+
+        self.assertAlmostEqual(cell_size_for(bbox, 10), 360 / 2**10 / 4)
+        self.assertAlmostEqual(cell_size_for(bbox, 11), cell_size_for(bbox, 10) / 2)
+
+    def test_large_viewports_are_capped(self):
+        bbox = [-180, -90, 180, 90]
+
+        size = cell_size_for(bbox, 18)
+
+        self.assertAlmostEqual((360 / size) * (180 / size), MAX_CLUSTER_CELLS)
+
+
+class BinClusterTests(TestCase):
+    def test_nearby_bins_share_a_cluster(self):
+        create_bin("BIN997", location=(-0.187, 5.6037), fill_level=90)
+        create_bin("BIN998", location=(-0.186, 5.604), fill_level=30, status="offline")
+        lone = create_bin("BIN999", location=(-1.62, 6.69), fill_level=50)
+
+        result = BinClusterService.clusters(
+            SmartBin.objects.all(), [-2.0, 5.0, 0.0, 7.0], 10
+        )
+
+        clusters = sorted(result["clusters"], key=lambda c: c["count"])
+        self.assertEqual([c["count"] for c in clusters], [1, 2])
+        self.assertEqual(clusters[0]["bin_id"], str(lone.pk))
+        pair = clusters[1]
+        self.assertNotIn("bin_id", pair)
+        self.assertEqual(pair["avg_fill_level"], 60.0)
+        self.assertEqual(pair["max_fill_level"], 90)
+        self.assertEqual(pair["full_count"], 1)
+        self.assertEqual(pair["offline_count"], 1)
+        self.assertEqual(pair["worst_status"], "offline")
+
+    def test_bins_outside_the_viewport_are_skipped(self):
+        create_bin("BIN997", location=(-0.187, 5.6037))
+
+        result = BinClusterService.clusters(
+            SmartBin.objects.all(), [10.0, 10.0, 11.0, 11.0], 10
+        )
+
+        self.assertEqual(result["clusters"], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TileInvalidationTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("apps.WasteBin.tiles.render_tile", return_value=b"mvt")
+        self.render_tile = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_tile_per_zoom_away_from_edges(self):
+        tiles = tiles_containing(-100.3, 40.2, max_zoom=18)
+
+        self.assertEqual(sorted(z for z, _, _ in tiles), list(range(19)))
+
+    def test_buffered_neighbours_are_included(self):
+        self.assertEqual(
+            tiles_containing(0.0, 0.0, max_zoom=1),
+            {(0, 0, 0), (1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)},
+        )
+
+    def test_only_tiles_showing_the_point_are_dropped(self):
+        z = 10
+        x, y = next(
+            (tx, ty) for tz, tx, ty in tiles_containing(-0.187, 5.6037) if tz == z
+        )
+        for restricted in (False, True):
+            get_tile("bins", z, x, y, restricted=restricted)
+            get_tile("bins", z, x + 5, y, restricted=restricted)
+        get_tile("bins", z, x, y)
+        self.assertEqual(self.render_tile.call_count, 4)
+
+        invalidate_tiles("bins", [Point(-0.187, 5.6037, srid=4326), None])
+
+        for restricted in (False, True):
+            get_tile("bins", z, x, y, restricted=restricted)
+            get_tile("bins", z, x + 5, y, restricted=restricted)
+        self.assertEqual(self.render_tile.call_count, 6)
+
+
+class TileWriteTests(TestCase):
+    def setUp(self):
+        alert_engine.invalidate()
+        self.bin = create_bin("BIN994")
+
+    def test_ingest_invalidates_only_when_the_tile_changes(self):
+        with mock.patch("apps.WasteBin.services.invalidate_tiles") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                SensorIngestionService.ingest_batch([payload(self.bin, 85)])
+            invalidate.assert_called_once_with("bins", [self.bin.location])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                SensorIngestionService.ingest_batch(
+                    [payload(self.bin, 88, T0 + timedelta(minutes=5))]
+                )
+            invalidate.assert_called_once()
+
+    def test_reports_layer_requires_sign_in(self):
+        with mock.patch("apps.WasteBin.views.get_tile", return_value=b"mvt") as tile:
+            reports = self.client.get(
+                "/wasgo/api/v1/waste/tiles/reports/10/511/496.mvt"
+            )
+            bins = self.client.get("/wasgo/api/v1/waste/tiles/bins/10/511/496.mvt")
+
+        self.assertEqual(reports.status_code, 401)
+        self.assertEqual(bins.status_code, 200)
+        self.assertEqual(bins["Cache-Control"], "public, max-age=60")
+        tile.assert_called_once_with("bins", 10, 511, 496, restricted=True)
+
+
+class NearestBinsTests(TestCase):
+    def setUp(self):
+        self.origin = (-0.187, 5.6037)
+        self.far = create_bin("BIN981", location=(-0.087, 5.6037))
+        self.close = create_bin("BIN982", location=(-0.186, 5.6037))
+        self.middle = create_bin("BIN983", location=(-0.177, 5.6037))
+
+    def test_closest_first_within_radius(self):
+        bins = list(
+            nearest(SmartBin.objects.all(), "location", Point(*self.origin), 5000, 10)
+        )
+
+        self.assertEqual(bins, [self.close, self.middle])
+        self.assertAlmostEqual(
+            bins[0].distance_m,
+            haversine_km(*self.origin, -0.186, 5.6037) * 1000,
+            delta=1,
+        )
+
+    def test_limit(self):
+        bins = nearest(
+            SmartBin.objects.all(), "location", Point(*self.origin, srid=4326), 50000, 2
+        )
+
+        self.assertEqual(list(bins), [self.close, self.middle])
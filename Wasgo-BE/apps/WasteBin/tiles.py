@@ -0,0 +1,170 @@
+"""
+Mapbox Vector Tiles for the map point layers, rendered by PostGIS.
+
+Each tile is produced by a single ``ST_AsMVT`` query over the features
+intersecting the tile envelope (using the GiST index on the geometry
+column) and cached per layer/z/x/y. Writes invalidate only the cached tiles
+that contain the changed point at each cached zoom level, plus the
+neighbouring tile when the point falls inside the tile buffer.
+"""
+
+import logging
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_TILE_ZOOM = 22
+# Zoom levels up to this one are cached (and invalidated on writes)
+MAX_CACHED_ZOOM = 18
+
+LAYERS = {
+    "bins": {
+        "table": "smart_bins",
+        "geometry": "location",
+        # fill_status rather than fill_level, and no is_online, so only
+        # writes that invalidate tiles change what they show; live levels and
+        # online state come from the telemetry websocket
+        "columns": [
+            "id::text AS id",
+            "bin_number",
+            "fill_status",
+            "status",
+        ],
+        # Restricted variant used for non-staff clients
+        "public_filter": "is_public",
+        "requires_auth": False,
+    },
+    "reports": {
+        "table": "citizen_reports",
+        "geometry": "location",
+        "columns": [
+            "id::text AS id",
+            "report_type",
+            "priority",
+            "status",
+            "smart_bin_id::text AS smart_bin_id",
+        ],
+        "public_filter": None,
+        # Citizen reports have no public subset, so only signed-in users see them
+        "requires_auth": True,
+    },
+    "recycling-centres": {
+        "table": "recycling_centers",
+        "geometry": "coordinates",
+        "columns": ["id::text AS id", "name", "city", "status"],
+        "public_filter": None,
+        "requires_auth": False,
+    },
+}
+
+
+def tile_cache_seconds():
+    return getattr(settings, "MAP_TILE_CACHE_SECONDS", 300)
+
+
+def tile_cache_key(layer, z, x, y, restricted):
+    scope = "public" if restricted else "all"
+    return f"mvt:{layer}:{scope}:{z}:{x}:{y}"
+
+
+def tile_coords(lng, lat, z):
+    """Fractional Web Mercator tile coordinates of a WGS84 point"""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    n = 2**z
+    x = (lng + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tiles_containing(lng, lat, max_zoom=MAX_CACHED_ZOOM):
+    """
+    (z, x, y) of every cached tile a point is drawn in: the tile that
+    contains it plus neighbours whose buffer reaches it.
+    """
+    margin = TILE_BUFFER / TILE_EXTENT
+    tiles = set()
+    for z in range(max_zoom + 1):
+        n = 2**z
+        fx, fy = tile_coords(lng, lat, z)
+        x, y = min(int(fx), n - 1), min(int(fy), n - 1)
+        xs, ys = {x}, {y}
+        if fx - x < margin and x > 0:
+            xs.add(x - 1)
+        if x + 1 - fx < margin and x < n - 1:
+            xs.add(x + 1)
+        if fy - y < margin and y > 0:
+            ys.add(y - 1)
+        if y + 1 - fy < margin and y < n - 1:
+            ys.add(y + 1)
+        tiles.update((z, tx, ty) for tx in xs for ty in ys)
+    return tiles
+
+
+def render_tile(layer, z, x, y, restricted=False):
+    """Build one tile in PostGIS; returns the MVT bytes (possibly empty)"""
+    config = LAYERS[layer]
+    geometry = config["geometry"]
+    where = f"t.{geometry} && ST_Transform(bounds.geom, 4326)"
+    if restricted and config["public_filter"]:
+        where += f" AND t.{config['public_filter']}"
+
+    sql = f"""
+        WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom),
+        features AS (
+            SELECT
+                ST_AsMVTGeom(
+                    ST_Transform(t.{geometry}, 3857), bounds.geom, %s, %s, true
+                ) AS geom,
+                {", ".join(config["columns"])}
+            FROM {config["table"]} t, bounds
+            WHERE {where}
+        )
+        SELECT ST_AsMVT(features.*, %s, %s, 'geom') FROM features
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y, TILE_EXTENT, TILE_BUFFER, layer, TILE_EXTENT])
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b""
+
+
+def get_tile(layer, z, x, y, restricted=False):
+    """Cached tile bytes for layer/z/x/y"""
+    if z > MAX_CACHED_ZOOM:
+        return render_tile(layer, z, x, y, restricted)
+
+    key = tile_cache_key(layer, z, x, y, restricted)
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(layer, z, x, y, restricted)
+        cache.set(key, tile, tile_cache_seconds())
+    return tile
+
+
+def invalidate_tiles(layer, points):
+    """
+    Drop cached tiles of ``layer`` that show any of ``points``.
+
+    ``points`` are GEOS points (or None, which are skipped). Never raises.
+    """
+    try:
+        tiles = set()
+        for point in points:
+            if point is not None:
+                tiles |= tiles_containing(point.x, point.y)
+        if not tiles:
+            return
+        keys = [
+            tile_cache_key(layer, z, x, y, restricted)
+            for z, x, y in tiles
+            for restricted in (False, True)
+        ]
+        cache.delete_many(keys)
+    except Exception:
+        logger.exception("Failed to invalidate %s tiles", layer)
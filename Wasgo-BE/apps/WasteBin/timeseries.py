@@ -0,0 +1,127 @@
+"""
+Compact time series of sensor readings for charting.
+
+Readings are loaded straight into NumPy column arrays (no model instances or
+serializers) and can be decimated to a target point count with the
+Largest-Triangle-Three-Buckets (LTTB) algorithm, which keeps the visual shape
+of the fill level curve - peaks, drops after collection - while discarding
+redundant points.
+"""
+
+import numpy as np
+from django.db.models import F, FloatField, Func
+
+from .models import SensorReading
+
+SERIES_COLUMNS = ["fill_level", "weight_kg", "battery_level"]
+
+
+class EpochSeconds(Func):
+    """``EXTRACT(EPOCH FROM <expr>)`` as a float"""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Indices of the points kept when downsampling (x, y) to ``threshold`` points.
+
+    ``x`` must be sorted ascending. The first and last points are always
+    kept; the points in between are split into ``threshold - 2`` buckets and
+    from each bucket the point forming the largest triangle with the
+    previously selected point and the mean of the next bucket is chosen.
+    Bucket means and triangle areas are computed with vectorized NumPy, so
+    the Python loop runs once per output point rather than once per input.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets over the interior points [1, n - 1)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+
+    # The third vertex for bucket i is the mean of bucket i + 1 (or the last point)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs(
+            (x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def load_series(bin_obj, start, end):
+    """
+    Load readings for ``bin_obj`` in [start, end) as column arrays.
+
+    Returns a dict of float arrays keyed by ``timestamp`` (epoch seconds) and
+    ``SERIES_COLUMNS``; missing values are NaN.
+    """
+    rows = (
+        SensorReading.objects.filter(
+            bin=bin_obj, timestamp__gte=start, timestamp__lt=end
+        )
+        .order_by("timestamp")
+        .values_list(EpochSeconds(F("timestamp")), *SERIES_COLUMNS)
+    )
+    data = np.array(list(rows), dtype=float).reshape(-1, len(SERIES_COLUMNS) + 1)
+
+    series = {"timestamp": data[:, 0]}
+    for index, column in enumerate(SERIES_COLUMNS, start=1):
+        series[column] = data[:, index]
+    return series
+
+
+def downsample(series, points):
+    """Reduce every column to the LTTB indices picked on the fill level curve"""
+    keep = lttb_indices(series["timestamp"], series["fill_level"], points)
+    return {column: values[keep] for column, values in series.items()}
+
+
+def _to_list(values, as_int=False):
+    """Array to JSON-ready list, NaN becoming ``None``"""
+    if not np.isnan(values).any():
+        return values.astype(np.int64).tolist() if as_int else values.tolist()
+    return [None if np.isnan(v) else (int(v) if as_int else v) for v in values.tolist()]
+
+
+def build_reading_series(bin_obj, start, end, points=None):
+    """
+    Column-oriented readings for charting, optionally decimated to ``points``.
+
+    Timestamps are epoch milliseconds so the payload can be fed to chart
+    libraries without parsing.
+    """
+    series = load_series(bin_obj, start, end)
+    total = len(series["timestamp"])
+    if points:
+        series = downsample(series, points)
+
+    return {
+        "bin_id": str(bin_obj.id),
+        "start": start,
+        "end": end,
+        "total_points": total,
+        "returned_points": len(series["timestamp"]),
+        "downsampled": len(series["timestamp"]) < total,
+        "timestamps": _to_list(np.round(series["timestamp"] * 1000), as_int=True),
+        "fill_level": _to_list(series["fill_level"], as_int=True),
+        "weight_kg": _to_list(series["weight_kg"]),
+        "battery_level": _to_list(series["battery_level"], as_int=True),
+    }
@@ -6,6 +6,7 @@ from .views import (
     SensorViewSet,
     SensorDataViewSet,
     BinAlertViewSet,
+    MapTileView,
 )
 from apps.Analytics.views import WasteAnalyticsViewSet
 
@@ -23,5 +24,10 @@ router.register(
 # router.register(r'routes', CollectionRouteViewSet, basename='collection-route')  # Moved to ServiceRequest app
 
 urlpatterns = [
+    path(
+        "tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt",
+        MapTileView.as_view(),
+        name="map-tile",
+    ),
     path("", include(router.urls)),
 ]
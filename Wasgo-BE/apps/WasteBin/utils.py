@@ -4,6 +4,7 @@ Utility functions for WasteBin app
 
 from datetime import datetime
 from .models import SmartBin
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from .models import BinAlert, SmartBin, SensorReading
@@ -81,118 +82,93 @@ def validate_bin_id_format(bin_id):
     return True
 
 
-def create_bin_alert_from_sensor_reading(reading):
+def evaluate_sensor_reading_alerts(bin_obj, reading):
     """
-    Automatically create alerts based on sensor reading data
+    Work out which alerts a sensor reading warrants, without touching the DB.
+
+    Returns a list of dicts with ``alert_type``, ``priority`` and ``message``
+    keys, at most one per alert type.
     """
-    bin_obj = reading.bin
-    sensor_obj = reading.sensor
-    alerts_created = []
+    alerts = []
 
     # Check fill level alerts
     if reading.fill_level >= 100:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="overflow",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "overflow",
                 "priority": "critical",
                 "message": f"Bin {bin_obj.bin_number} is overflowing! Fill level: {reading.fill_level}%",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
-
-    elif reading.fill_level >= 90:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="full",
-            is_resolved=False,
-            defaults={
-                "priority": "high",
+    elif reading.fill_level >= 80:
+        alerts.append(
+            {
+                "alert_type": "full",
+                "priority": "high" if reading.fill_level >= 90 else "medium",
                 "message": f"Bin {bin_obj.bin_number} is full and needs collection. Fill level: {reading.fill_level}%",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
 
     # Check battery level alerts
     if reading.battery_level <= 10:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="low_battery",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "low_battery",
                 "priority": "high",
                 "message": f"Bin {bin_obj.bin_number} sensor battery critically low: {reading.battery_level}%",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
-
     elif reading.battery_level <= 20:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="low_battery",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "low_battery",
                 "priority": "medium",
                 "message": f"Bin {bin_obj.bin_number} sensor battery low: {reading.battery_level}%",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
 
     # Check signal strength alerts
     if reading.signal_strength <= 20:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="offline",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "offline",
                 "priority": "high",
                 "message": f"Bin {bin_obj.bin_number} sensor signal very weak: {reading.signal_strength}%",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
 
     # Check temperature alerts (if temperature sensor)
     if reading.temperature and reading.temperature > 50:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="fire",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "fire",
                 "priority": "critical",
                 "message": f"High temperature detected in bin {bin_obj.bin_number}: {reading.temperature}°C",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
 
     # Check motion detection (potential vandalism)
     if reading.motion_detected and reading.lid_open:
-        alert, created = BinAlert.objects.get_or_create(
-            bin=bin_obj,
-            sensor=sensor_obj,
-            alert_type="vandalism",
-            is_resolved=False,
-            defaults={
+        alerts.append(
+            {
+                "alert_type": "vandalism",
                 "priority": "medium",
                 "message": f"Unusual activity detected at bin {bin_obj.bin_number} - lid opened with motion",
-            },
+            }
         )
-        if created:
-            alerts_created.append(alert)
 
-    return alerts_created
+    return alerts
+
+
+def create_bin_alert_from_sensor_reading(reading):
+    """
+    Automatically create alerts based on sensor reading data
+    """
+    from .alerts import alert_engine
+
+    with transaction.atomic():
+        plan = alert_engine.evaluate([(reading.bin, reading)])
+        return alert_engine.commit(plan)
 
 
 def create_bin_alert_manually(
@@ -266,19 +242,37 @@ def check_and_create_maintenance_alerts():
     return alerts_created
 
 
-def resolve_related_alerts(bin_obj, alert_type=None):
+def resolve_related_alerts(bin_obj=None, alert_type=None, alert_ids=None):
     """
-    Resolve alerts when conditions improve
+    Resolve alerts when conditions improve.
+
+    Resolves the open alerts of a bin (optionally of one type), or a given
+    list of alert IDs, with a single UPDATE. Returns the IDs of the alerts
+    that were still open and have now been resolved; alerts another worker
+    already resolved are not included. Either ``bin_obj`` or ``alert_ids`` is
+    required.
     """
-    filters = {"bin": bin_obj, "is_resolved": False}
+    if bin_obj is None and alert_ids is None:
+        raise ValueError("resolve_related_alerts needs a bin or alert IDs")
+
+    filters = {"is_resolved": False}
+    if bin_obj is not None:
+        filters["bin"] = bin_obj
     if alert_type:
         filters["alert_type"] = alert_type
-
-    alerts_to_resolve = BinAlert.objects.filter(**filters)
-
-    for alert in alerts_to_resolve:
-        alert.is_resolved = True
-        alert.resolved_at = timezone.now()
-        alert.save()
-
-    return alerts_to_resolve.count()
+    if alert_ids is not None:
+        filters["id__in"] = alert_ids
+
+    now = timezone.now()
+    with transaction.atomic():
+        resolved = list(
+            BinAlert.objects.select_for_update()
+            .filter(**filters)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if resolved:
+            BinAlert.objects.filter(id__in=resolved).update(
+                is_resolved=True, resolved_at=now, updated_at=now
+            )
+    return resolved
@@ -2,19 +2,21 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.views import APIView
+from django.http import HttpResponse
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.measure import D
 from django.db.models import Count, Avg, Q, F, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 
+from utils.spatial import nearest
 from .models import (
     BinType,
     SmartBin,
     Sensor,
     SensorReading,
+    SensorReadingRollup,
     BinAlert,
 )
 from .serializers import (
@@ -25,11 +27,26 @@ from .serializers import (
     SmartBinListJSONSerializer,
     SensorSerializer,
     SensorReadingSerializer,
+    SensorReadingRollupSerializer,
+    ReadingTimeSeriesQuerySerializer,
+    BinClusterQuerySerializer,
     SensorDataInputSerializer,
     BinAlertSerializer,
     BinStatusSummarySerializer,
     NearestBinSerializer,
 )
+from .services import SensorIngestionService, OnlineStatusService
+from .ingest_queue import get_ingest_queue, is_async_ingest_enabled
+from .alerts import alert_engine
+from .rollups import truncate as truncate_to_bucket
+from .timeseries import build_reading_series
+from .fleet import FleetSummaryService
+from .dashboard import invalidate_fleet_counters
+from .bin_state import bin_state_cache, invalidate_bin_states
+from .clustering import BinClusterService
+from .tiles import LAYERS as TILE_LAYERS, MAX_TILE_ZOOM, get_tile, invalidate_tiles
+
+READING_RESOLUTIONS = ["raw", "hour", "day"]
 
 
 class BinTypeViewSet(viewsets.ModelViewSet):
@@ -48,12 +65,29 @@ class SensorViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]  # Temporarily allow anonymous access for testing
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ["list", "available"]:
             return SensorSerializer
         return SensorDetailSerializer
 
+    # Battery, signal and status edits change the cached state of the bin
+    def perform_update(self, serializer):
+        sensor = serializer.save()
+        invalidate_bin_states(
+            SmartBin.objects.filter(sensor=sensor).values_list("id", flat=True)
+        )
+
+    def perform_destroy(self, instance):
+        bin_ids = list(
+            SmartBin.objects.filter(sensor=instance).values_list("id", flat=True)
+        )
+        instance.delete()
+        invalidate_bin_states(bin_ids)
+
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related("assigned_bin")
+        if self.action in ["list", "available"]:
+            # One grouped COUNT instead of one per sensor in SensorSerializer
+            queryset = queryset.annotate(readings_total=Count("readings"))
 
         # Filter by status
         status_param = self.request.query_params.get("status")
@@ -129,7 +163,7 @@ class SensorViewSet(viewsets.ModelViewSet):
             "sensor__id", flat=True
         )
 
-        available_sensors = Sensor.objects.filter(
+        available_sensors = self.get_queryset().filter(
             ~Q(id__in=assigned_sensor_ids), status="active"
         )
 
@@ -140,7 +174,7 @@ class SensorViewSet(viewsets.ModelViewSet):
     def readings(self, request, pk=None):
         """Get all readings for a specific sensor"""
         sensor = self.get_object()
-        readings = sensor.readings.select_related("bin").order_by("-timestamp")
+        readings = sensor.readings.select_related("bin", "sensor").order_by("-timestamp")
 
         # Apply filters
         limit = request.query_params.get("limit", 50)
@@ -162,13 +196,49 @@ class SensorViewSet(viewsets.ModelViewSet):
 
         try:
             limit = int(limit)
-            readings = readings[:limit]
         except ValueError:
             limit = 50
-            readings = readings[:limit]
 
-        # Serialize readings
-        from .serializers import SensorReadingSerializer
+        resolution = request.query_params.get("resolution", "raw")
+        if resolution not in READING_RESOLUTIONS:
+            return Response(
+                {"error": f"resolution must be one of {', '.join(READING_RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if resolution != "raw":
+            # Rollups are kept per bin, so use the bin this sensor reports for
+            try:
+                bin_obj = sensor.assigned_bin
+            except SmartBin.DoesNotExist:
+                bin_obj = None
+
+            rollups = SensorReadingRollup.objects.none()
+            if bin_obj:
+                rollups = bin_obj.reading_rollups.filter(resolution=resolution)
+                if since:
+                    rollups = rollups.filter(
+                        bucket__gte=truncate_to_bucket(since_date, resolution)
+                    )
+            rollup_data = SensorReadingRollupSerializer(
+                rollups.order_by("-bucket")[:limit], many=True
+            ).data
+
+            return Response(
+                {
+                    "sensor": {
+                        "id": sensor.id,
+                        "sensor_number": sensor.sensor_number,
+                        "sensor_type": sensor.sensor_type,
+                        "status": sensor.status,
+                    },
+                    "resolution": resolution,
+                    "readings_count": len(rollup_data),
+                    "readings": rollup_data,
+                }
+            )
+
+        readings = readings[:limit]
 
         serializer = SensorReadingSerializer(readings, many=True)
 
@@ -189,9 +259,9 @@ class SensorViewSet(viewsets.ModelViewSet):
     def detail(self, request, pk=None):
         """Get detailed sensor information including recent readings"""
         sensor = self.get_object()
-        from .serializers import SensorDetailSerializer
-
-        serializer = SensorDetailSerializer(sensor)
+        serializer = SensorDetailSerializer(
+            sensor, context=self.get_serializer_context()
+        )
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
@@ -334,16 +404,50 @@ class SmartBinViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
 
-        # Update online status for all bins in queryset
-        queryset = queryset.select_related("bin_type", "sensor", "user")
-
-        # Check and update online status for each bin
-        for bin in queryset:
-            bin.check_and_set_online()
-            bin.save()  # Save the updated status
+        # Online status is derived from the joined sensor rather than written
+        # back on every read, so listing bins stays read-only
+        queryset = queryset.select_related("bin_type", "sensor", "user").annotate(
+            online_now=SmartBin.online_annotation()
+        )
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        bins = list(page if page is not None else queryset)
+        context = self.get_serializer_context()
+        # Live fields of the bins on this page are hydrated from the hot
+        # state cache in one round-trip
+        context["bin_states"] = bin_state_cache.get_many(
+            [b.pk for b in bins], loaded=bins
+        )
+        serializer = self.get_serializer_class()(bins, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    # Bins added, edited or removed here change the fleet counters and cached
+    # bin state outside the ingestion path, so have them rebuilt
+    def perform_create(self, serializer):
+        bin = serializer.save()
+        invalidate_fleet_counters()
+        invalidate_tiles("bins", [bin.location])
+
+    def perform_update(self, serializer):
+        old_location = serializer.instance.location
+        bin = serializer.save()
+        invalidate_bin_states([bin.pk])
+        invalidate_fleet_counters()
+        invalidate_tiles("bins", [old_location, bin.location])
+
+    def perform_destroy(self, instance):
+        bin_id, location = instance.pk, instance.location
+        instance.delete()
+        invalidate_bin_states([bin_id])
+        invalidate_fleet_counters()
+        invalidate_tiles("bins", [location])
+
     @action(detail=False, methods=["get"], permission_classes=[AllowAny])
     def nearest(self, request):
         """Find nearest bins to a location"""
@@ -355,52 +459,66 @@ class SmartBinViewSet(viewsets.ModelViewSet):
 
         queryset = (
             SmartBin.objects.filter(status="active", is_public=True)
-            .annotate(distance=Distance("location", user_location))
-            .filter(distance__lte=D(km=data["radius_km"]))
+            .select_related("bin_type", "sensor", "user")
+            .annotate(online_now=SmartBin.online_annotation())
         )
 
         if data.get("bin_type"):
             queryset = queryset.filter(bin_type__name=data["bin_type"])
 
-        queryset = queryset.order_by("distance")[: data["max_results"]]
+        # Radius and ordering both run on the geography GiST index
+        bins = list(
+            nearest(
+                queryset,
+                "location",
+                user_location,
+                data["radius_km"] * 1000,
+                data["max_results"],
+            )
+        )
+        context = {
+            "request": request,
+            "bin_states": bin_state_cache.get_many([b.pk for b in bins], loaded=bins),
+        }
 
         # Serialize with distance
         bins_data = []
-        for bin in queryset:
-            bin_dict = SmartBinListSerializer(bin).data
-            bin_dict["distance_km"] = round(bin.distance.km, 2)
+        for bin in bins:
+            bin_dict = SmartBinListSerializer(bin, context=context).data
+            bin_dict["distance_km"] = round(bin.distance_m / 1000, 2)
             bins_data.append(bin_dict)
 
         return Response(bins_data)
 
+    @action(detail=False, methods=["get"])
+    def clusters(self, request):
+        """
+        Map clusters for a viewport: ``bbox=min_lng,min_lat,max_lng,max_lat``
+        and ``zoom``. Each cluster carries its bin count, average and max
+        fill level and worst status.
+        """
+        serializer = BinClusterQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = SmartBin.objects.all()
+        if not request.user.is_authenticated:
+            queryset = queryset.filter(is_public=True)
+        elif not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        if data.get("status"):
+            queryset = queryset.filter(status=data["status"])
+        if data.get("bin_type"):
+            queryset = queryset.filter(bin_type__name=data["bin_type"])
+
+        return Response(
+            BinClusterService.clusters(queryset, data["bbox"], data["zoom"])
+        )
+
     @action(detail=False, methods=["get"])
     def status_summary(self, request):
         """Get summary of bin statuses for dashboard"""
-        bins = SmartBin.objects.all()
-
-        summary = {
-            "total_bins": bins.count(),
-            "active_bins": bins.filter(status="active").count(),
-            "full_bins": bins.filter(fill_level__gte=80).count(),
-            "offline_bins": bins.filter(status="offline").count(),
-            "maintenance_required": bins.filter(
-                Q(battery_level__lt=20)
-                | Q(signal_strength__lt=30)
-                | Q(status__in=["maintenance", "damaged"])
-            ).count(),
-            "average_fill_level": bins.aggregate(Avg("fill_level"))["fill_level__avg"]
-            or 0,
-            "bins_by_status": dict(
-                bins.values("status")
-                .annotate(count=Count("id"))
-                .values_list("status", "count")
-            ),
-            "bins_by_area": dict(
-                bins.values("area")
-                .annotate(count=Count("id"))
-                .values_list("area", "count")
-            ),
-        }
+        summary = FleetSummaryService.get_summary()
 
         serializer = BinStatusSummarySerializer(summary)
         return Response(serializer.data)
@@ -414,10 +532,50 @@ class SmartBinViewSet(viewsets.ModelViewSet):
         hours = int(request.query_params.get("hours", 24))
         since = timezone.now() - timedelta(hours=hours)
 
-        readings = bin.readings.filter(timestamp__gte=since).order_by("-timestamp")
+        # raw returns every reading; hour/day return pre-aggregated rollups
+        resolution = request.query_params.get("resolution", "raw")
+        if resolution not in READING_RESOLUTIONS:
+            return Response(
+                {"error": f"resolution must be one of {', '.join(READING_RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if resolution != "raw":
+            rollups = bin.reading_rollups.filter(
+                resolution=resolution,
+                bucket__gte=truncate_to_bucket(since, resolution),
+            ).order_by("-bucket")
+            serializer = SensorReadingRollupSerializer(rollups, many=True)
+            return Response(serializer.data)
+
+        readings = (
+            bin.readings.filter(timestamp__gte=since)
+            .select_related("bin", "sensor")
+            .order_by("-timestamp")
+        )
         serializer = SensorReadingSerializer(readings, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"])
+    def timeseries(self, request, pk=None):
+        """
+        Fill level, weight and battery history as compact column arrays.
+
+        Query params: ``hours`` (default 24) or ``start``/``end`` (ISO), and
+        ``points`` to downsample long ranges with LTTB for charting.
+        """
+        bin = self.get_object()
+
+        query = ReadingTimeSeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        return Response(
+            build_reading_series(
+                bin, params["start"], params["end"], points=params.get("points")
+            )
+        )
+
     @action(detail=True, methods=["get"])
     def alerts(self, request, pk=None):
         """Get alerts for a specific bin"""
@@ -429,25 +587,17 @@ class SmartBinViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def statistics(self, request):
         """Get comprehensive bin statistics"""
-        bins = SmartBin.objects.all()
+        summary = FleetSummaryService.get_summary()
 
         stats = {
-            "total_bins": bins.count(),
-            "active_bins": bins.filter(status="active").count(),
-            "bins_needing_collection": bins.filter(fill_level__gte=80).count(),
-            "bins_needing_maintenance": bins.filter(
-                Q(battery_level__lt=20)
-                | Q(signal_strength__lt=30)
-                | Q(status__in=["maintenance", "damaged"])
-            ).count(),
-            "average_fill_level": bins.aggregate(Avg("fill_level"))["fill_level__avg"]
-            or 0,
-            "total_alerts": BinAlert.objects.filter(is_resolved=False).count(),
-            "resolved_alerts": BinAlert.objects.filter(is_resolved=True).count(),
-            "total_weight_collected": bins.aggregate(Sum("current_weight_kg"))[
-                "current_weight_kg__sum"
-            ]
-            or 0,
+            "total_bins": summary["total_bins"],
+            "active_bins": summary["active_bins"],
+            "bins_needing_collection": summary["full_bins"],
+            "bins_needing_maintenance": summary["maintenance_required"],
+            "average_fill_level": summary["average_fill_level"],
+            "total_alerts": summary["open_alerts"],
+            "resolved_alerts": summary["resolved_alerts"],
+            "total_weight_collected": summary["total_weight_kg"],
         }
 
         return Response(stats)
@@ -540,50 +690,14 @@ class SensorDataViewSet(viewsets.ViewSet):
 
         data = serializer.validated_data
 
-        try:
-            # Find bin by sensor ID
-            bin = SmartBin.objects.get(sensor_id=data["sensor_id"])
-
-            # Update bin with latest data
-            bin.fill_level = data["fill_level"]
-            bin.current_weight_kg = data.get("weight_kg", bin.current_weight_kg)
-            bin.temperature = data.get("temperature")
-            bin.humidity = data.get("humidity")
-            bin.battery_level = data["battery_level"]
-            bin.signal_strength = data["signal_strength"]
-            bin.last_reading_at = data.get("timestamp", timezone.now())
-
-            # Update fill status
-            bin.update_fill_status()
-
-            # Check if bin needs collection
-            if bin.fill_level >= 80 and bin.status != "full":
-                bin.status = "full"
-                # Create alert
-                BinAlert.objects.create(
-                    bin=bin,
-                    alert_type="full" if bin.fill_level < 100 else "overflow",
-                    priority="high" if bin.fill_level >= 90 else "medium",
-                    message=f"Bin {bin.name} is {bin.fill_level}% full and needs collection",
-                )
-
-            # Save bin
-            bin.save()
+        if is_async_ingest_enabled():
+            get_ingest_queue().enqueue([data])
+            return Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
 
-            # Create sensor reading record
-            SensorReading.objects.create(
-                bin=bin,
-                fill_level=data["fill_level"],
-                weight_kg=data.get("weight_kg"),
-                temperature=data.get("temperature"),
-                humidity=data.get("humidity"),
-                battery_level=data["battery_level"],
-                signal_strength=data["signal_strength"],
-                motion_detected=data.get("motion_detected", False),
-                lid_open=data.get("lid_open", False),
-                error_code=data.get("error_code", ""),
-                raw_data=data.get("raw_data"),
-            )
+        try:
+            # Fill status, online state and alerts are computed in memory and
+            # committed together in one transaction
+            bin = SensorIngestionService.ingest(data)
 
             return Response({"status": "success", "bin_number": bin.bin_number})
 
@@ -605,23 +719,49 @@ class SensorDataViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        results = []
-        for sensor_data in request.data:
+        if len(request.data) > SensorIngestionService.MAX_BATCH_SIZE:
+            return Response(
+                {
+                    "error": f"Batch too large. Maximum is {SensorIngestionService.MAX_BATCH_SIZE} readings"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Validate every item first, then persist the valid ones in one pass
+        results = [None] * len(request.data)
+        valid_items = []
+        valid_positions = []
+        for index, sensor_data in enumerate(request.data):
             serializer = SensorDataInputSerializer(data=sensor_data)
             if serializer.is_valid():
-                # Process each sensor data (similar to upload method)
-                # ... (implementation similar to upload)
-                results.append(
-                    {"sensor_id": sensor_data.get("sensor_id"), "status": "success"}
-                )
+                valid_items.append(serializer.validated_data)
+                valid_positions.append(index)
             else:
-                results.append(
-                    {
-                        "sensor_id": sensor_data.get("sensor_id"),
-                        "status": "error",
-                        "errors": serializer.errors,
-                    }
-                )
+                results[index] = {
+                    "sensor_id": (
+                        sensor_data.get("sensor_id")
+                        if isinstance(sensor_data, dict)
+                        else None
+                    ),
+                    "status": "error",
+                    "errors": serializer.errors,
+                }
+
+        if is_async_ingest_enabled():
+            get_ingest_queue().enqueue(valid_items)
+            for index, item in zip(valid_positions, valid_items):
+                results[index] = {"sensor_id": item["sensor_id"], "status": "queued"}
+            return Response(results, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            ingested = SensorIngestionService.ingest_batch(valid_items)
+        except Exception as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        for index, result in zip(valid_positions, ingested):
+            results[index] = result
 
         return Response(results)
 
@@ -629,21 +769,14 @@ class SensorDataViewSet(viewsets.ViewSet):
     def update_online_status(self, request):
         """Update online status for all bins"""
         try:
-            bins = SmartBin.objects.select_related("sensor").all()
-            updated_count = 0
-
-            for bin in bins:
-                if bin.sensor:
-                    old_status = bin.is_online
-                    bin.check_and_set_online()
-                    if old_status != bin.is_online:
-                        bin.save()  # Save the updated status
-                        updated_count += 1
+            timed_out = OnlineStatusService.sweep_stale_sensors()
+            went_online, went_offline = OnlineStatusService.sync_online_flags()
+            updated_count = len(timed_out) + went_online + went_offline
 
             return Response(
                 {
                     "message": f"Updated online status for {updated_count} bins",
-                    "total_bins": bins.count(),
+                    "total_bins": SmartBin.objects.count(),
                     "updated_count": updated_count,
                 }
             )
@@ -681,6 +814,24 @@ class BinAlertViewSet(viewsets.ModelViewSet):
 
         return queryset.select_related("bin", "resolved_by").order_by("-created_at")
 
+    # Keep the alert engine's open-alert cache and the dashboard counters in
+    # step with manual edits
+    def perform_create(self, serializer):
+        alert = serializer.save()
+        alert_engine.invalidate([alert.bin_id])
+        invalidate_fleet_counters()
+
+    def perform_update(self, serializer):
+        alert = serializer.save()
+        alert_engine.invalidate([alert.bin_id])
+        invalidate_fleet_counters()
+
+    def perform_destroy(self, instance):
+        bin_id = instance.bin_id
+        instance.delete()
+        alert_engine.invalidate([bin_id])
+        invalidate_fleet_counters()
+
     @action(detail=True, methods=["post"])
     def resolve(self, request, pk=None):
         """Resolve an alert"""
@@ -688,6 +839,8 @@ class BinAlertViewSet(viewsets.ModelViewSet):
         notes = request.data.get("notes", "")
 
         alert.resolve(request.user, notes)
+        alert_engine.invalidate([alert.bin_id])
+        invalidate_fleet_counters()
         serializer = self.get_serializer(alert)
         return Response(serializer.data)
 
@@ -724,6 +877,8 @@ class BinAlertViewSet(viewsets.ModelViewSet):
                 user=request.user,
                 sensor=sensor_obj,
             )
+            alert_engine.invalidate([bin_obj.pk])
+            invalidate_fleet_counters()
 
             serializer = self.get_serializer(alert)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -745,6 +900,8 @@ class BinAlertViewSet(viewsets.ModelViewSet):
 
         try:
             alerts_created = check_and_create_maintenance_alerts()
+            if alerts_created:
+                invalidate_fleet_counters()
             return Response(
                 {
                     "message": f"Created {alerts_created} maintenance alerts",
@@ -758,6 +915,45 @@ class BinAlertViewSet(viewsets.ModelViewSet):
             )
 
 
+class MapTileView(APIView):
+    """
+    Mapbox Vector Tiles for the map layers: /tiles/{layer}/{z}/{x}/{y}.mvt
+
+    Layers: bins, reports, recycling-centres. Non-staff clients get the
+    public variant of layers that have one (public bins only); the reports
+    layer is only served to signed-in users.
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request, layer, z, x, y):
+        if layer not in TILE_LAYERS:
+            return Response(
+                {"error": f"Unknown layer '{layer}'"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if z > MAX_TILE_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+            return Response(
+                {"error": "Invalid tile coordinates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        requires_auth = TILE_LAYERS[layer]["requires_auth"]
+        if requires_auth and not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        restricted = not (request.user.is_authenticated and request.user.is_staff)
+        tile = get_tile(layer, z, x, y, restricted=restricted)
+
+        response = HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
+        # Shared caches must not hand a signed-in layer to anonymous clients
+        scope = "public" if restricted and not requires_auth else "private"
+        response["Cache-Control"] = f"{scope}, max-age=60"
+        return response
+
+
 # CollectionRouteViewSet moved to ServiceRequest app
 
 
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PricingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pricing'
+
+    def ready(self):
+        """Import signals when the app is ready"""
+        import apps.pricing.signals  # noqa: F401
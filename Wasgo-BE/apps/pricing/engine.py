@@ -0,0 +1,357 @@
+"""
+Compiled, in-memory pricing model.
+
+The active ``PricingConfiguration`` and all of its active factors are loaded
+once into immutable tuples (factor lists, plus lookup dicts keyed by
+property type, service level, vehicle type and city) with every Decimal
+converted to float. Pricing a job then only needs plain Python arithmetic on this
+structure, without touching the database.
+
+Compiled models are versioned and shared across workers through the Django
+cache; each process also keeps the last model it used and only re-reads the
+shared copy when the version changes. Any change to a configuration or a
+factor (see ``signals.py``) bumps the version, so the next pricing call
+recompiles.
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceFactor(NamedTuple):
+    base_rate_per_km: float
+    max_distance: float
+    additional_distance_threshold: float
+    additional_distance_multiplier: float
+
+    def calculate_price(self, distance_km):
+        return self.base_rate_per_km * max(0, min(distance_km, self.max_distance))
+
+
+class WeightFactor(NamedTuple):
+    base_rate_per_kg: float
+    max_weight: float
+    heavy_item_threshold: float
+    heavy_item_surcharge: float
+
+    def calculate_price(self, weight_kg):
+        return self.base_rate_per_kg * max(0, min(weight_kg, self.max_weight))
+
+
+class TimeFactor(NamedTuple):
+    weekend_multiplier: float
+    holiday_multiplier: float
+    peak_hour_multiplier: float
+
+
+class WeatherFactor(NamedTuple):
+    rain_multiplier: float
+    snow_multiplier: float
+    extreme_weather_multiplier: float
+
+
+class PropertyFactor(NamedTuple):
+    property_type: str
+    base_rate: float
+    rate_per_room: float
+    floor_rate: float
+    elevator_discount: float
+
+
+class ServiceLevelFactor(NamedTuple):
+    service_level: str
+    price_multiplier: float
+
+
+class VehicleFactor(NamedTuple):
+    vehicle_type: str
+    base_rate: float
+    capacity_multiplier: float
+    # Vehicle capacity (capacity_cubic_meters) used for volume utilisation
+    max_volume: float
+
+
+class InsuranceFactor(NamedTuple):
+    value_percentage: float
+    min_premium: float
+    premium_coverage_multiplier: float
+    high_value_item_rate: float
+
+
+class StaffFactor(NamedTuple):
+    base_rate_per_staff: float
+    min_staff: int
+    max_staff: int
+
+
+class SpecialRequirementsFactor(NamedTuple):
+    fragile_items_multiplier: float
+    assembly_required_rate: float
+    special_equipment_rate: float
+
+
+class LocationFactor(NamedTuple):
+    city_name: str
+    zone_multiplier: float
+    congestion_charge: float
+    parking_fee: float
+
+
+class LoadingTimeFactor(NamedTuple):
+    base_rate_per_hour: float
+    min_hours: float
+    overtime_multiplier: float
+
+
+class PricingModel(NamedTuple):
+    """Immutable snapshot of the active pricing configuration"""
+
+    version: int
+    config_id: str
+    name: str
+    base_price: float
+    min_price: float
+    max_price_multiplier: float
+    fuel_surcharge_percentage: float
+    carbon_offset_rate: float
+    distance: tuple
+    weight: tuple
+    time: tuple
+    weather: tuple
+    insurance: tuple
+    staff: tuple
+    special_requirements: tuple
+    loading_time: tuple
+    # {property_type / service_level / vehicle_type / city_name: tuple of factors}
+    property_by_type: dict
+    service_level_by_name: dict
+    vehicle_by_type: dict
+    location_by_city: dict
+
+    def factors_for(self, service_level, property_type, vehicle_type):
+        """Factors for one job, in the shape the PricingService helpers expect"""
+        return {
+            "distance": self.distance,
+            "weight": self.weight,
+            "property": self.property_by_type.get(property_type, ()),
+            "service_level": self.service_level_by_name.get(service_level, ()),
+            "vehicle": self.vehicle_by_type.get(vehicle_type, ()),
+            "time": self.time,
+            "weather": self.weather,
+            "insurance": self.insurance,
+            "staff": self.staff,
+        }
+
+
+def _active(factors):
+    """Active factors of an M2M manager (or of a plain list, for the default)"""
+    if hasattr(factors, "filter"):
+        return list(factors.filter(is_active=True))
+    return [factor for factor in factors if factor.is_active]
+
+
+def _group(factors, attribute):
+    grouped = {}
+    for factor in factors:
+        grouped.setdefault(getattr(factor, attribute), []).append(factor)
+    return {key: tuple(values) for key, values in grouped.items()}
+
+
+def compile_configuration(config, version=0):
+    """Build a PricingModel from a PricingConfiguration (one query per factor type)"""
+    return PricingModel(
+        version=version,
+        config_id=str(getattr(config, "id", "") or ""),
+        name=config.name,
+        base_price=float(config.base_price),
+        min_price=float(config.min_price),
+        max_price_multiplier=float(config.max_price_multiplier),
+        fuel_surcharge_percentage=float(config.fuel_surcharge_percentage),
+        carbon_offset_rate=float(config.carbon_offset_rate),
+        distance=tuple(
+            DistanceFactor(
+                float(f.base_rate_per_km),
+                float(f.max_distance),
+                float(f.additional_distance_threshold),
+                float(f.additional_distance_multiplier),
+            )
+            for f in _active(config.distance_factors)
+        ),
+        weight=tuple(
+            WeightFactor(
+                float(f.base_rate_per_kg),
+                float(f.max_weight),
+                float(f.heavy_item_threshold),
+                float(f.heavy_item_surcharge),
+            )
+            for f in _active(config.weight_factors)
+        ),
+        time=tuple(
+            TimeFactor(
+                float(f.weekend_multiplier),
+                float(f.holiday_multiplier),
+                float(f.peak_hour_multiplier),
+            )
+            for f in _active(config.time_factors)
+        ),
+        weather=tuple(
+            WeatherFactor(
+                float(f.rain_multiplier),
+                float(f.snow_multiplier),
+                float(f.extreme_weather_multiplier),
+            )
+            for f in _active(config.weather_factors)
+        ),
+        insurance=tuple(
+            InsuranceFactor(
+                float(f.value_percentage),
+                float(f.min_premium),
+                float(f.premium_coverage_multiplier),
+                float(f.high_value_item_rate),
+            )
+            for f in _active(config.insurance_factors)
+        ),
+        staff=tuple(
+            StaffFactor(float(f.base_rate_per_staff), f.min_staff, f.max_staff)
+            for f in _active(config.staff_factors)
+        ),
+        special_requirements=tuple(
+            SpecialRequirementsFactor(
+                float(f.fragile_items_multiplier),
+                float(f.assembly_required_rate),
+                float(f.special_equipment_rate),
+            )
+            for f in _active(config.special_requirement_factors)
+        ),
+        loading_time=tuple(
+            LoadingTimeFactor(
+                float(f.base_rate_per_hour),
+                float(f.min_hours),
+                float(f.overtime_multiplier),
+            )
+            for f in _active(config.loading_time_factors)
+        ),
+        property_by_type=_group(
+            (
+                PropertyFactor(
+                    f.property_type,
+                    float(f.base_rate),
+                    float(f.rate_per_room),
+                    float(f.floor_rate),
+                    float(f.elevator_discount),
+                )
+                for f in _active(config.property_type_factors)
+            ),
+            "property_type",
+        ),
+        service_level_by_name=_group(
+            (
+                ServiceLevelFactor(f.service_level, float(f.price_multiplier))
+                for f in _active(config.service_level_factors)
+            ),
+            "service_level",
+        ),
+        vehicle_by_type=_group(
+            (
+                VehicleFactor(
+                    f.vehicle_type,
+                    float(f.base_rate),
+                    float(f.capacity_multiplier),
+                    float(f.capacity_cubic_meters or 0) or 1.0,
+                )
+                for f in _active(config.vehicle_factors)
+            ),
+            "vehicle_type",
+        ),
+        location_by_city=_group(
+            (
+                LocationFactor(
+                    f.city_name,
+                    float(f.zone_multiplier),
+                    float(f.congestion_charge),
+                    float(f.parking_fee),
+                )
+                for f in _active(config.location_factors)
+            ),
+            "city_name",
+        ),
+    )
+
+
+class PricingModelCache:
+    """Versioned PricingModel shared through the cache, memoised per process"""
+
+    VERSION_KEY = "pricing_model:version"
+    # Bump the schema segment whenever PricingModel's fields change, so
+    # models pickled by older code are never loaded into the new tuples
+    MODEL_KEY = "pricing_model:2:{version}"
+    TIMEOUT = 24 * 3600
+
+    def __init__(self):
+        self._local = None
+        self._lock = threading.Lock()
+
+    def version(self):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            # Start from a timestamp so a lost version key can never make an
+            # older cached model current again
+            cache.add(self.VERSION_KEY, time.time_ns(), None)
+            version = cache.get(self.VERSION_KEY)
+        return version
+
+    def get(self):
+        version = self.version()
+        local = self._local
+        if local is not None and local.version == version:
+            return local
+
+        with self._lock:
+            local = self._local
+            if local is not None and local.version == version:
+                return local
+
+            key = self.MODEL_KEY.format(version=version)
+            model = cache.get(key)
+            if model is None:
+                model = self.compile(version)
+                cache.set(key, model, self.TIMEOUT)
+            self._local = model
+            return model
+
+    @staticmethod
+    def compile(version):
+        from .services import PricingService
+
+        PricingService.ensure_default_config_exists()
+        config = PricingService.get_active_configuration()
+        if not config:
+            raise ValueError("No active pricing configuration found")
+        return compile_configuration(config, version)
+
+    def invalidate(self):
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.add(self.VERSION_KEY, time.time_ns(), None)
+
+
+pricing_models = PricingModelCache()
+
+
+def get_pricing_model():
+    return pricing_models.get()
+
+
+def invalidate_pricing_model():
+    """Make every worker recompile on its next pricing call; never raises"""
+    try:
+        pricing_models.invalidate()
+    except Exception:
+        logger.exception("Failed to invalidate the compiled pricing model")
@@ -0,0 +1,186 @@
+"""
+Vectorized price forecast calendar.
+
+Everything that does not depend on the date (base price, distance, weight,
+property, vehicle and insurance costs, service level, vehicle and priority
+multipliers) is computed once per request. The per-day parts (weekend and
+holiday time multipliers, out-of-hours staff rates, weather) are applied to
+the whole date range at once as NumPy arrays of shape (days, staff counts);
+only the final calendar dicts are built in Python.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Staff rates (GBP per hour) for each supported staff count
+STAFF_BASE_RATES = {1: 25.00, 2: 45.00, 3: 65.00, 4: 85.00}
+# Minimum hours charged per job
+MIN_HOURS = 2.0
+# Premium on staff cost for weekends and holidays
+OUT_OF_HOURS_MULTIPLIER = 1.5
+
+StaffPriceGrid = namedtuple(
+    "StaffPriceGrid", ["staff_cost", "fuel_surcharge", "carbon_offset", "price"]
+)
+
+
+def date_flags(dates, uk_holidays):
+    """Boolean (weekend, holiday) arrays for a list of dates"""
+    is_weekend = np.fromiter((d.weekday() >= 5 for d in dates), bool, len(dates))
+    is_holiday = np.fromiter((d in uk_holidays for d in dates), bool, len(dates))
+    return is_weekend, is_holiday
+
+
+def time_multipliers(time_factors, is_weekend, is_holiday):
+    """Per-day time multiplier from the first active time factor"""
+    if not time_factors:
+        return np.ones(len(is_weekend))
+    factor = time_factors[0]
+    return np.where(
+        is_holiday,
+        float(factor.holiday_multiplier),
+        np.where(is_weekend, float(factor.weekend_multiplier), 1.0),
+    )
+
+
+def staff_price_grid(fixed_cost, out_of_hours, multipliers, pricing_model):
+    """
+    Prices for every day and staff count.
+
+    ``fixed_cost`` is the sum of the date-independent costs; ``multipliers``
+    are applied in order and may be scalars or per-day arrays.
+    """
+    staff_cost = np.array(list(STAFF_BASE_RATES.values())) * MIN_HOURS
+    staff_cost = np.where(
+        out_of_hours[:, np.newaxis], staff_cost * OUT_OF_HOURS_MULTIPLIER, staff_cost
+    )
+
+    total = fixed_cost + staff_cost
+    for multiplier in multipliers:
+        if isinstance(multiplier, np.ndarray):
+            multiplier = multiplier[:, np.newaxis]
+        total = total * multiplier
+
+    fuel_surcharge = total * (float(pricing_model.fuel_surcharge_percentage) / 100)
+    total = total + fuel_surcharge
+    carbon_offset = total * (float(pricing_model.carbon_offset_rate) / 100)
+    total = total + carbon_offset
+
+    base_price = float(pricing_model.base_price)
+    total = np.minimum(
+        np.maximum(total, float(pricing_model.min_price)),
+        base_price * float(pricing_model.max_price_multiplier),
+    )
+    return StaffPriceGrid(
+        staff_cost, fuel_surcharge, carbon_offset, np.round(total, 2)
+    )
+
+
+def build_forecast_calendar(
+    dates,
+    uk_holidays,
+    weather,
+    components,
+    time_factors,
+    pricing_model,
+    priority_type,
+    service_type,
+    request_id=None,
+):
+    """
+    Monthly calendar of staff prices for ``dates``.
+
+    ``weather`` is a list of (multiplier, weather_type) per date and
+    ``components`` the date-independent costs and multipliers.
+    """
+    is_weekend, is_holiday = date_flags(dates, uk_holidays)
+    time_multiplier = time_multipliers(time_factors, is_weekend, is_holiday)
+    weather_multiplier = np.array([multiplier for multiplier, _ in weather], dtype=float)
+
+    fixed_cost = (
+        components["base_price"]
+        + components["distance_cost"]
+        + components["weight_cost"]
+        + components["property_cost"]
+        + components["vehicle_cost"]
+        + components["insurance_cost"]
+    )
+    grid = staff_price_grid(
+        fixed_cost,
+        is_weekend | is_holiday,
+        [
+            components["service_multiplier"],
+            time_multiplier,
+            weather_multiplier,
+            components["vehicle_multiplier"],
+            components["priority_multiplier"],
+        ],
+        pricing_model,
+    )
+
+    # Best value: lowest price per staff member (ties go to the lower price)
+    staff_counts = list(STAFF_BASE_RATES)
+    best = np.argmin(grid.price / np.array(staff_counts, dtype=float), axis=1)
+
+    fixed_components = {
+        key: round(components[key], 2)
+        for key in ("base_price", "distance_cost", "weight_cost", "property_cost")
+    }
+    vehicle_cost = round(components["vehicle_cost"], 2)
+    insurance_cost = round(components["insurance_cost"], 2)
+
+    prices = grid.price.tolist()
+    staff_costs = np.round(grid.staff_cost, 2).tolist()
+    fuel_surcharges = np.round(grid.fuel_surcharge, 2).tolist()
+    carbon_offsets = np.round(grid.carbon_offset, 2).tolist()
+    time_multiplier = time_multiplier.tolist()
+    is_weekend, is_holiday, best = is_weekend.tolist(), is_holiday.tolist(), best.tolist()
+
+    monthly_calendar = {}
+    for i, current_date in enumerate(dates):
+        multipliers = {
+            "service_multiplier": components["service_multiplier"],
+            "time_multiplier": time_multiplier[i],
+            "weather_multiplier": weather[i][0],
+            "vehicle_multiplier": components["vehicle_multiplier"],
+            "priority_multiplier": components["priority_multiplier"],
+        }
+        staff_prices = [
+            {
+                "staff_count": staff_count,
+                "price": prices[i][j],
+                "components": {
+                    **fixed_components,
+                    "staff_cost": staff_costs[i][j],
+                    "vehicle_cost": vehicle_cost,
+                    "insurance_cost": insurance_cost,
+                    "fuel_surcharge": fuel_surcharges[i][j],
+                    "carbon_offset": carbon_offsets[i][j],
+                },
+                "multipliers": dict(multipliers),
+            }
+            for j, staff_count in enumerate(staff_counts)
+        ]
+
+        day_data = {
+            "date": current_date.strftime("%Y-%m-%d"),
+            "day": current_date.day,
+            "day_name": current_date.strftime("%A"),
+            "is_weekend": is_weekend[i],
+            "is_holiday": is_holiday[i],
+            "holiday_name": uk_holidays.get(current_date) if is_holiday[i] else None,
+            "weather_type": weather[i][1],
+            "staff_prices": staff_prices,
+            "status": "available",
+            "service_type": service_type,
+            "priority_type": priority_type,
+            "best_price": prices[i][best[i]],
+            "best_staff_count": staff_counts[best[i]],
+        }
+        if request_id is not None:
+            day_data["request_id"] = request_id
+
+        monthly_calendar.setdefault(current_date.strftime("%Y-%m"), []).append(day_data)
+
+    return monthly_calendar
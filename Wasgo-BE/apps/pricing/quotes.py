@@ -0,0 +1,130 @@
+"""
+Price quote cache.
+
+Quotes are cached under a canonical fingerprint of their normalized inputs
+(numbers rounded, strings lower-cased, dates/durations/Decimals serialized,
+empty values and request identifiers dropped, keys sorted) combined with the
+compiled pricing model version. Saving any configuration or factor bumps
+that version (see ``engine.py`` / ``signals.py``), so earlier quotes are
+never served again and simply expire after ``PRICING_QUOTE_CACHE_SECONDS``.
+
+Hit and miss counts are kept in shared cache counters (``stats()``) to help
+size the TTL.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.cache_counters import get_counter, incr_counter
+
+from .engine import pricing_models
+
+logger = logging.getLogger(__name__)
+
+# Inputs that identify a request rather than affect its price
+IGNORED_FIELDS = {"request_id"}
+# Decimal places kept for numeric inputs (e.g. distance to 10m)
+NUMBER_PRECISION = 2
+
+
+def normalize_value(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        number = round(float(value), NUMBER_PRECISION)
+        return int(number) if number.is_integer() else number
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, dict):
+        return normalize_inputs(value)
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(item) for item in value]
+    return str(value)
+
+
+def normalize_inputs(data):
+    """Canonical form of quote inputs; empty values are dropped"""
+    normalized = {}
+    for key, value in data.items():
+        if key in IGNORED_FIELDS or value is None or value == "":
+            continue
+        normalized[str(key)] = normalize_value(value)
+    return normalized
+
+
+def quote_fingerprint(data, kind="quote"):
+    payload = json.dumps(
+        {"kind": kind, "inputs": normalize_inputs(data)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class QuoteCache:
+    KEY = "pricing_quote:{version}:{fingerprint}"
+    HITS_KEY = "pricing_quote:hits"
+    MISSES_KEY = "pricing_quote:misses"
+    # Hit/miss counters cover windows of this length
+    METRICS_TIMEOUT = 7 * 24 * 3600
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, "PRICING_QUOTE_CACHE_SECONDS", 300)
+
+    def key(self, data, kind):
+        return self.KEY.format(
+            version=pricing_models.version(), fingerprint=quote_fingerprint(data, kind)
+        )
+
+    def get_or_compute(self, data, compute, kind="quote", store=True):
+        """
+        Cached quote for ``data``, else ``compute()`` stored for next time.
+        A ``None`` result (nothing to price) is not cached, and neither is
+        anything computed with ``store=False`` (e.g. priced without the
+        weather forecast).
+        """
+        key = self.key(data, kind)
+        quote = cache.get(key)
+        if quote is not None:
+            self.record(self.HITS_KEY)
+            return quote
+
+        self.record(self.MISSES_KEY)
+        quote = compute()
+        if quote is not None and store:
+            cache.set(key, quote, self.timeout())
+        return quote
+
+    def record(self, counter_key):
+        try:
+            incr_counter(counter_key, self.METRICS_TIMEOUT)
+        except Exception:
+            logger.exception("Failed to record quote cache metrics")
+
+    def stats(self):
+        hits, misses = get_counter(self.HITS_KEY), get_counter(self.MISSES_KEY)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "ttl_seconds": self.timeout(),
+            "pricing_model_version": pricing_models.version(),
+        }
+
+    def reset_stats(self):
+        cache.delete_many([self.HITS_KEY, self.MISSES_KEY])
+
+
+quote_cache = QuoteCache()
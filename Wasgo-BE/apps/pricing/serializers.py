@@ -479,3 +479,41 @@ class DateBasedPriceCalculationSerializer(serializers.Serializer):
                     "Start date cannot be after end date."
                 )
         return data
+
+
+class QuoteInputSerializer(PriceCalculationSerializer):
+    """
+    One job to price in a batch quote request: the calculate_price inputs,
+    plus an optional date from which the weekend/holiday flags and (unless
+    weather_condition is given) the pickup city's forecast are resolved
+    """
+
+    request_id = serializers.UUIDField(required=False)
+    date = serializers.DateField(required=False)
+    weather_condition = serializers.ChoiceField(
+        choices=["normal", "rain", "snow", "extreme"], required=False
+    )
+
+
+class BatchQuoteSerializer(serializers.Serializer):
+    """Envelope of a batch quote request; items are validated one by one"""
+
+    MAX_ITEMS = 100
+    # Each distinct pickup city may need a weather forecast fetch
+    MAX_CITIES = 10
+
+    items = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_ITEMS
+    )
+
+    def validate_items(self, items):
+        cities = {
+            str(item["pickup_city"]).strip().lower()
+            for item in items
+            if item.get("pickup_city")
+        }
+        if len(cities) > self.MAX_CITIES:
+            raise serializers.ValidationError(
+                f"A batch can cover at most {self.MAX_CITIES} pickup cities."
+            )
+        return items
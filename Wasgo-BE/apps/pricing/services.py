@@ -20,6 +20,10 @@ from .models import (
     LoadingTimePricing,
 )
 import uuid
+from .engine import get_pricing_model
+from .forecast import build_forecast_calendar
+from .quotes import quote_cache
+from .weather import NORMAL_WEATHER, get_weather_provider, weather_condition
 from .defaults import (
     DEFAULT_PRICING_CONFIG,
     DEFAULT_DISTANCE_PRICING,
@@ -37,7 +41,6 @@ from .defaults import (
 from decimal import Decimal
 import random
 from types import SimpleNamespace
-import requests
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -61,9 +64,6 @@ class PricingService:
         Returns a calendar-friendly format with staff prices for each day.
         """
         try:
-            # Ensure default configuration exists
-            PricingService.ensure_default_config_exists()
-
             # Get request data
             data = (
                 forecast_request.data
@@ -71,10 +71,8 @@ class PricingService:
                 else forecast_request
             )
 
-            # Get active configuration
-            active_config = PricingService.get_active_configuration()
-            if not active_config:
-                raise ValueError("No active pricing configuration found")
+            # Compiled active configuration (no queries once cached)
+            active_config = get_pricing_model()
 
             # Use default base_price if missing
             base_price = float(
@@ -101,35 +99,48 @@ class PricingService:
             if weight < 0:
                 raise ValueError("Weight cannot be negative")
 
-            # Get configuration factors with caching
+            # Factors for this job from the compiled model
             factors = PricingService._get_pricing_factors(
                 active_config, service_level, property_type, vehicle_type
             )
 
-            # Initialize result structure
-            monthly_calendar = {}
+            # Price the whole date range at once
             uk_holidays = holidays.GB()
-
-            # Generate pricing for each day in the range
-            current_date = start_date
-            while current_date <= end_date:
-                month_key = current_date.strftime("%Y-%m")
-                if month_key not in monthly_calendar:
-                    monthly_calendar[month_key] = []
-
-                # Calculate day's prices
-                day_data = PricingService._calculate_day_prices(
-                    current_date,
+            dates = [
+                start_date + timedelta(days=offset)
+                for offset in range((end_date - start_date).days + 1)
+            ]
+            # Same inputs and dates are served from the quote cache, unless
+            # the weather forecast is unavailable right now
+            city = data.get("city")
+            forecast = WeatherService.get_forecast(city) if city else {}
+            quote_inputs = {
+                **{key: data.get(key) for key in data},
+                "distance": distance,
+                "weight": weight,
+                "start_date": start_date,
+                "end_date": end_date,
+            }
+            monthly_calendar = quote_cache.get_or_compute(
+                quote_inputs,
+                lambda: PricingService._forecast_calendar(
+                    dates,
                     distance,
                     weight,
                     data,
                     factors,
                     active_config,
                     uk_holidays,
-                    forecast_request,
-                )
-                monthly_calendar[month_key].append(day_data)
-                current_date += timedelta(days=1)
+                    None,
+                    forecast or {},
+                ),
+                kind="forecast",
+                store=forecast is not None,
+            )
+            if hasattr(forecast_request, "request_id"):
+                for days in monthly_calendar.values():
+                    for day_data in days:
+                        day_data["request_id"] = forecast_request.request_id
 
             return Response(
                 {
@@ -158,8 +169,291 @@ class PricingService:
             )
 
     @staticmethod
-    def _calculate_day_prices(
-        current_date,
+    def calculate_quote(data, pricing_model=None):
+        """
+        Price one job from validated ``PriceCalculationSerializer`` inputs.
+
+        Uses the first active factor of each kind in the compiled pricing
+        model, so no queries are made once the model is loaded.
+        """
+        model = pricing_model or get_pricing_model()
+        total_price = model.base_price
+        price_breakdown = {"base_price": total_price}
+
+        # Distance pricing
+        if data.get("distance") and model.distance:
+            distance_cost = model.distance[0].calculate_price(data["distance"])
+            total_price += distance_cost
+            price_breakdown["distance_cost"] = distance_cost
+
+        # Weight pricing
+        if data.get("weight") and model.weight:
+            weight_cost = model.weight[0].calculate_price(data["weight"])
+            total_price += weight_cost
+            price_breakdown["weight_cost"] = weight_cost
+
+        # Service Level pricing
+        service_factors = model.service_level_by_name.get(data.get("service_level"))
+        if service_factors:
+            service_multiplier = service_factors[0].price_multiplier
+            service_cost = total_price * (service_multiplier - 1)
+            total_price *= service_multiplier
+            price_breakdown["service_level_cost"] = service_cost
+
+        # Staff Required pricing
+        if data.get("staff_required") and model.staff:
+            staff_pricing = model.staff[0]
+            staff_count = min(
+                max(data["staff_required"], staff_pricing.min_staff),
+                staff_pricing.max_staff,
+            )
+            staff_cost = staff_pricing.base_rate_per_staff * staff_count
+            total_price += staff_cost
+            price_breakdown["staff_cost"] = staff_cost
+
+        # Property Type pricing
+        property_factors = model.property_by_type.get(data.get("property_type"))
+        if property_factors:
+            property_pricing = property_factors[0]
+            property_cost = property_pricing.base_rate
+            if data.get("number_of_rooms"):
+                property_cost += (
+                    property_pricing.rate_per_room * data["number_of_rooms"]
+                )
+            if data.get("floor_number"):
+                if not data.get("has_elevator", True):
+                    property_cost += property_pricing.floor_rate * data["floor_number"]
+                else:
+                    property_cost *= property_pricing.elevator_discount
+            total_price += property_cost
+            price_breakdown["property_cost"] = property_cost
+
+        # Time factors
+        if model.time:
+            time_pricing = model.time[0]
+            time_multiplier = 1.0
+            if data.get("is_peak_hour"):
+                time_multiplier *= time_pricing.peak_hour_multiplier
+            if data.get("is_weekend"):
+                time_multiplier *= time_pricing.weekend_multiplier
+            if data.get("is_holiday"):
+                time_multiplier *= time_pricing.holiday_multiplier
+            if time_multiplier > 1.0:
+                time_cost = total_price * (time_multiplier - 1)
+                total_price *= time_multiplier
+                price_breakdown["time_factors_cost"] = time_cost
+
+        # Loading/Unloading Time pricing
+        if model.loading_time:
+            loading_pricing = model.loading_time[0]
+            total_time = timedelta()
+            if data.get("loading_time"):
+                total_time += data["loading_time"]
+            if data.get("unloading_time"):
+                total_time += data["unloading_time"]
+            if total_time:
+                hours = total_time.total_seconds() / 3600
+                min_hours = loading_pricing.min_hours
+                base_rate = loading_pricing.base_rate_per_hour
+                if hours > min_hours:
+                    loading_cost = (min_hours * base_rate) + (
+                        (hours - min_hours)
+                        * base_rate
+                        * loading_pricing.overtime_multiplier
+                    )
+                else:
+                    loading_cost = hours * base_rate
+                total_price += loading_cost
+                price_breakdown["loading_time_cost"] = loading_cost
+
+        # Weather conditions
+        weather_condition = data.get("weather_condition", "normal")
+        if model.weather and weather_condition != "normal":
+            weather_pricing = model.weather[0]
+            weather_multiplier = {
+                "rain": weather_pricing.rain_multiplier,
+                "snow": weather_pricing.snow_multiplier,
+                "extreme": weather_pricing.extreme_weather_multiplier,
+            }.get(weather_condition, 1.0)
+            if weather_multiplier > 1.0:
+                weather_cost = total_price * (weather_multiplier - 1)
+                total_price *= weather_multiplier
+                price_breakdown["weather_cost"] = weather_cost
+
+        # Vehicle type
+        vehicle_factors = model.vehicle_by_type.get(data.get("vehicle_type"))
+        if vehicle_factors:
+            vehicle_pricing = vehicle_factors[0]
+            vehicle_cost = vehicle_pricing.base_rate
+            total_price += vehicle_cost
+            total_price *= vehicle_pricing.capacity_multiplier
+            price_breakdown["vehicle_cost"] = vehicle_cost
+
+        # Special requirements
+        if model.special_requirements:
+            special_pricing = model.special_requirements[0]
+            special_cost = 0
+            if data.get("has_fragile_items"):
+                fragile_multiplier = special_pricing.fragile_items_multiplier
+                special_cost += total_price * (fragile_multiplier - 1)
+                total_price *= fragile_multiplier
+            if data.get("requires_assembly"):
+                total_price += special_pricing.assembly_required_rate
+                special_cost += special_pricing.assembly_required_rate
+            if data.get("requires_special_equipment"):
+                total_price += special_pricing.special_equipment_rate
+                special_cost += special_pricing.special_equipment_rate
+            if special_cost > 0:
+                price_breakdown["special_requirements_cost"] = special_cost
+
+        # Insurance
+        if (
+            data.get("insurance_required")
+            and data.get("insurance_value")
+            and model.insurance
+        ):
+            insurance_pricing = model.insurance[0]
+            insurance_cost = max(
+                insurance_pricing.min_premium,
+                float(data["insurance_value"])
+                * insurance_pricing.value_percentage
+                / 100,
+            )
+            total_price += insurance_cost
+            price_breakdown["insurance_cost"] = insurance_cost
+
+        # Location factors (a city given as both pickup and dropoff counts once)
+        cities = {data.get("pickup_city"), data.get("dropoff_city")} - {None, ""}
+        location_cost = 0
+        for city in cities:
+            for location in model.location_by_city.get(city, ()):
+                total_price *= location.zone_multiplier
+                location_cost += location.congestion_charge + location.parking_fee
+        if location_cost > 0:
+            total_price += location_cost
+            price_breakdown["location_cost"] = location_cost
+
+        # Environmental factors
+        if data.get("carbon_offset") and model.carbon_offset_rate > 0:
+            carbon_cost = model.carbon_offset_rate * total_price / 100
+            total_price += carbon_cost
+            price_breakdown["carbon_offset_cost"] = carbon_cost
+
+        # Fuel surcharge
+        if model.fuel_surcharge_percentage > 0:
+            fuel_surcharge = model.fuel_surcharge_percentage * total_price / 100
+            total_price += fuel_surcharge
+            price_breakdown["fuel_surcharge"] = fuel_surcharge
+
+        # Apply min price and max multiplier constraints
+        total_price = max(model.min_price, total_price)
+        total_price = min(model.base_price * model.max_price_multiplier, total_price)
+
+        return {
+            "total_price": round(total_price, 2),
+            "currency": "GBP",
+            "price_breakdown": price_breakdown,
+        }
+
+    @staticmethod
+    def quote_batch(items):
+        """
+        Price many validated ``QuoteInputSerializer`` inputs in one pass
+        with ``calculate_quote``, so each item gets exactly the price
+        calculate_price would return for it.
+
+        The compiled pricing model and holidays are resolved once for the
+        whole batch, and each pickup city's weather forecast at most once.
+        Returns one result per item, in input order; a failing item gets an
+        error entry instead of failing the batch.
+        """
+        active_config = get_pricing_model()
+        uk_holidays = holidays.GB()
+        forecasts = {}
+
+        results = []
+        for index, item in enumerate(items):
+            try:
+                data, forecast = PricingService._resolve_quote_date(
+                    item, uk_holidays, forecasts
+                )
+                quote = quote_cache.get_or_compute(
+                    data,
+                    lambda: PricingService.calculate_quote(data, active_config),
+                    store=forecast is not None,
+                )
+                results.append({"index": index, "status": "ok", "quote": quote})
+            except Exception as e:
+                logger.error(f"Error pricing batch item {index}: {str(e)}")
+                results.append(
+                    {
+                        "index": index,
+                        "status": "error",
+                        "errors": {"non_field_errors": ["Unable to price this job"]},
+                    }
+                )
+
+        return active_config, results
+
+    @staticmethod
+    def _resolve_quote_date(item, uk_holidays, forecasts):
+        """
+        calculate_price inputs for a batch item: its date becomes the weekend
+        and holiday flags and, unless given, the pickup city's weather.
+        Returns the inputs and the forecast used ({} when none was needed,
+        None when it was unavailable).
+        """
+        data = {key: value for key, value in item.items() if key != "date"}
+        quote_date = item.get("date")
+        if not quote_date:
+            return data, {}
+
+        data["is_weekend"] = data.get("is_weekend") or quote_date.weekday() >= 5
+        data["is_holiday"] = data.get("is_holiday") or quote_date in uk_holidays
+
+        forecast = {}
+        city = data.get("pickup_city")
+        if "weather_condition" not in data and city:
+            if city not in forecasts:
+                forecasts[city] = WeatherService.get_forecast(city)
+            forecast = forecasts[city]
+            day = (forecast or {}).get(quote_date.strftime("%Y-%m-%d"), NORMAL_WEATHER)
+            data["weather_condition"] = day["weather_type"]
+        return data, forecast
+
+    @staticmethod
+    def _fixed_components(distance, weight, data, factors, active_config):
+        """Cost components and multipliers that do not depend on the date"""
+        vehicle_cost, vehicle_multiplier = PricingService._calculate_vehicle_cost(
+            factors["vehicle"], data.get("total_dimensions")
+        )
+        return {
+            "base_price": float(active_config.base_price),
+            "distance_cost": PricingService._calculate_distance_cost(
+                distance, factors["distance"]
+            ),
+            "weight_cost": PricingService._calculate_weight_cost(
+                weight, factors["weight"]
+            ),
+            "property_cost": PricingService._calculate_property_cost(
+                data, factors["property"]
+            ),
+            "vehicle_cost": vehicle_cost,
+            "insurance_cost": PricingService._calculate_insurance_cost(
+                data, factors["insurance"]
+            ),
+            "service_multiplier": PricingService._calculate_service_multiplier(
+                factors["service_level"]
+            ),
+            "vehicle_multiplier": vehicle_multiplier,
+            "priority_multiplier": PricingService._calculate_priority_multiplier(
+                data.get("priority_type", "normal")
+            ),
+        }
+
+    @staticmethod
+    def _forecast_calendar(
+        dates,
         distance,
         weight,
         data,
@@ -167,108 +461,25 @@ class PricingService:
         active_config,
         uk_holidays,
         forecast_request,
+        forecast,
     ):
-        """Calculate prices for a specific day"""
-        # Check if it's a weekend or holiday using the day name
-        day_name = current_date.strftime('%A').lower()  # Get full day name in lowercase
-        is_weekend = day_name in ['saturday', 'sunday']
-        is_holiday = current_date in uk_holidays
-
-        # Calculate base components
-        base_price = float(active_config.base_price)
-        distance_cost = PricingService._calculate_distance_cost(
-            distance, factors["distance"]
-        )
-        weight_cost = PricingService._calculate_weight_cost(weight, factors["weight"])
-        property_cost = PricingService._calculate_property_cost(
-            data, factors["property"]
+        """Staff prices for every date, grouped by month"""
+        components = PricingService._fixed_components(
+            distance, weight, data, factors, active_config
         )
-
-        # Calculate vehicle cost with dimensions
-        vehicle_cost, vehicle_multiplier = PricingService._calculate_vehicle_cost(
-            factors["vehicle"],
-            data.get('total_dimensions')
-        )
-
-        # Calculate insurance cost if applicable
-        insurance_cost = PricingService._calculate_insurance_cost(
-            data, factors["insurance"]
-        )
-
-        # Calculate multipliers
-        service_multiplier = PricingService._calculate_service_multiplier(
-            factors["service_level"]
-        )
-        time_multiplier = PricingService._calculate_time_multiplier(
-            is_weekend, is_holiday, factors["time"]
-        )
-        weather_multiplier, weather_type = (
-            PricingService._calculate_weather_multiplier(data.get('city'), current_date.strftime('%Y-%m-%d'))
-        )
-
-        # Get priority type from data
-        priority_type = data.get('priority_type', 'normal')
-
-        # Calculate staff prices
-        staff_prices = PricingService._calculate_staff_prices(
-            factors["staff"],
-            is_weekend,
-            is_holiday,
-            base_price,
-            distance_cost,
-            weight_cost,
-            property_cost,
-            vehicle_cost,
-            insurance_cost,
-            service_multiplier,
-            time_multiplier,
-            weather_multiplier,
-            vehicle_multiplier,
+        weather = PricingService._calculate_weather_multipliers(forecast, dates)
+        return build_forecast_calendar(
+            dates,
+            uk_holidays,
+            weather,
+            components,
+            factors["time"],
             active_config,
-            priority_type
+            priority_type=data.get("priority_type", "normal"),
+            service_type=data.get("service_type", "standard"),
+            request_id=getattr(forecast_request, "request_id", None),
         )
 
-        # Find the best price and its staff count
-        best_price = float('inf')
-        best_staff_count = None
-        best_value_score = float('inf')  # Lower score is better
-
-        for staff_price in staff_prices:
-            price = staff_price['price']
-            staff_count = staff_price['staff_count']
-            
-            # Calculate value score (price per staff member)
-            value_score = price / staff_count
-            
-            # If this is a better value proposition (lower price per staff member)
-            # or if it's the same value but lower total price
-            if value_score < best_value_score or (value_score == best_value_score and price < best_price):
-                best_value_score = value_score
-                best_price = price
-                best_staff_count = staff_count
-
-        # Prepare day data
-        day_data = {
-            "date": current_date.strftime("%Y-%m-%d"),
-            "day": current_date.day,
-            "day_name": current_date.strftime('%A'),  # Add full day name
-            "is_weekend": is_weekend,
-            "is_holiday": is_holiday,
-            "holiday_name": uk_holidays.get(current_date) if is_holiday else None,
-            "weather_type": weather_type,
-            "staff_prices": staff_prices,
-            "status": "available",
-            "service_type": data.get('service_type', 'standard'),
-            "priority_type": priority_type,
-            "best_price": best_price if best_price != float('inf') else None,
-            "best_staff_count": best_staff_count
-        }
-
-        if hasattr(forecast_request, "request_id"):
-            day_data["request_id"] = forecast_request.request_id
-
-        return day_data
-
     @staticmethod
     def get_active_configuration():
         """Return the DB config or fallback to an in-memory default."""
@@ -299,6 +510,7 @@ class PricingService:
         ]
         fake.insurance_factors = [InsurancePricing(**DEFAULT_INSURANCE_PRICING)]
         fake.loading_time_factors = [LoadingTimePricing(**DEFAULT_LOADING_TIME_PRICING)]
+        fake.location_factors = []
         return fake
 
     @staticmethod
@@ -394,32 +606,9 @@ class PricingService:
         return None
 
     @staticmethod
-    def _get_pricing_factors(active_config, service_level, property_type, vehicle_type):
-        """Get all pricing factors with caching"""
-        cache_key = PricingService.get_cache_key(f"factors_{active_config.id}")
-        factors = cache.get(cache_key)
-
-        if not factors:
-            factors = {
-                "distance": active_config.distance_factors.filter(is_active=True),
-                "weight": active_config.weight_factors.filter(is_active=True),
-                "property": active_config.property_type_factors.filter(
-                    is_active=True, property_type=property_type
-                ),
-                "service_level": active_config.service_level_factors.filter(
-                    is_active=True, service_level=service_level
-                ),
-                "vehicle": active_config.vehicle_factors.filter(
-                    is_active=True, vehicle_type=vehicle_type
-                ),
-                "time": active_config.time_factors.filter(is_active=True),
-                "weather": active_config.weather_factors.filter(is_active=True),
-                "insurance": active_config.insurance_factors.filter(is_active=True),
-                "staff": active_config.staff_factors.filter(is_active=True),
-            }
-            cache.set(cache_key, factors, PricingService.CACHE_TIMEOUT)
-
-        return factors
+    def _get_pricing_factors(pricing_model, service_level, property_type, vehicle_type):
+        """Get the pricing factors for a job from the compiled pricing model"""
+        return pricing_model.factors_for(service_level, property_type, vehicle_type)
 
     @staticmethod
     def _calculate_distance_cost(distance, factors):
@@ -538,24 +727,34 @@ class PricingService:
                 return float(factor.weekend_multiplier)
         return 1.0
 
+    # Map weather types to multipliers
+    WEATHER_MULTIPLIERS = {
+        "normal": 1.0,
+        "rain": 1.2,
+        "snow": 1.5,
+        "extreme": 2.0,
+    }
+
     @staticmethod
     def _calculate_weather_multiplier(city: str = None, date: str = None):
         """Calculate weather multiplier based on real weather data"""
         if not city or not date:
             return 1.0, "normal"
-        
-        weather_data = WeatherService.get_weather_data(city, date)
-        weather_type = weather_data["weather_type"]
-        
-        # Map weather types to multipliers
-        multipliers = {
-            "normal": 1.0,
-            "rain": 1.2,
-            "snow": 1.5,
-            "extreme": 2.0
-        }
-        
-        return multipliers.get(weather_type, 1.0), weather_type
+
+        weather_type = WeatherService.get_weather_data(city, date)["weather_type"]
+        return PricingService.WEATHER_MULTIPLIERS.get(weather_type, 1.0), weather_type
+
+    @staticmethod
+    def _calculate_weather_multipliers(forecast, dates):
+        """(multiplier, weather type) for each date of a city's forecast"""
+        weather = []
+        for current_date in dates:
+            day = forecast.get(current_date.strftime("%Y-%m-%d"), NORMAL_WEATHER)
+            weather_type = day["weather_type"]
+            weather.append(
+                (PricingService.WEATHER_MULTIPLIERS.get(weather_type, 1.0), weather_type)
+            )
+        return weather
 
     @staticmethod
     def _calculate_priority_multiplier(priority_type):
@@ -568,212 +767,38 @@ class PricingService:
         }
         return PRIORITY_MULTIPLIERS.get(priority_type, 1.0)
 
-    @staticmethod
-    def _calculate_staff_prices(
-        staff_factors,
-        is_weekend,
-        is_holiday,
-        base_price,
-        distance_cost,
-        weight_cost,
-        property_cost,
-        vehicle_cost,
-        insurance_cost,
-        service_multiplier,
-        time_multiplier,
-        weather_multiplier,
-        vehicle_multiplier,
-        active_config,
-        priority_type='normal'  # Keep for backward compatibility
-    ):
-        """Calculate prices for different staff counts"""
-        staff_prices = []
-        
-        # Base rates for different staff counts (in GBP)
-        STAFF_BASE_RATES = {
-            1: 25.00,  # Single staff member
-            2: 45.00,  # Two staff members
-            3: 65.00,  # Three staff members
-            4: 85.00   # Four staff members
-        }
-        
-        # Minimum hours per job
-        MIN_HOURS = 2.0
-        
-        for staff_count in range(1, 5):
-            # Get base rate for this staff count
-            base_rate = STAFF_BASE_RATES.get(staff_count, 25.00)
-            
-            # Calculate staff cost based on minimum hours
-            staff_cost = base_rate * MIN_HOURS
-            
-            # Apply overtime multiplier for weekends/holidays
-            if is_weekend or is_holiday:
-                staff_cost *= 1.5  # 50% premium for weekends/holidays
-            
-            # Calculate total price components
-            total_price = (
-                base_price
-                + distance_cost
-                + weight_cost
-                + property_cost
-                + vehicle_cost
-                + insurance_cost
-                + staff_cost
-            )
-            
-            # Apply multipliers
-            total_price *= service_multiplier  # This includes the service level multiplier
-            total_price *= time_multiplier
-            total_price *= weather_multiplier
-            total_price *= vehicle_multiplier
-            
-            # Apply priority multiplier
-            priority_multiplier = PricingService._calculate_priority_multiplier(priority_type)
-            total_price *= priority_multiplier
-            
-            # Add fuel surcharge
-            fuel_surcharge = total_price * (float(active_config.fuel_surcharge_percentage) / 100)
-            total_price += fuel_surcharge
-            
-            # Add carbon offset
-            carbon_offset = total_price * (float(active_config.carbon_offset_rate) / 100)
-            total_price += carbon_offset
-            
-            # Apply minimum and maximum price constraints
-            total_price = max(total_price, float(active_config.min_price))
-            max_price = base_price * float(active_config.max_price_multiplier)
-            total_price = min(total_price, max_price)
-            
-            # Round to 2 decimal places
-            total_price = round(total_price, 2)
-            
-            staff_prices.append({
-                "staff_count": staff_count,
-                "price": total_price,
-                "components": {
-                    "base_price": round(base_price, 2),
-                    "distance_cost": round(distance_cost, 2),
-                    "weight_cost": round(weight_cost, 2),
-                    "property_cost": round(property_cost, 2),
-                    "staff_cost": round(staff_cost, 2),
-                    "vehicle_cost": round(vehicle_cost, 2),
-                    "insurance_cost": round(insurance_cost, 2),
-                    "fuel_surcharge": round(fuel_surcharge, 2),
-                    "carbon_offset": round(carbon_offset, 2)
-                },
-                "multipliers": {
-                    "service_multiplier": service_multiplier,
-                    "time_multiplier": time_multiplier,
-                    "weather_multiplier": weather_multiplier,
-                    "vehicle_multiplier": vehicle_multiplier,
-                    "priority_multiplier": priority_multiplier
-                }
-            })
-        
-        return staff_prices
-
 
 class WeatherService:
-    """Service class to handle weather API integration"""
-    
-    CACHE_TIMEOUT = 3600  # Cache weather data for 1 hour
-    CACHE_KEY_PREFIX = "weather_"
-    
-    @staticmethod
-    def get_cache_key(city: str, date: str) -> str:
-        """Generate a cache key for weather data"""
-        return f"{WeatherService.CACHE_KEY_PREFIX}{city}_{date}"
-    
+    """Weather lookups for pricing, served from one cached forecast per city"""
+
+    # Set to a FakeWeatherProvider in tests
+    provider = None
+
+    @classmethod
+    def get_provider(cls):
+        if cls.provider is None:
+            cls.provider = get_weather_provider()
+        return cls.provider
+
     @staticmethod
     def get_weather_condition(weather_code: int) -> str:
-        """
-        Map OpenWeatherMap weather codes to our weather conditions
-        https://openweathermap.org/weather-conditions
-        """
-        if weather_code >= 200 and weather_code < 300:  # Thunderstorm
-            return "extreme"
-        elif weather_code >= 300 and weather_code < 400:  # Drizzle
-            return "rain"
-        elif weather_code >= 500 and weather_code < 600:  # Rain
-            return "rain"
-        elif weather_code >= 600 and weather_code < 700:  # Snow
-            return "snow"
-        elif weather_code >= 700 and weather_code < 800:  # Atmosphere (fog, mist, etc.)
-            return "extreme"
-        elif weather_code >= 800 and weather_code < 900:  # Clear/Clouds
-            return "normal"
-        else:
-            return "normal"
-    
+        """Map OpenWeatherMap weather codes to our weather conditions"""
+        return weather_condition(weather_code)
+
     @staticmethod
-    def get_weather_data(city: str, date: str) -> dict:
+    def get_forecast(city: str):
         """
-        Get weather data for a specific city and date
-        Returns cached data if available, otherwise fetches from API
+        All forecast days for a city: {"YYYY-MM-DD": weather data}, or None
+        when the forecast is currently unavailable
         """
-        cache_key = WeatherService.get_cache_key(city, date)
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
         try:
-            # Get API key from settings
-            api_key = settings.OPENWEATHERMAP_API_KEY
-            if not api_key:
-                logger.warning("OpenWeatherMap API key not configured")
-                return {"weather_type": "normal"}
-            
-            # Convert date string to datetime
-            target_date = datetime.strptime(date, "%Y-%m-%d")
-            
-            # Get coordinates for the city
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city},GB&limit=1&appid={api_key}"
-            geo_response = requests.get(geo_url)
-            geo_data = geo_response.json()
-            
-            if not geo_data:
-                logger.warning(f"No coordinates found for city: {city}")
-                return {"weather_type": "normal"}
-            
-            lat = geo_data[0]["lat"]
-            lon = geo_data[0]["lon"]
-            
-            # Get 5-day forecast
-            forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-            forecast_response = requests.get(forecast_url)
-            forecast_data = forecast_response.json()
-            
-            # Find the forecast for the target date
-            target_forecast = None
-            for forecast in forecast_data["list"]:
-                forecast_date = datetime.fromtimestamp(forecast["dt"])
-                if forecast_date.date() == target_date.date():
-                    target_forecast = forecast
-                    break
-            
-            if not target_forecast:
-                logger.warning(f"No forecast found for date: {date}")
-                return {"weather_type": "normal"}
-            
-            # Get weather condition from the forecast
-            weather_code = target_forecast["weather"][0]["id"]
-            weather_type = WeatherService.get_weather_condition(weather_code)
-            
-            weather_data = {
-                "weather_type": weather_type,
-                "temperature": target_forecast["main"]["temp"],
-                "humidity": target_forecast["main"]["humidity"],
-                "wind_speed": target_forecast["wind"]["speed"],
-                "description": target_forecast["weather"][0]["description"]
-            }
-            
-            # Cache the weather data
-            cache.set(cache_key, weather_data, WeatherService.CACHE_TIMEOUT)
-            
-            return weather_data
-            
+            return WeatherService.get_provider().get_forecast(city)
         except Exception as e:
             logger.error(f"Error fetching weather data: {str(e)}")
-            return {"weather_type": "normal"}
+            return None
+
+    @staticmethod
+    def get_weather_data(city: str, date: str) -> dict:
+        """Get weather data for a specific city and date"""
+        forecast = WeatherService.get_forecast(city) or {}
+        return dict(forecast.get(date, NORMAL_WEATHER))
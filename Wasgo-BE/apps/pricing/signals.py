@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .engine import invalidate_pricing_model
+from .models import PricingConfiguration
+
+
+def handle_pricing_change(sender, **kwargs):
+    """Recompile the pricing model after any configuration or factor change"""
+    transaction.on_commit(invalidate_pricing_model)
+
+
+# Configurations, factors and the configuration <-> factor through models
+for model in apps.get_app_config("pricing").get_models():
+    post_save.connect(
+        handle_pricing_change,
+        sender=model,
+        dispatch_uid=f"pricing_save_{model.__name__}",
+    )
+    post_delete.connect(
+        handle_pricing_change,
+        sender=model,
+        dispatch_uid=f"pricing_delete_{model.__name__}",
+    )
+
+# .add()/.remove()/.clear() on the factor relations bypass post_save
+for field in PricingConfiguration._meta.many_to_many:
+    m2m_changed.connect(
+        handle_pricing_change,
+        sender=field.remote_field.through,
+        dispatch_uid=f"pricing_m2m_{field.name}",
+    )
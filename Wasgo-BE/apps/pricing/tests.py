@@ -1,3 +1,447 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import holidays
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .engine import compile_configuration, pricing_models
+from .forecast import MIN_HOURS, OUT_OF_HOURS_MULTIPLIER, STAFF_BASE_RATES
+from .quotes import normalize_inputs, quote_cache, quote_fingerprint
+from .serializers import BatchQuoteSerializer
+from .services import PricingService, WeatherService
+from .weather import FakeWeatherProvider
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pricing-tests",
+    }
+}
+
+
+def factor(**fields):
+    return SimpleNamespace(is_active=True, **fields)
+
+
+def pricing_config():
+    """An unsaved configuration with one active factor of each kind used"""
+    return SimpleNamespace(
+        id="test-config",
+        name="Test pricing",
+        base_price=Decimal("50.00"),
+        min_price=Decimal("30.00"),
+        max_price_multiplier=Decimal("100.0"),
+        fuel_surcharge_percentage=Decimal("5.0"),
+        carbon_offset_rate=Decimal("1.5"),
+        distance_factors=[
+            factor(
+                base_rate_per_km=Decimal("1.25"),
+                max_distance=Decimal("500"),
+                additional_distance_threshold=Decimal("100"),
+                additional_distance_multiplier=Decimal("1.2"),
+            )
+        ],
+        weight_factors=[
+            factor(
+                base_rate_per_kg=Decimal("0.35"),
+                max_weight=Decimal("1000"),
+                heavy_item_threshold=Decimal("200"),
+                heavy_item_surcharge=Decimal("25"),
+            )
+        ],
+        time_factors=[
+            factor(
+                weekend_multiplier=Decimal("1.2"),
+                holiday_multiplier=Decimal("1.5"),
+                peak_hour_multiplier=Decimal("1.25"),
+            )
+        ],
+        weather_factors=[
+            factor(
+                rain_multiplier=Decimal("1.2"),
+                snow_multiplier=Decimal("1.5"),
+                extreme_weather_multiplier=Decimal("2.0"),
+            )
+        ],
+        insurance_factors=[],
+        staff_factors=[],
+        property_type_factors=[
+            factor(
+                property_type="house",
+                base_rate=Decimal("20"),
+                rate_per_room=Decimal("7.5"),
+                floor_rate=Decimal("3"),
+                elevator_discount=Decimal("0.8"),
+            )
+        ],
+        service_level_factors=[
+            factor(service_level="express", price_multiplier=Decimal("1.5"))
+        ],
+        vehicle_factors=[
+            factor(
+                vehicle_type="van",
+                base_rate=Decimal("40"),
+                capacity_multiplier=Decimal("1.1"),
+                capacity_cubic_meters=Decimal("10"),
+            )
+        ],
+        special_requirement_factors=[
+            factor(
+                fragile_items_multiplier=Decimal("1.3"),
+                assembly_required_rate=Decimal("50"),
+                special_equipment_rate=Decimal("75"),
+            )
+        ],
+        loading_time_factors=[
+            factor(
+                base_rate_per_hour=Decimal("30"),
+                min_hours=Decimal("1"),
+                overtime_multiplier=Decimal("1.5"),
+            )
+        ],
+        location_factors=[
+            factor(
+                city_name="London",
+                zone_multiplier=Decimal("1.2"),
+                congestion_charge=Decimal("15"),
+                parking_fee=Decimal("5"),
+            )
+        ],
+    )
+
+
+def per_day_calendar(
+    dates, distance, weight, data, factors, model, uk_holidays, forecast
+):
+    """The forecast calendar as it was built before vectorization, day by day"""
+    calendar = {}
+    for current_date in dates:
+        is_weekend = current_date.strftime("%A").lower() in ["saturday", "sunday"]
+        is_holiday = current_date in uk_holidays
+
+        base_price = float(model.base_price)
+        distance_cost = PricingService._calculate_distance_cost(
+            distance, factors["distance"]
+        )
+        weight_cost = PricingService._calculate_weight_cost(weight, factors["weight"])
+        property_cost = PricingService._calculate_property_cost(
+            data, factors["property"]
+        )
+        vehicle_cost, vehicle_multiplier = PricingService._calculate_vehicle_cost(
+            factors["vehicle"], data.get("total_dimensions")
+        )
+        insurance_cost = PricingService._calculate_insurance_cost(
+            data, factors["insurance"]
+        )
+        service_multiplier = PricingService._calculate_service_multiplier(
+            factors["service_level"]
+        )
+        time_multiplier = PricingService._calculate_time_multiplier(
+            is_weekend, is_holiday, factors["time"]
+        )
+        weather_type = forecast.get(
+            current_date.strftime("%Y-%m-%d"), {"weather_type": "normal"}
+        )["weather_type"]
+        weather_multiplier = PricingService.WEATHER_MULTIPLIERS.get(weather_type, 1.0)
+        priority_type = data.get("priority_type", "normal")
+        priority_multiplier = PricingService._calculate_priority_multiplier(
+            priority_type
+        )
+
+        staff_prices = []
+        for staff_count in range(1, 5):
+            staff_cost = STAFF_BASE_RATES[staff_count] * MIN_HOURS
+            if is_weekend or is_holiday:
+                staff_cost *= OUT_OF_HOURS_MULTIPLIER
+            total_price = (
+                base_price
+                + distance_cost
+                + weight_cost
+                + property_cost
+                + vehicle_cost
+                + insurance_cost
+                + staff_cost
+            )
+            total_price *= service_multiplier
+            total_price *= time_multiplier
+            total_price *= weather_multiplier
+            total_price *= vehicle_multiplier
+            total_price *= priority_multiplier
+            fuel_surcharge = total_price * (
+                float(model.fuel_surcharge_percentage) / 100
+            )
+            total_price += fuel_surcharge
+            carbon_offset = total_price * (float(model.carbon_offset_rate) / 100)
+            total_price += carbon_offset
+            total_price = max(total_price, float(model.min_price))
+            total_price = min(
+                total_price, base_price * float(model.max_price_multiplier)
+            )
+
+            staff_prices.append(
+                {
+                    "staff_count": staff_count,
+                    "price": round(total_price, 2),
+                    "components": {
+                        "base_price": round(base_price, 2),
+                        "distance_cost": round(distance_cost, 2),
+                        "weight_cost": round(weight_cost, 2),
+                        "property_cost": round(property_cost, 2),
+                        "staff_cost": round(staff_cost, 2),
+                        "vehicle_cost": round(vehicle_cost, 2),
+                        "insurance_cost": round(insurance_cost, 2),
+                        "fuel_surcharge": round(fuel_surcharge, 2),
+                        "carbon_offset": round(carbon_offset, 2),
+                    },
+                    "multipliers": {
+                        "service_multiplier": service_multiplier,
+                        "time_multiplier": time_multiplier,
+                        "weather_multiplier": weather_multiplier,
+                        "vehicle_multiplier": vehicle_multiplier,
+                        "priority_multiplier": priority_multiplier,
+                    },
+                }
+            )
+
+        best = min(
+            staff_prices, key=lambda p: (p["price"] / p["staff_count"], p["price"])
+        )
+        calendar.setdefault(current_date.strftime("%Y-%m"), []).append(
+            {
+                "date": current_date.strftime("%Y-%m-%d"),
+                "day": current_date.day,
+                "day_name": current_date.strftime("%A"),
+                "is_weekend": is_weekend,
+                "is_holiday": is_holiday,
+                "holiday_name": uk_holidays.get(current_date) if is_holiday else None,
+                "weather_type": weather_type,
+                "staff_prices": staff_prices,
+                "status": "available",
+                "service_type": data.get("service_type", "standard"),
+                "priority_type": priority_type,
+                "best_price": best["price"],
+                "best_staff_count": best["staff_count"],
+            }
+        )
+    return calendar
+
+
+class ForecastCalendarTests(SimpleTestCase):
+    def test_matches_per_day_calculation(self):
+        model = compile_configuration(pricing_config())
+        factors = model.factors_for("express", "house", "van")
+        data = {
+            "number_of_rooms": 3,
+            "floor_number": 2,
+            "has_elevator": True,
+            "total_dimensions": {"volume": 7},
+            "priority_type": "express",
+            "service_type": "removal",
+        }
+        # Spans a month end, weekends and the Christmas/New Year holidays
+        dates = [date(2025, 12, 18) + timedelta(days=i) for i in range(21)]
+        uk_holidays = holidays.GB(years=[2025, 2026])
+        forecast = {
+            "2025-12-20": {"weather_type": "rain"},
+            "2025-12-25": {"weather_type": "snow"},
+            "2026-01-02": {"weather_type": "extreme"},
+        }
+
+        calendar = PricingService._forecast_calendar(
+            dates, 140, 260, data, factors, model, uk_holidays, None, forecast
+        )
+
+        self.assertEqual(
+            calendar,
+            per_day_calendar(
+                dates, 140, 260, data, factors, model, uk_holidays, forecast
+            ),
+        )
+        self.assertEqual(list(calendar), ["2025-12", "2026-01"])
+
+
+class CalculateQuoteTests(SimpleTestCase):
+    def test_prices_from_the_compiled_model(self):
+        model = compile_configuration(pricing_config())
+        data = {
+            "distance": 20,
+            "service_level": "express",
+            "property_type": "house",
+            "number_of_rooms": 2,
+            "is_weekend": True,
+            "loading_time": timedelta(hours=2),
+            "vehicle_type": "van",
+            "pickup_city": "London",
+            "dropoff_city": "London",
+            "weather_condition": "normal",
+        }
+
+        quote = PricingService.calculate_quote(data, model)
+
+        # 50 + 25 distance, x1.5 express, + 35 property, x1.2 weekend,
+        # + 75 loading, (+ 40 van) x1.1, London once: x1.2 + 20, + 5% fuel
+        self.assertEqual(quote["total_price"], 425.71)
+        self.assertEqual(quote["price_breakdown"]["location_cost"], 20)
+        self.assertEqual(quote["price_breakdown"]["loading_time_cost"], 75)
+        self.assertNotIn("special_requirements_cost", quote["price_breakdown"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QuoteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fingerprint_ignores_formatting_and_request_ids(self):
+        data = {
+            "city": "  London ",
+            "distance": 12.3449,
+            "weight": Decimal("80.00"),
+            "date": date(2026, 3, 2),
+            "request_id": "req-1",
+            "notes": "",
+            "staff_count": None,
+        }
+        same = {
+            "city": "london",
+            "distance": 12.34,
+            "weight": 80,
+            "date": date(2026, 3, 2),
+        }
+
+        self.assertEqual(
+            normalize_inputs(data),
+            {"city": "london", "distance": 12.34, "weight": 80, "date": "2026-03-02"},
+        )
+        self.assertEqual(quote_fingerprint(data), quote_fingerprint(same))
+        self.assertNotEqual(
+            quote_fingerprint(data), quote_fingerprint({**same, "distance": 12.4})
+        )
+        self.assertNotEqual(
+            quote_fingerprint(data), quote_fingerprint(data, kind="forecast")
+        )
+
+    def test_version_bump_recomputes(self):
+        data = {"distance": 10, "weight": 5}
+        compute = mock.Mock(side_effect=[{"price": 100}, {"price": 120}])
+
+        self.assertEqual(quote_cache.get_or_compute(data, compute), {"price": 100})
+        self.assertEqual(quote_cache.get_or_compute(data, compute), {"price": 100})
+        key = quote_cache.key(data, "quote")
+        pricing_models.invalidate()
+
+        self.assertNotEqual(quote_cache.key(data, "quote"), key)
+        self.assertEqual(quote_cache.get_or_compute(data, compute), {"price": 120})
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(quote_cache.stats()["hits"], 1)
+
+    def test_unstored_quotes_are_not_cached(self):
+        compute = mock.Mock(return_value={"price": 100})
+
+        quote_cache.get_or_compute({"distance": 10}, compute, store=False)
+        quote_cache.get_or_compute({"distance": 10}, compute, store=False)
+
+        self.assertEqual(compute.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchQuoteTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.model = compile_configuration(pricing_config())
+        patcher = mock.patch(
+            "apps.pricing.services.get_pricing_model", return_value=self.model
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.provider = FakeWeatherProvider(
+            {"Leeds": {"2026-03-03": {"weather_type": "rain"}}}
+        )
+        previous_provider = WeatherService.provider
+        WeatherService.provider = self.provider
+        self.addCleanup(setattr, WeatherService, "provider", previous_provider)
+
+    def item(self, **overrides):
+        item = {
+            "distance": 25,
+            "weight": 100,
+            "service_level": "express",
+            "staff_required": 2,
+            "property_type": "house",
+            "vehicle_type": "van",
+        }
+        item.update(overrides)
+        return item
+
+    def test_results_follow_input_order(self):
+        # 2026-03-07 is a Saturday; Leeds has rain forecast on 2026-03-03
+        items = [
+            self.item(distance=10),
+            self.item(distance=50, date=date(2026, 3, 7)),
+            self.item(distance=10, date=date(2026, 3, 3), pickup_city="Leeds"),
+            self.item(distance=10, date=date(2026, 3, 4), pickup_city="Leeds"),
+        ]
+
+        active_config, results = PricingService.quote_batch(items)
+
+        self.assertIs(active_config, self.model)
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3])
+        self.assertTrue(all(r["status"] == "ok" for r in results))
+        self.assertIn("time_factors_cost", results[1]["quote"]["price_breakdown"])
+        self.assertIn("weather_cost", results[2]["quote"]["price_breakdown"])
+        self.assertNotIn("weather_cost", results[3]["quote"]["price_breakdown"])
+        self.assertGreater(
+            results[2]["quote"]["total_price"], results[3]["quote"]["total_price"]
+        )
+        # One forecast lookup per city for the whole batch
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_matches_calculate_price(self):
+        items = [
+            self.item(),
+            self.item(pickup_city="London", carbon_offset=True),
+            self.item(
+                date=date(2026, 3, 3), pickup_city="Leeds", has_fragile_items=True
+            ),
+        ]
+        expected = [
+            self.item(),
+            self.item(pickup_city="London", carbon_offset=True),
+            self.item(
+                pickup_city="Leeds",
+                has_fragile_items=True,
+                is_weekend=False,
+                is_holiday=False,
+                weather_condition="rain",
+            ),
+        ]
+
+        _, results = PricingService.quote_batch(items)
+
+        self.assertEqual(
+            [r["quote"] for r in results],
+            [PricingService.calculate_quote(data, self.model) for data in expected],
+        )
+
+    def test_failing_item_does_not_fail_the_batch(self):
+        items = [
+            self.item(),
+            self.item(loading_time="two hours"),
+            self.item(distance=30),
+        ]
+
+        _, results = PricingService.quote_batch(items)
+
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ok"])
+        self.assertEqual([r["index"] for r in results], [0, 1, 2])
+        self.assertIn("non_field_errors", results[1]["errors"])
+
+    def test_caps_distinct_pickup_cities(self):
+        cities = [f"City {n}" for n in range(BatchQuoteSerializer.MAX_CITIES)]
+        items = [self.item(pickup_city=city) for city in cities]
+
+        self.assertTrue(BatchQuoteSerializer(data={"items": items}).is_valid())
+        items.append(self.item(pickup_city="Another city"))
+        self.assertFalse(BatchQuoteSerializer(data={"items": items}).is_valid())
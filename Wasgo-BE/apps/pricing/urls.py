@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -34,6 +34,12 @@ config_router.register(
 )
 
 urlpatterns = [
+    # Batch quotes for many candidate jobs
+    re_path(
+        r"^pricing/quotes/batch/?$",
+        views.BatchQuoteView.as_view(),
+        name="pricing-quotes-batch",
+    ),
     # Include all pricing factor routes
     path("pricing/factors/", include(factor_router.urls)),
     # Include admin routes
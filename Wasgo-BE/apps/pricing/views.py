@@ -2,8 +2,9 @@ from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db.models import Q
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from datetime import timedelta, datetime, date
 import holidays
 from .models import (
@@ -37,8 +38,12 @@ from .serializers import (
     LoadingTimePricingSerializer,
     PriceCalculationSerializer,
     DateBasedPriceCalculationSerializer,
+    QuoteInputSerializer,
+    BatchQuoteSerializer,
 )
+from .engine import get_pricing_model
 from .services import PricingService
+from .quotes import quote_cache
 
 
 class PricingFactorViewSet(viewsets.ModelViewSet):
@@ -200,242 +205,23 @@ class PricingConfigurationViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         data = serializer.validated_data
-        total_price = 0
-        price_breakdown = {}
-
-        # Get active configuration
-        config = PricingConfiguration.objects.filter(is_active=True).first()
-        if not config:
+        # Identical inputs (e.g. repeated while the booking form is edited)
+        # are served from the quote cache
+        quote = quote_cache.get_or_compute(data, lambda: self._calculate_quote(data))
+        if quote is None:
             return Response(
                 {"error": "No active pricing configuration found"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        return Response(quote)
 
-        # Base price
-        total_price = float(config.base_price)
-        price_breakdown["base_price"] = total_price
-
-        # Distance pricing
-        if data.get("distance"):
-            distance_pricing = DistancePricing.objects.filter(is_active=True).first()
-            if distance_pricing:
-                distance_cost = distance_pricing.calculate_price(data["distance"])
-                total_price += distance_cost
-                price_breakdown["distance_cost"] = distance_cost
-
-        # Weight pricing
-        if data.get("weight"):
-            weight_pricing = WeightPricing.objects.filter(is_active=True).first()
-            if weight_pricing:
-                weight_cost = weight_pricing.calculate_price(data["weight"])
-                total_price += weight_cost
-                price_breakdown["weight_cost"] = weight_cost
-
-        # Service Level pricing
-        if data.get("service_level"):
-            service_pricing = ServiceLevelPricing.objects.filter(
-                is_active=True, service_level=data["service_level"]
-            ).first()
-            if service_pricing:
-                service_multiplier = float(service_pricing.price_multiplier)
-                service_cost = total_price * (service_multiplier - 1)
-                total_price *= service_multiplier
-                price_breakdown["service_level_cost"] = service_cost
-
-        # Staff Required pricing
-        if data.get("staff_required"):
-            staff_pricing = StaffRequiredPricing.objects.filter(is_active=True).first()
-            if staff_pricing:
-                staff_count = min(
-                    max(data["staff_required"], staff_pricing.min_staff),
-                    staff_pricing.max_staff,
-                )
-                staff_cost = float(staff_pricing.base_rate_per_staff) * staff_count
-                total_price += staff_cost
-                price_breakdown["staff_cost"] = staff_cost
-
-        # Property Type pricing
-        if data.get("property_type"):
-            property_pricing = PropertyTypePricing.objects.filter(
-                is_active=True, property_type=data["property_type"]
-            ).first()
-            if property_pricing:
-                # Base property cost
-                property_cost = float(property_pricing.base_rate)
-
-                # Add room cost
-                if data.get("number_of_rooms"):
-                    property_cost += (
-                        float(property_pricing.rate_per_room) * data["number_of_rooms"]
-                    )
-
-                # Add floor cost
-                if data.get("floor_number"):
-                    if not data.get("has_elevator", True):
-                        property_cost += (
-                            float(property_pricing.floor_rate) * data["floor_number"]
-                        )
-                    else:
-                        property_cost *= float(property_pricing.elevator_discount)
-
-                total_price += property_cost
-                price_breakdown["property_cost"] = property_cost
-
-        # Time factors
-        time_pricing = TimePricing.objects.filter(is_active=True).first()
-        if time_pricing:
-            time_multiplier = 1.0
-            if data.get("is_peak_hour"):
-                time_multiplier *= float(time_pricing.peak_hour_multiplier)
-            if data.get("is_weekend"):
-                time_multiplier *= float(time_pricing.weekend_multiplier)
-            if data.get("is_holiday"):
-                time_multiplier *= float(time_pricing.holiday_multiplier)
-
-            if time_multiplier > 1.0:
-                time_cost = total_price * (time_multiplier - 1)
-                total_price *= time_multiplier
-                price_breakdown["time_factors_cost"] = time_cost
-
-        # Loading/Unloading Time pricing
-        loading_pricing = LoadingTimePricing.objects.filter(is_active=True).first()
-        if loading_pricing:
-            total_time = timedelta()
-            if data.get("loading_time"):
-                total_time += data["loading_time"]
-            if data.get("unloading_time"):
-                total_time += data["unloading_time"]
-
-            if total_time:
-                hours = total_time.total_seconds() / 3600
-                min_hours = float(loading_pricing.min_hours)
-                base_rate = float(loading_pricing.base_rate_per_hour)
-
-                if hours > min_hours:
-                    overtime_hours = hours - min_hours
-                    loading_cost = (min_hours * base_rate) + (
-                        overtime_hours
-                        * base_rate
-                        * float(loading_pricing.overtime_multiplier)
-                    )
-                else:
-                    loading_cost = hours * base_rate
-
-                total_price += loading_cost
-                price_breakdown["loading_time_cost"] = loading_cost
-
-        # Weather conditions
-        weather_pricing = WeatherPricing.objects.filter(is_active=True).first()
-        if weather_pricing and data.get("weather_condition") != "normal":
-            weather_condition = data["weather_condition"]
-            weather_multiplier = 1.0
-
-            if weather_condition == "rain":
-                weather_multiplier = float(weather_pricing.rain_multiplier)
-            elif weather_condition == "snow":
-                weather_multiplier = float(weather_pricing.snow_multiplier)
-            elif weather_condition == "extreme":
-                weather_multiplier = float(weather_pricing.extreme_weather_multiplier)
-
-            if weather_multiplier > 1.0:
-                weather_cost = total_price * (weather_multiplier - 1)
-                total_price *= weather_multiplier
-                price_breakdown["weather_cost"] = weather_cost
-
-        # Vehicle type
-        if data.get("vehicle_type"):
-            vehicle_pricing = VehicleTypePricing.objects.filter(
-                is_active=True, vehicle_type=data["vehicle_type"]
-            ).first()
-            if vehicle_pricing:
-                vehicle_cost = float(vehicle_pricing.base_rate)
-                total_price += vehicle_cost
-                total_price *= float(vehicle_pricing.capacity_multiplier)
-                price_breakdown["vehicle_cost"] = vehicle_cost
-
-        # Special requirements
-        special_pricing = SpecialRequirementsPricing.objects.filter(
-            is_active=True
-        ).first()
-        if special_pricing:
-            special_cost = 0
-            if data.get("has_fragile_items"):
-                fragile_cost = total_price * (
-                    float(special_pricing.fragile_items_multiplier) - 1
-                )
-                total_price *= float(special_pricing.fragile_items_multiplier)
-                special_cost += fragile_cost
-            if data.get("requires_assembly"):
-                assembly_cost = float(special_pricing.assembly_required_rate)
-                total_price += assembly_cost
-                special_cost += assembly_cost
-            if data.get("requires_special_equipment"):
-                equipment_cost = float(special_pricing.special_equipment_rate)
-                total_price += equipment_cost
-                special_cost += equipment_cost
-
-            if special_cost > 0:
-                price_breakdown["special_requirements_cost"] = special_cost
-
-        # Insurance
-        if data.get("insurance_required") and data.get("insurance_value"):
-            insurance_pricing = InsurancePricing.objects.filter(is_active=True).first()
-            if insurance_pricing:
-                insurance_cost = max(
-                    float(insurance_pricing.min_premium),
-                    float(data["insurance_value"])
-                    * float(insurance_pricing.value_percentage)
-                    / 100,
-                )
-                total_price += insurance_cost
-                price_breakdown["insurance_cost"] = insurance_cost
-
-        # Location factors
-        if data.get("pickup_city") or data.get("dropoff_city"):
-            location_query = Q()
-            if data.get("pickup_city"):
-                location_query |= Q(city_name=data["pickup_city"])
-            if data.get("dropoff_city"):
-                location_query |= Q(city_name=data["dropoff_city"])
-
-            location_pricing = LocationPricing.objects.filter(is_active=True).filter(
-                location_query
-            )
-
-            location_cost = 0
-            for location in location_pricing:
-                total_price *= float(location.zone_multiplier)
-                location_cost += float(location.congestion_charge)
-                location_cost += float(location.parking_fee)
-
-            if location_cost > 0:
-                total_price += location_cost
-                price_breakdown["location_cost"] = location_cost
-
-        # Environmental factors
-        if data.get("carbon_offset") and config.carbon_offset_rate > 0:
-            carbon_cost = float(config.carbon_offset_rate) * total_price / 100
-            total_price += carbon_cost
-            price_breakdown["carbon_offset_cost"] = carbon_cost
-
-        # Fuel surcharge
-        if config.fuel_surcharge_percentage > 0:
-            fuel_surcharge = float(config.fuel_surcharge_percentage) * total_price / 100
-            total_price += fuel_surcharge
-            price_breakdown["fuel_surcharge"] = fuel_surcharge
-
-        # Apply min price and max multiplier constraints
-        total_price = max(float(config.min_price), total_price)
-        max_price = float(config.base_price) * float(config.max_price_multiplier)
-        total_price = min(max_price, total_price)
-
-        return Response(
-            {
-                "total_price": round(total_price, 2),
-                "currency": "GBP",
-                "price_breakdown": price_breakdown,
-            }
-        )
+    def _calculate_quote(self, data):
+        """Price one set of validated inputs; None without an active configuration"""
+        try:
+            pricing_model = get_pricing_model()
+        except ValueError:
+            return None
+        return PricingService.calculate_quote(data, pricing_model)
 
     @action(detail=False, methods=["post"])
     def calculate_date_based_prices(self, request):
@@ -463,6 +249,10 @@ class PricingConfigurationViewSet(viewsets.ModelViewSet):
         calendar_prices = []
         current_date = start_date
 
+        # Prices only depend on these day attributes (not the date itself),
+        # so each combination is priced once rather than once per day
+        prices_by_day_type = {}
+
         while current_date <= end_date:
             # Determine if it's a weekend or holiday
             is_weekend = current_date.weekday() >= 5
@@ -476,30 +266,36 @@ class PricingConfigurationViewSet(viewsets.ModelViewSet):
             # Calculate traffic multiplier (mock for now - integrate with traffic API later)
             traffic_multiplier = self._get_traffic_prediction(current_date)
 
-            # Calculate prices for different staff counts (1 to 4 staff members)
-            staff_prices = {}
-            for staff_count in range(1, 5):
-                price_data = {
-                    **data,
-                    "staff_required": staff_count,
-                    "is_weekend": is_weekend,
-                    "is_holiday": is_holiday,
-                    "weather_condition": weather_condition,
-                    "traffic_multiplier": traffic_multiplier,
-                    "request_id": request.request_id,
-                }
-
-                # Create a request object for the pricing view
-                pricing_request = type("ServiceRequest", (), {"data": price_data})()
-                response = self.calculate_price(pricing_request)
-
-                if response.status_code == 200:
-                    staff_prices[f"staff_{staff_count}"] = {
-                        "total_price": response.data["total_price"],
-                        "currency": response.data["currency"],
-                        "price_breakdown": response.data["price_breakdown"],
+            day_type = (is_weekend, is_holiday, weather_condition, traffic_multiplier)
+            if day_type not in prices_by_day_type:
+                # Calculate prices for different staff counts (1 to 4 staff members)
+                staff_prices = {}
+                for staff_count in range(1, 5):
+                    price_data = {
+                        **data,
+                        "staff_required": staff_count,
+                        "is_weekend": is_weekend,
+                        "is_holiday": is_holiday,
+                        "weather_condition": weather_condition,
+                        "traffic_multiplier": traffic_multiplier,
+                        "request_id": request.request_id,
                     }
 
+                    # Create a request object for the pricing view
+                    pricing_request = type(
+                        "ServiceRequest", (), {"data": price_data}
+                    )()
+                    response = self.calculate_price(pricing_request)
+
+                    if response.status_code == 200:
+                        staff_prices[f"staff_{staff_count}"] = {
+                            "total_price": response.data["total_price"],
+                            "currency": response.data["currency"],
+                            "price_breakdown": response.data["price_breakdown"],
+                        }
+                prices_by_day_type[day_type] = staff_prices
+            staff_prices = prices_by_day_type[day_type]
+
             # Add day information to calendar
             calendar_prices.append(
                 {
@@ -538,6 +334,11 @@ class PricingConfigurationViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=["get"])
+    def quote_cache_stats(self, request):
+        """Hit/miss counts of the price quote cache"""
+        return Response(quote_cache.stats())
+
     def _get_weather_prediction(self, date, city):
         """
         Mock weather prediction - integrate with weather API
@@ -553,6 +354,58 @@ class PricingConfigurationViewSet(viewsets.ModelViewSet):
         return 1.0
 
 
+class BatchQuoteView(APIView):
+    """
+    Price many candidate jobs at once: POST {"items": [{...}, ...]}
+
+    Each item takes the calculate_price inputs (plus an optional date) and
+    is priced exactly as calculate_price would price it. Results come back
+    in input order; items that fail validation or pricing carry their own
+    errors without failing the rest of the batch.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    # Public and up to MAX_ITEMS quotes (and MAX_CITIES forecasts) per call
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+
+    def post(self, request):
+        serializer = BatchQuoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data["items"]
+        valid_items, valid_indexes, errors = [], [], {}
+        for index, item in enumerate(items):
+            item_serializer = QuoteInputSerializer(data=item)
+            if item_serializer.is_valid():
+                valid_indexes.append(index)
+                valid_items.append(item_serializer.validated_data)
+            else:
+                errors[index] = item_serializer.errors
+
+        try:
+            active_config, priced = PricingService.quote_batch(valid_items)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [
+            {"index": index, "status": "error", "errors": item_errors}
+            for index, item_errors in errors.items()
+        ]
+        for index, result in zip(valid_indexes, priced):
+            results.append({**result, "index": index})
+        results.sort(key=lambda result: result["index"])
+
+        return Response(
+            {
+                "pricing_configuration": active_config.name,
+                "count": len(results),
+                "errors": sum(result["status"] == "error" for result in results),
+                "results": results,
+            }
+        )
+
+
 class PricingFactorsViewSet(viewsets.ViewSet):
     """ViewSet to get/update all pricing factors for admin purposes."""
 
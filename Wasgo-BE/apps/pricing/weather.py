@@ -0,0 +1,247 @@
+"""
+Weather forecast providers used by pricing.
+
+A provider returns the whole forecast for a city as ``{"YYYY-MM-DD": day}``
+so a pricing calendar can look up every date from one cached entry. The
+OpenWeatherMap provider:
+
+- fetches the 5-day forecast once per city per refresh (one HTTP call; the
+  first call is made by city name and its coordinates are cached for a long
+  time, later refreshes query by coordinates),
+- stores every day it returns in a single cache entry, kept past its
+  refresh age so stale data is served while one worker refreshes,
+- uses strict timeouts and a shared circuit breaker so a failing API is
+  not called again until a cooldown has passed.
+
+``get_forecast`` returns None when no forecast could be obtained (the API
+failed with nothing cached, or another worker is still fetching it), as
+opposed to ``{}`` for a city with no forecast days. Callers price such jobs
+with normal weather but must not cache the result.
+
+``FakeWeatherProvider`` serves fixed data without network access, for tests
+and local development (``WEATHER_PROVIDER = "fake"``).
+"""
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone as dt_timezone
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.cache_counters import incr_counter
+
+logger = logging.getLogger(__name__)
+
+NORMAL_WEATHER = {"weather_type": "normal"}
+
+
+def weather_condition(weather_code):
+    """
+    Map OpenWeatherMap weather codes to our weather conditions
+    https://openweathermap.org/weather-conditions
+    """
+    if 200 <= weather_code < 300:  # Thunderstorm
+        return "extreme"
+    if 300 <= weather_code < 400:  # Drizzle
+        return "rain"
+    if 500 <= weather_code < 600:  # Rain
+        return "rain"
+    if 600 <= weather_code < 700:  # Snow
+        return "snow"
+    if 700 <= weather_code < 800:  # Atmosphere (fog, mist, etc.)
+        return "extreme"
+    return "normal"
+
+
+class CircuitBreaker:
+    """
+    Failure counter shared through the cache. After ``failures`` errors
+    within ``window`` seconds the circuit opens for ``cooldown`` seconds.
+    """
+
+    def __init__(self, name, failures=3, window=60, cooldown=300):
+        self.open_key = f"circuit:{name}:open"
+        self.failures_key = f"circuit:{name}:failures"
+        self.failures = failures
+        self.window = window
+        self.cooldown = cooldown
+
+    def is_open(self):
+        return cache.get(self.open_key) is not None
+
+    def record_success(self):
+        cache.delete(self.failures_key)
+
+    def record_failure(self):
+        if incr_counter(self.failures_key, self.window) >= self.failures:
+            cache.set(self.open_key, 1, self.cooldown)
+            cache.delete(self.failures_key)
+            logger.warning("Circuit %s opened for %ss", self.open_key, self.cooldown)
+
+
+class WeatherProvider(ABC):
+    @abstractmethod
+    def get_forecast(self, city):
+        """
+        {date string: weather dict} for the days forecast for ``city``, or
+        None when the forecast is currently unavailable
+        """
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """Fixed forecasts: ``{city: {date string: weather dict}}``; else normal"""
+
+    def __init__(self, forecasts=None):
+        self.forecasts = forecasts or {}
+        self.calls = 0
+
+    def get_forecast(self, city):
+        self.calls += 1
+        return self.forecasts.get(city, {})
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+    COUNTRY = "GB"
+    GEO_KEY = "weather_geo_{city}"
+    FORECAST_KEY = "weather_forecast_{city}"
+    LOCK_KEY = "weather_forecast_lock_{city}"
+    GEO_TIMEOUT = 30 * 24 * 3600
+    # How long a worker waits for another one fetching an uncached city
+    LOCK_WAIT_SECONDS = 1.0
+    LOCK_POLL_SECONDS = 0.1
+
+    def __init__(self):
+        self.circuit = CircuitBreaker(
+            "openweathermap",
+            failures=getattr(settings, "WEATHER_CIRCUIT_FAILURES", 3),
+            cooldown=getattr(settings, "WEATHER_CIRCUIT_COOLDOWN_SECONDS", 300),
+        )
+
+    @staticmethod
+    def refresh_seconds():
+        return getattr(settings, "WEATHER_FORECAST_CACHE_SECONDS", 3600)
+
+    @staticmethod
+    def city_key(city):
+        return "".join(ch for ch in city.strip().lower() if ch.isalnum()) or "_"
+
+    def get_forecast(self, city):
+        if not city:
+            return {}
+        city_key = self.city_key(city)
+        forecast_key = self.FORECAST_KEY.format(city=city_key)
+        lock_key = self.LOCK_KEY.format(city=city_key)
+        entry = cache.get(forecast_key)
+
+        if entry is not None:
+            fresh = time.time() - entry["fetched_at"] < self.refresh_seconds()
+            if fresh or not cache.add(lock_key, 1, self.timeout() * 4):
+                return entry["days"]
+        elif not cache.add(lock_key, 1, self.timeout() * 4):
+            # Another worker is fetching this city
+            return self.wait_for(forecast_key)
+
+        try:
+            days = self.fetch(city, city_key)
+        finally:
+            cache.delete(lock_key)
+
+        if days is None:
+            return entry["days"] if entry is not None else None
+        # Kept past the refresh age so stale days are served during refreshes
+        cache.set(
+            forecast_key,
+            {"fetched_at": time.time(), "days": days},
+            self.refresh_seconds() * 6,
+        )
+        return days
+
+    def wait_for(self, forecast_key):
+        """Days stored by the worker holding the lock, or None if it is too slow"""
+        deadline = time.monotonic() + self.LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(self.LOCK_POLL_SECONDS)
+            entry = cache.get(forecast_key)
+            if entry is not None:
+                return entry["days"]
+        return None
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, "WEATHER_API_TIMEOUT_SECONDS", 3)
+
+    def fetch(self, city, city_key):
+        """One forecast request; returns the days, or None on failure"""
+        api_key = getattr(settings, "OPENWEATHERMAP_API_KEY", "")
+        if not api_key:
+            # Not a failure: without a key every day is priced as normal
+            logger.warning("OpenWeatherMap API key not configured")
+            return {}
+        if self.circuit.is_open():
+            return None
+
+        geo_key = self.GEO_KEY.format(city=city_key)
+        coords = cache.get(geo_key)
+        params = {"appid": api_key, "units": "metric"}
+        if coords:
+            params.update(lat=coords[0], lon=coords[1])
+        else:
+            params["q"] = f"{city},{self.COUNTRY}"
+
+        try:
+            response = requests.get(
+                self.FORECAST_URL, params=params, timeout=self.timeout()
+            )
+            if response.status_code == 404:
+                # Unknown city: not an API failure
+                self.circuit.record_success()
+                return {}
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.circuit.record_failure()
+            logger.error(f"Error fetching weather forecast for {city}: {str(e)}")
+            return None
+
+        self.circuit.record_success()
+        city_info = data.get("city") or {}
+        if not coords and city_info.get("coord"):
+            coord = city_info["coord"]
+            cache.set(geo_key, (coord["lat"], coord["lon"]), self.GEO_TIMEOUT)
+
+        return self.parse_days(data.get("list", []), city_info.get("timezone", 0))
+
+    @staticmethod
+    def parse_days(entries, utc_offset=0):
+        """First 3-hourly forecast of each local date, as weather dicts"""
+        days = {}
+        for entry in entries:
+            local = datetime.fromtimestamp(
+                entry["dt"] + utc_offset, tz=dt_timezone.utc
+            )
+            day = local.strftime("%Y-%m-%d")
+            if day in days:
+                continue
+            days[day] = {
+                "weather_type": weather_condition(entry["weather"][0]["id"]),
+                "temperature": entry["main"]["temp"],
+                "humidity": entry["main"]["humidity"],
+                "wind_speed": entry["wind"]["speed"],
+                "description": entry["weather"][0]["description"],
+            }
+        return days
+
+
+PROVIDERS = {
+    "openweathermap": OpenWeatherMapProvider,
+    "fake": FakeWeatherProvider,
+}
+
+
+def get_weather_provider():
+    name = getattr(settings, "WEATHER_PROVIDER", "openweathermap")
+    return PROVIDERS[name]()
@@ -31,6 +31,15 @@ SECRET_KEY = os.getenv("DJANGO_SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError("DJANGO_SECRET_KEY environment variable is required")
 OPENWEATHERMAP_API_KEY = os.environ.get("OPENWEATHERMAP_API_KEY", "")
+# Lifetime of cached price quotes; pricing config/factor edits invalidate them
+PRICING_QUOTE_CACHE_SECONDS = int(os.getenv("PRICING_QUOTE_CACHE_SECONDS", 300))
+# "openweathermap", or "fake" for tests/local development (no network calls)
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "openweathermap")
+WEATHER_API_TIMEOUT_SECONDS = float(os.getenv("WEATHER_API_TIMEOUT_SECONDS", 3))
+# A city's cached forecast is refreshed (one API call) after this many seconds
+WEATHER_FORECAST_CACHE_SECONDS = int(os.getenv("WEATHER_FORECAST_CACHE_SECONDS", 3600))
+WEATHER_CIRCUIT_FAILURES = 3
+WEATHER_CIRCUIT_COOLDOWN_SECONDS = 300
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -311,6 +320,59 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache used by every worker process (rate limits, pricing/weather
+# caches, fleet counters, bin state), e.g. REDIS_URL=redis://redis:6379/1.
+# Without REDIS_URL (tests, local development) a per-process in-memory cache
+# is used instead, so counters are not shared between workers.
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "wasgo",
+            "TIMEOUT": 300,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "wasgo-local",
+        }
+    }
+
+# --- IoT sensor ingestion ---
+# "sync" persists readings inside the request; "async" validates, queues and
+# returns 202, leaving the work to `manage.py process_sensor_queue`
+SENSOR_INGEST_MODE = os.getenv("SENSOR_INGEST_MODE", "sync")
+# "database" (durable outbox table) or "memory" (in-process, for tests)
+SENSOR_INGEST_QUEUE_BACKEND = os.getenv("SENSOR_INGEST_QUEUE_BACKEND", "database")
+# A sensor is marked offline after missing this many transmission intervals
+SENSOR_HEARTBEAT_MISSED_INTERVALS = int(os.getenv("SENSOR_HEARTBEAT_MISSED_INTERVALS", 3))
+# Seconds; used when a sensor has no data_transmission_interval configured
+SENSOR_DEFAULT_TRANSMISSION_INTERVAL = 300
+# Seconds; shorter configured intervals are rounded up to this
+SENSOR_HEARTBEAT_MIN_INTERVAL = 60
+# Retention for the monthly-partitioned sensor_readings table, applied by
+# `manage.py maintain_sensor_readings` (0 disables)
+SENSOR_READINGS_RETENTION_MONTHS = int(os.getenv("SENSOR_READINGS_RETENTION_MONTHS", 12))
+SENSOR_READINGS_RAW_DATA_DAYS = int(os.getenv("SENSOR_READINGS_RAW_DATA_DAYS", 30))
+# Seconds a cached fleet summary (status_summary/statistics) is served before
+# one worker recomputes it
+SMART_BIN_SUMMARY_CACHE_SECONDS = int(os.getenv("SMART_BIN_SUMMARY_CACHE_SECONDS", 10))
+# Seconds between full reseeds of the incrementally updated dashboard counters
+SMART_BIN_COUNTERS_RESEED_SECONDS = int(os.getenv("SMART_BIN_COUNTERS_RESEED_SECONDS", 300))
+# Live map telemetry is batched per window and also fanned out to lat/lng
+# grid cell groups of this size for viewport subscriptions
+SMART_BIN_TELEMETRY_WINDOW_SECONDS = float(os.getenv("SMART_BIN_TELEMETRY_WINDOW_SECONDS", 0.5))
+SMART_BIN_TELEMETRY_CELL_DEGREES = 0.05
+# Lifetime of entries in the last-known bin state cache (written through on ingest)
+SMART_BIN_STATE_CACHE_SECONDS = int(os.getenv("SMART_BIN_STATE_CACHE_SECONDS", 3600))
+# Lifetime of cached map vector tiles (zoom <= 18); writes invalidate the
+# affected tiles sooner
+MAP_TILE_CACHE_SECONDS = int(os.getenv("MAP_TILE_CACHE_SECONDS", 300))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
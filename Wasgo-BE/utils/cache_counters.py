@@ -0,0 +1,49 @@
+"""
+Atomic counters on the shared Django cache.
+
+Counters are created with ``cache.add`` (only the first writer wins, which
+fixes the expiry at the start of the window) and bumped with ``cache.incr``,
+which is atomic on Redis and keeps the key's TTL. This replaces the
+``cache.get`` + ``cache.set`` pattern, which loses updates under concurrency.
+"""
+
+from django.core.cache import cache
+
+
+def incr_counter(key, timeout, delta=1):
+    """Atomically add ``delta`` to ``key`` and return the new value"""
+    if cache.add(key, delta, timeout):
+        return delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Expired between add() and incr(); start a new window
+        if cache.add(key, delta, timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+def decr_counter(key, delta=1):
+    """Undo an increment (e.g. a reserved slot that was not used)"""
+    try:
+        return cache.decr(key, delta)
+    except ValueError:
+        return 0
+
+
+def get_counter(key):
+    return cache.get(key, 0)
+
+
+def reserve_slot(key, limit, timeout):
+    """
+    Take one unit of a rate limit, atomically.
+
+    Returns (allowed, count). When the limit is already used up the
+    increment is rolled back and ``allowed`` is False.
+    """
+    count = incr_counter(key, timeout)
+    if count > limit:
+        decr_counter(key)
+        return False, count - 1
+    return True, count
@@ -0,0 +1,54 @@
+"""
+Vectorized great-circle (haversine) distances on WGS84 lon/lat coordinates.
+
+Coordinates are handled as NumPy arrays so that one-to-many and many-to-many
+distances are single array operations rather than one GEOS call per pair.
+Inputs may be GEOS points, ``(lng, lat)`` pairs or an ``(n, 2)`` array;
+missing points (None) become NaN and propagate as NaN distances.
+"""
+
+import numpy as np
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_lnglat(points):
+    """``(n, 2)`` float array of lng/lat for a sequence of points"""
+    if isinstance(points, np.ndarray):
+        return np.asarray(points, dtype=float).reshape(-1, 2)
+
+    coords = np.full((len(points), 2), np.nan)
+    for i, point in enumerate(points):
+        if point is None:
+            continue
+        if hasattr(point, "x"):
+            coords[i] = (point.x, point.y)
+        else:
+            coords[i] = (point[0], point[1])
+    return coords
+
+
+def haversine_km(lng1, lat1, lng2, lat2):
+    """Great-circle distance in km; arguments broadcast like NumPy arrays"""
+    lng1, lat1, lng2, lat2 = map(np.radians, (lng1, lat1, lng2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_from(origin, points):
+    """1-D array of km from ``origin`` to each of ``points``"""
+    (lng, lat), coords = to_lnglat([origin])[0], to_lnglat(points)
+    return haversine_km(lng, lat, coords[:, 0], coords[:, 1])
+
+
+def distance_matrix(points, other=None):
+    """``(len(points), len(other))`` km matrix; ``other`` defaults to ``points``"""
+    a = to_lnglat(points)
+    b = a if other is None else to_lnglat(other)
+    return haversine_km(
+        a[:, 0][:, np.newaxis], a[:, 1][:, np.newaxis], b[:, 0], b[:, 1]
+    )
@@ -0,0 +1,46 @@
+"""
+Index-friendly nearest-neighbour queries on SRID 4326 point fields.
+
+Annotating ``Distance`` and filtering ``distance__lte`` computes a spheroid
+distance for every row and cannot use an index. ``nearest`` instead applies
+the radius with ``ST_DWithin`` on ``field::geography`` and orders with the
+KNN ``<->`` operator on the same expression, so both are served by a GiST
+index on ``(field::geography)`` and only the closest rows are visited.
+``<->`` between geographies is the sphere distance in metres.
+"""
+
+from django.contrib.gis.db.models import PointField
+from django.db.models import BooleanField, F, FloatField, Func, Value
+
+
+class AsGeography(Func):
+    # Must match the indexed expression, e.g. ((location)::geography)
+    template = "(%(expressions)s)::geography"
+    output_field = PointField(srid=4326, geography=True)
+
+
+class DWithin(Func):
+    function = "ST_DWithin"
+    output_field = BooleanField()
+
+
+class KNNDistance(Func):
+    arg_joiner = " <-> "
+    template = "(%(expressions)s)"
+    output_field = FloatField()
+
+
+def nearest(queryset, field, point, radius_m, limit):
+    """
+    Rows of ``queryset`` within ``radius_m`` metres of ``point``, closest
+    first, annotated with ``distance_m``.
+    """
+    if point.srid is None:
+        point.srid = 4326
+    target = AsGeography(Value(point, output_field=PointField(srid=4326)))
+    column = AsGeography(F(field))
+    return (
+        queryset.filter(DWithin(column, target, Value(float(radius_m))))
+        .annotate(distance_m=KNNDistance(column, target))
+        .order_by("distance_m")[:limit]
+    )
@@ -1,3 +1,77 @@
-from django.test import TestCase
+import math
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .cache_counters import get_counter, incr_counter, reserve_slot
+from .great_circle import EARTH_RADIUS_KM, distance_matrix, distances_from, haversine_km
+
+LONDON = (-0.1278, 51.5074)
+PARIS = (2.3522, 48.8566)
+NEW_YORK = (-74.0060, 40.7128)
+
+
+class GreatCircleTests(SimpleTestCase):
+    def test_haversine_known_distances(self):
+        self.assertAlmostEqual(haversine_km(*LONDON, *PARIS), 343.5, delta=0.5)
+        self.assertAlmostEqual(haversine_km(*LONDON, *NEW_YORK), 5570.2, delta=1.0)
+        # A quarter meridian and half the equator
+        self.assertAlmostEqual(
+            haversine_km(0, 0, 0, 90), math.pi / 2 * EARTH_RADIUS_KM, places=6
+        )
+        self.assertAlmostEqual(
+            haversine_km(0, 0, 180, 0), math.pi * EARTH_RADIUS_KM, places=6
+        )
+        self.assertEqual(haversine_km(*LONDON, *LONDON), 0.0)
+
+    def test_distance_matrix(self):
+        points = [LONDON, PARIS, NEW_YORK]
+
+        matrix = distance_matrix(points)
+
+        self.assertEqual(matrix.shape, (3, 3))
+        np.testing.assert_allclose(np.diag(matrix), 0.0, atol=1e-9)
+        np.testing.assert_allclose(matrix, matrix.T)
+        self.assertAlmostEqual(matrix[0, 1], haversine_km(*LONDON, *PARIS))
+        self.assertAlmostEqual(matrix[1, 2], haversine_km(*PARIS, *NEW_YORK))
+        np.testing.assert_allclose(matrix[0], distances_from(LONDON, points))
+
+    def test_missing_points_give_nan(self):
+        distances = distances_from(LONDON, [PARIS, None])
+
+        self.assertAlmostEqual(distances[0], 343.5, delta=0.5)
+        self.assertTrue(np.isnan(distances[1]))
+        self.assertEqual(distance_matrix([LONDON], [PARIS, NEW_YORK]).shape, (1, 2))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "cache-counter-tests",
+        }
+    }
+)
+class CacheCounterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_reserve_slot_rolls_back_over_limit(self):
+        self.assertEqual(reserve_slot("slots", 2, 60), (True, 1))
+        self.assertEqual(reserve_slot("slots", 2, 60), (True, 2))
+        self.assertEqual(reserve_slot("slots", 2, 60), (False, 2))
+        self.assertEqual(reserve_slot("slots", 2, 60), (False, 2))
+        # Refused reservations do not use up the window
+        self.assertEqual(get_counter("slots"), 2)
+
+    def test_incr_counter_restarts_expired_window(self):
+        self.assertEqual(incr_counter("hits", 60), 1)
+        self.assertEqual(incr_counter("hits", 60, delta=2), 3)
+
+        # The key expires between add() and incr()
+        with mock.patch.object(
+            cache, "add", side_effect=[False, True]
+        ), mock.patch.object(cache, "incr", side_effect=ValueError):
+            self.assertEqual(incr_counter("hits", 60, delta=5), 5)
@@ -10,6 +10,10 @@ from django.db.models import Q
 from decimal import Decimal
 import math
 
+import numpy as np
+
+from .great_circle import distance_matrix, distances_from, haversine_km
+
 
 class WasteTypeManager:
     """Utility class for managing waste types across the system"""
@@ -121,19 +125,17 @@ class LocationUtils:
 
     @staticmethod
     def calculate_distance(point1, point2):
-        """Calculate distance between two points in kilometers"""
+        """Great-circle distance between two lng/lat points in kilometers"""
         if not point1 or not point2:
             return None
 
-        # Convert to Point objects if needed
+        # Accept Point objects or (lng, lat) pairs
         if isinstance(point1, (tuple, list)):
             point1 = Point(point1[0], point1[1])
         if isinstance(point2, (tuple, list)):
             point2 = Point(point2[0], point2[1])
 
-        # Calculate distance using Django's distance function
-        distance = point1.distance(point2)
-        return distance * 111.32  # Convert to kilometers (approximate)
+        return float(haversine_km(point1.x, point1.y, point2.x, point2.y))
 
     @staticmethod
     def is_within_radius(center_point, target_point, radius_km):
@@ -159,19 +161,22 @@ class LocationUtils:
             return []
 
         unvisited = list(points)
-        route = []
 
         # Start from the specified start point or first point
-        current = start_point if start_point else unvisited.pop(0)
-        route.append(current)
-
-        # Find nearest neighbor for each remaining point
-        while unvisited:
-            nearest = min(
-                unvisited, key=lambda p: LocationUtils.calculate_distance(current, p)
-            )
-            unvisited.remove(nearest)
-            route.append(nearest)
+        start = start_point if start_point else unvisited.pop(0)
+        route = [start]
+
+        # One distance matrix for all stops; row 0 is the start
+        distances = distance_matrix([start] + unvisited)
+        remaining = np.ones(len(distances), dtype=bool)
+        remaining[0] = False
+        current = 0
+
+        # Visit the nearest remaining stop each time
+        while remaining.any():
+            nearest = int(np.argmin(np.where(remaining, distances[current], np.inf)))
+            remaining[nearest] = False
+            route.append(unvisited[nearest - 1])
             current = nearest
 
         # Add end point if specified and different from last point
@@ -339,63 +344,71 @@ class ProviderMatchingUtils:
             .order_by("distance")
         )
 
+    URGENCY_MULTIPLIERS = {
+        "low": 0.8,
+        "normal": 1.0,
+        "high": 1.2,
+        "emergency": 1.5,
+    }
+
+    @staticmethod
+    def provider_scores(providers, distances, waste_type, urgency="normal"):
+        """
+        Suitability scores (0-100) for providers given their distances (km,
+        NaN when unknown) to the request, as one array operation.
+        """
+        # Distance score: 50 points for 0km, 0 points for 25km+
+        distance_score = np.nan_to_num(np.maximum(0, 50 - distances * 2), nan=0.0)
+
+        # Waste type compatibility, rating (0-20 points) and availability
+        attributes = np.array(
+            [
+                (
+                    20 if waste_type in provider.waste_types_handled else 0,
+                    float(provider.rating) * 2,
+                    10 if provider.is_active else 0,
+                )
+                for provider in providers
+            ],
+            dtype=float,
+        ).reshape(-1, 3)
+
+        score = distance_score + attributes.sum(axis=1)
+        return score * ProviderMatchingUtils.URGENCY_MULTIPLIERS.get(urgency, 1.0)
+
     @staticmethod
     def calculate_provider_score(
         provider, request_location, waste_type, urgency="normal"
     ):
         """Calculate provider suitability score (0-100)"""
-        score = 0
-
-        # Distance score (closer is better)
-        distance = LocationUtils.calculate_distance(
-            provider.base_location, request_location
+        distances = distances_from(request_location, [provider.base_location])
+        return float(
+            ProviderMatchingUtils.provider_scores(
+                [provider], distances, waste_type, urgency
+            )[0]
         )
-        if distance:
-            distance_score = max(
-                0, 50 - (distance * 2)
-            )  # 50 points for 0km, 0 points for 25km+
-            score += distance_score
-
-        # Waste type compatibility
-        if waste_type in provider.waste_types_handled:
-            score += 20
-
-        # Provider rating
-        score += provider.rating * 2  # 0-20 points
-
-        # Availability score
-        if provider.is_active:
-            score += 10
-
-        # Urgency multiplier
-        urgency_multipliers = {
-            "low": 0.8,
-            "normal": 1.0,
-            "high": 1.2,
-            "emergency": 1.5,
-        }
-
-        return score * urgency_multipliers.get(urgency, 1.0)
 
     @staticmethod
     def rank_providers(providers, request_location, waste_type, urgency="normal"):
         """Rank providers by suitability score"""
-        ranked_providers = []
+        providers = list(providers)
+        if not providers:
+            return []
 
-        for provider in providers:
-            score = ProviderMatchingUtils.calculate_provider_score(
-                provider, request_location, waste_type, urgency
-            )
-            ranked_providers.append(
-                {
-                    "provider": provider,
-                    "score": score,
-                    "distance": LocationUtils.calculate_distance(
-                        provider.base_location, request_location
-                    ),
-                }
-            )
+        distances = distances_from(
+            request_location, [provider.base_location for provider in providers]
+        )
+        scores = ProviderMatchingUtils.provider_scores(
+            providers, distances, waste_type, urgency
+        )
 
-        # Sort by score (highest first)
-        ranked_providers.sort(key=lambda x: x["score"], reverse=True)
-        return ranked_providers
+        # Sort by score (highest first), keeping input order for ties
+        order = np.argsort(-scores, kind="stable")
+        return [
+            {
+                "provider": providers[i],
+                "score": float(scores[i]),
+                "distance": None if np.isnan(distances[i]) else float(distances[i]),
+            }
+            for i in order
+        ]